@@ -1,4 +1,6 @@
+import os
 from flask import Flask
+from sqlalchemy import inspect, text
 from models import db
 from routes import api_bp
 import logging
@@ -22,6 +24,9 @@ def create_app():
     # Set a secret key for session management and other security-related needs
     app.config['SECRET_KEY'] = '2946230ef8345ecb6ea4a41ed4d8f0bb162a89e6dcf6c77a10c48c768ce85496'
 
+    # Token of the services reading the API without a user, e.g. the recording daemon, unset to allow users only
+    app.config['SERVICE_TOKEN'] = os.environ.get('SENTINEL_API_TOKEN', '')
+
     # Initialize the database with the Flask app
     db.init_app(app)
 
@@ -32,6 +37,71 @@ def create_app():
     return app
 
 
+# Columns added to existing tables after their first version, create_all only creates missing tables
+MIGRATIONS = {
+    'camera': {
+        'roi': 'ALTER TABLE camera ADD COLUMN roi TEXT',
+        'exclusions': 'ALTER TABLE camera ADD COLUMN exclusions TEXT',
+    },
+}
+
+
+# Text columns made longer after their first version, with their new length
+WIDENED_COLUMNS = {
+    'camera': {
+        'ip_address': 512,  # Holds stream URLs with credentials, not only IPv4 addresses
+    },
+}
+
+
+def widen_statement(dialect, table, column, length, nullable):
+    """
+    Returns the statement making a VARCHAR column longer, or None when the database needs none.
+
+    Parameters:
+    dialect (str): Name of the SQLAlchemy dialect of the database.
+    table (str): Name of the table.
+    column (str): Name of the column.
+    length (int): New length of the column.
+    nullable (bool): Whether the column accepts NULL, restated where the column is redefined.
+
+    Returns:
+    str: The statement, None for SQLite, which does not enforce VARCHAR lengths.
+    """
+    if dialect == 'sqlite':
+        return None
+    if dialect in ('mysql', 'mariadb'):
+        return f"ALTER TABLE {table} MODIFY {column} VARCHAR({length}){'' if nullable else ' NOT NULL'}"
+    return f"ALTER TABLE {table} ALTER COLUMN {column} TYPE VARCHAR({length})"
+
+
+def migrate_database():
+    """
+    Adds the columns missing from the tables of an existing database and widens the columns
+    listed in WIDENED_COLUMNS. Must be called within the app context.
+    """
+    inspector = inspect(db.engine)
+    for table, columns in MIGRATIONS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for column, statement in columns.items():
+            if column not in existing:
+                db.session.execute(text(statement))
+    for table, columns in WIDENED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        for column in inspector.get_columns(table):
+            length = columns.get(column['name'])
+            current = getattr(column['type'], 'length', None)
+            if length is None or current is None or current >= length:
+                continue
+            statement = widen_statement(db.engine.dialect.name, table, column['name'], length, column['nullable'])
+            if statement:
+                db.session.execute(text(statement))
+    db.session.commit()
+
+
 # Check if the script is executed directly (and not imported)
 if __name__ == '__main__':
     # Create the Flask app by calling the create_app function
@@ -40,6 +110,7 @@ if __name__ == '__main__':
     # Create all database tables within the app's context
     with main.app_context():
         db.create_all()
+        migrate_database()
 
     # Run the Flask app in debug mode on port 5001
     main.run(debug=True, port=5001)
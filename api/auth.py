@@ -1,3 +1,4 @@
+import hmac
 import jwt
 from flask import current_app
 from datetime import datetime, timedelta
@@ -8,11 +9,11 @@ def generate_token(user_id):
         # Create the payload for the JWT, which includes:
         # 'exp' (Expiration time): The token's expiration time, set to 1 day from now
         # 'iat' (Issued at time): The time the token is issued
-        # 'sub' (Subject): The user ID, representing the token's subject
+        # 'sub' (Subject): The user ID, representing the token's subject, as the string JWT requires
         payload = {
             'exp': datetime.utcnow() + timedelta(days=1),
             'iat': datetime.utcnow(),
-            'sub': user_id
+            'sub': str(user_id)
         }
         # Encode the JWT using the SECRET_KEY from the Flask application's config and return it
         return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
@@ -26,10 +27,28 @@ def decode_token(token):
         # Decode the JWT using the SECRET_KEY from the Flask application's config
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         # Return the 'sub' field from the payload, which contains the user ID
-        return payload['sub']
+        return int(payload['sub'])
     except jwt.ExpiredSignatureError:
         # If the token has expired, return an appropriate error message
         return 'Signature expired. Please log in again.'
-    except jwt.InvalidTokenError:
+    except (jwt.InvalidTokenError, ValueError):
         # If the token is invalid for any other reason, return an appropriate error message
         return 'Invalid token. Please log in again.'
+
+
+def authorize_service(token):
+    """
+    Tells whether a request comes from a logged in user or from a service holding the
+    SERVICE_TOKEN of the app's config, such as the recording daemon.
+
+    Parameters:
+    token (str): The Authorization header of the request.
+
+    Returns:
+    bool: True if the token is a valid user token or the service token.
+    """
+    service_token = current_app.config.get('SERVICE_TOKEN')
+    if service_token and token and hmac.compare_digest(token, service_token):
+        return True
+    # decode_token returns a message instead of a user ID for invalid tokens
+    return isinstance(decode_token(token), int)
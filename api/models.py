@@ -17,8 +17,12 @@ class Camera(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     location = db.Column(db.String(100), nullable=False)
-    ip_address = db.Column(db.String(15), nullable=False)
+    ip_address = db.Column(db.String(512), nullable=False)  # IP address or stream URL, with credentials
     registration_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Polygons as JSON lists of [x, y] points relative to the frame size. Motion and
+    # detections count only inside the regions of interest and outside the exclusions.
+    roi = db.Column(db.Text, nullable=True)
+    exclusions = db.Column(db.Text, nullable=True)
 
 
 class Event(db.Model):
@@ -42,3 +46,14 @@ class Notification(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     notification_type = db.Column(db.String(50), nullable=False)
     creation_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AnalysisMetrics(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    footage_id = db.Column(db.Integer, db.ForeignKey('footage.id'), nullable=True)
+    host = db.Column(db.String(100), nullable=False)
+    file_path = db.Column(db.String(200), nullable=False)
+    wall_time = db.Column(db.Float, nullable=False)
+    cpu_time = db.Column(db.Float, nullable=False)
+    record = db.Column(db.Text, nullable=False)  # Full per-stage metrics as JSON
+    creation_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
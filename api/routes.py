@@ -1,10 +1,11 @@
 from flask import Blueprint, jsonify, request
 from email_helper import send_notifications
-from models import User, Camera, Event, Footage, Notification, db
-from auth import generate_token, decode_token
+from models import User, Camera, Event, Footage, Notification, AnalysisMetrics, db
+from auth import generate_token, decode_token, authorize_service
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import os
+import json
 
 # Create a Blueprint named 'api' to handle routes
 api_bp = Blueprint('api', __name__)
@@ -147,6 +148,42 @@ def upload_profile_picture():
     return jsonify({'message': 'User not authenticated'}), 401
 
 
+def parse_regions(polygons):
+    """
+    Validates a list of region polygons and serializes it for storage.
+
+    Parameters:
+    polygons (list): Polygons as lists of at least 3 [x, y] points, with coordinates
+    between 0 and 1 relative to the frame size. None or an empty list for no regions.
+
+    Returns:
+    str: The polygons as JSON, or None for no regions.
+
+    Raises:
+    ValueError: If the polygons are malformed.
+    """
+    if not polygons:
+        return None
+    if not isinstance(polygons, list):
+        raise ValueError('Regions must be a list of polygons')
+    for polygon in polygons:
+        if not isinstance(polygon, list) or len(polygon) < 3:
+            raise ValueError('Every polygon needs at least 3 points')
+        for point in polygon:
+            if not isinstance(point, list) or len(point) != 2 or \
+                    not all(isinstance(v, (int, float)) and not isinstance(v, bool) and 0 <= v <= 1 for v in point):
+                raise ValueError('Points must be [x, y] pairs between 0 and 1')
+    return json.dumps(polygons)
+
+
+def camera_regions(camera):
+    """
+    Returns the region polygons of a camera as stored by parse_regions.
+    """
+    return {'roi': json.loads(camera.roi) if camera.roi else [],
+            'exclusions': json.loads(camera.exclusions) if camera.exclusions else []}
+
+
 # Route to add a new camera
 @api_bp.route('/add_camera', methods=['POST'])
 def add_camera():
@@ -154,7 +191,13 @@ def add_camera():
     user_id = decode_token(token)
     if user_id:
         data = request.get_json()
-        new_camera = Camera(name=data['name'], location=data['location'], ip_address=data['ip_address'])
+        try:
+            roi = parse_regions(data.get('roi'))
+            exclusions = parse_regions(data.get('exclusions'))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        new_camera = Camera(name=data['name'], location=data['location'], ip_address=data['ip_address'], roi=roi,
+                            exclusions=exclusions)
         db.session.add(new_camera)
         db.session.commit()
         return jsonify({'message': 'Camera added successfully', 'id': new_camera.id})
@@ -169,8 +212,8 @@ def get_cameras():
     if user_id:
         cameras = Camera.query.all()
         camera_list = [
-            {'id': camera.id, 'name': camera.name, 'location': camera.location, 'ip_address': camera.ip_address} for
-            camera in cameras]
+            {'id': camera.id, 'name': camera.name, 'location': camera.location, 'ip_address': camera.ip_address,
+             **camera_regions(camera)} for camera in cameras]
         return jsonify({'cameras': camera_list})
     return jsonify({'message': 'User not authenticated'}), 401
 
@@ -184,6 +227,14 @@ def update_camera(camera_id):
         camera = Camera.query.get(camera_id)
         if camera:
             data = request.get_json()
+            try:
+                # Regions are replaced when given, an empty list removes them
+                if 'roi' in data:
+                    camera.roi = parse_regions(data['roi'])
+                if 'exclusions' in data:
+                    camera.exclusions = parse_regions(data['exclusions'])
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
             camera.name = data.get('name', camera.name)
             camera.location = data.get('location', camera.location)
             camera.ip_address = data.get('ip_address', camera.ip_address)
@@ -193,6 +244,26 @@ def update_camera(camera_id):
     return jsonify({'message': 'User not authenticated'}), 401
 
 
+# Route to get the regions of interest and exclusion zones of a camera, read by the recorders and the analysis
+@api_bp.route('/get_camera_regions/<int:camera_id>', methods=['GET'])
+def get_camera_regions(camera_id):
+    camera = Camera.query.get(camera_id)
+    if camera:
+        return jsonify({'id': camera.id, **camera_regions(camera)})
+    return jsonify({'message': 'Camera not found'}), 404
+
+
+# Route to get the stream address and regions of every camera, read by the recording daemon
+@api_bp.route('/get_camera_streams', methods=['GET'])
+def get_camera_streams():
+    # Addresses may be stream URLs with credentials, only users and the recording daemon may read them
+    if not authorize_service(request.headers.get('Authorization')):
+        return jsonify({'message': 'User not authenticated'}), 401
+    cameras = Camera.query.all()
+    return jsonify({'cameras': [{'id': camera.id, 'name': camera.name, 'ip_address': camera.ip_address,
+                                 **camera_regions(camera)} for camera in cameras]})
+
+
 # Route to delete a specific camera
 @api_bp.route('/delete_camera/<int:camera_id>', methods=['DELETE'])
 def delete_camera(camera_id):
@@ -272,6 +343,61 @@ def insert_footage():
     return jsonify({'message': 'Footage inserted successfully', 'id': new_footage.id})
 
 
+def parse_metrics(data):
+    """
+    Validates the body of an insert_metrics request.
+
+    Parameters:
+    data (dict): The request body, with the metrics record and optionally the footage id.
+
+    Returns:
+    dict: The metrics record.
+
+    Raises:
+    ValueError: If the body or the record is malformed.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('metrics'), dict):
+        raise ValueError('The body must be a JSON object with a metrics object')
+    footage_id = data.get('footage_id')
+    if footage_id is not None and (not isinstance(footage_id, int) or isinstance(footage_id, bool)):
+        raise ValueError('footage_id must be an integer')
+    record = data['metrics']
+    for field in ('wall', 'cpu'):
+        if not isinstance(record.get(field), (int, float)) or isinstance(record.get(field), bool):
+            raise ValueError(f'metrics.{field} must be a number of seconds')
+    for field in ('host', 'file_path'):
+        if not isinstance(record.get(field, ''), str):
+            raise ValueError(f'metrics.{field} must be a string')
+    return record
+
+
+# Route to insert the per-stage metrics of an analyzed clip
+@api_bp.route('/insert_metrics', methods=['POST'])
+def insert_metrics():
+    data = request.get_json(silent=True)
+    try:
+        record = parse_metrics(data)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    new_metrics = AnalysisMetrics(footage_id=data.get('footage_id'), host=record.get('host', ''),
+                                  file_path=record.get('file_path', ''), wall_time=record['wall'],
+                                  cpu_time=record['cpu'], record=json.dumps(record),
+                                  creation_timestamp=datetime.utcnow())
+    db.session.add(new_metrics)
+    db.session.commit()
+    return jsonify({'message': 'Metrics inserted successfully', 'id': new_metrics.id})
+
+
+# Route to get the metrics of all analyzed clips
+@api_bp.route('/get_metrics', methods=['GET'])
+def get_metrics():
+    metrics = AnalysisMetrics.query.order_by(AnalysisMetrics.id).all()
+    metrics_list = [{'id': entry.id, 'footage_id': entry.footage_id, 'host': entry.host, 'file_path': entry.file_path,
+                     'wall_time': entry.wall_time, 'cpu_time': entry.cpu_time, 'record': json.loads(entry.record),
+                     'creation_timestamp': entry.creation_timestamp} for entry in metrics]
+    return jsonify({'metrics': metrics_list})
+
+
 # Route to get all notifications
 @api_bp.route('/get_notifications', methods=['GET'])
 def get_notifications():
@@ -0,0 +1,307 @@
+import os
+import time
+import queue
+from collections import deque
+from multiprocessing import Process, Queue
+from config import ANALYSIS_WORKERS, DETECTOR_THREADS, PIN_WORKER_CPUS, DEGRADE_QUEUE_DEPTHS
+from job_ledger import camera_of
+from regions import load_camera_regions
+
+# Throughput is reported over the clips finished in this many last seconds
+THROUGHPUT_WINDOW = 600
+# The average latency is taken over this many last clips
+LATENCY_SAMPLES = 1000
+
+# process_video settings from full quality to the cheapest. Under load the strided
+# frames are tracked by prediction only and the recording is copied without drawing.
+ANALYSIS_PROFILES = [
+    {},
+    {'stride': 2, 'annotate': False},
+    {'stride': 4, 'annotate': False, 'imgsz': 416},
+]
+
+
+def select_profile(depth, thresholds=DEGRADE_QUEUE_DEPTHS):
+    """
+    Picks the analysis profile for the current backlog.
+
+    Parameters:
+    depth (int): Number of clips waiting or being analyzed.
+    thresholds (list): Depths from which the next profile is used.
+
+    Returns:
+    int: Index in ANALYSIS_PROFILES.
+    """
+    level = sum(1 for threshold in thresholds if depth >= threshold)
+    return min(level, len(ANALYSIS_PROFILES) - 1)
+
+
+def available_cpus():
+    """
+    Returns the CPU cores this process may run on.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(cpus, workers):
+    """
+    Splits the CPU cores into one contiguous share per worker.
+
+    Parameters:
+    cpus (list): Available core numbers.
+    workers (int): Number of workers.
+
+    Returns:
+    list: The cores of every worker. With more workers than cores, workers share cores round-robin.
+    """
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    size, extra = divmod(len(cpus), workers)
+    shares = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        shares.append(cpus[start:end])
+        start = end
+    return shares
+
+
+def limit_cpus(cpus, threads):
+    """
+    Pins the current process to the given cores and caps the native thread pools.
+
+    Must run before torch or numpy start their thread pools, i.e. before importing them.
+
+    Parameters:
+    cpus (list): Cores the process may run on, None to keep the current affinity.
+    threads (int): Threads for the BLAS and OpenMP pools.
+    """
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = str(threads)
+
+
+def analysis_worker(job_queue, result_queue, cpus=None, threads=DETECTOR_THREADS):
+    """
+    Long-lived worker that loads the models once and analyzes clips from the job queue.
+
+    Parameters:
+    job_queue (multiprocessing.Queue): (job id, path, profile) of the clips to analyze, None stops the worker.
+    result_queue (multiprocessing.Queue): Receives a 'started' and a 'done' result dictionary per job.
+    cpus (list): Cores to pin the worker to, None to run on any core.
+    threads (int): Inference threads, 0 for one per assigned core or the library default when not pinned.
+    """
+    if cpus:
+        threads = threads or len(cpus)
+    if threads:
+        limit_cpus(cpus, threads)
+
+    # Imported here so that only the workers pay for torch and ultralytics
+    import movement_analysis
+
+    load_start = time.perf_counter()
+    movement_analysis.load_models(threads)
+    result_queue.put({'event': 'ready', 'pid': os.getpid(), 'load_time': time.perf_counter() - load_start,
+                      'cpus': cpus, 'threads': threads})
+
+    while True:
+        job = job_queue.get()
+        if job is None:  # Sentinel value to exit the loop
+            break
+        job_id, file_path, profile = job
+
+        print(f"Analyzing video {file_path}")
+        result_queue.put({'event': 'started', 'pid': os.getpid(), 'job_id': job_id, 'file_path': file_path,
+                          'profile': profile})
+        start = time.perf_counter()
+        error = None
+        try:
+            # Clips named after their camera are analyzed inside its regions of interest
+            regions = load_camera_regions(camera_of(file_path))
+            movement_analysis.process_video(file_path, regions=regions, **ANALYSIS_PROFILES[profile])
+        except Exception as e:
+            error = str(e)
+            print(f"An error occurred while analyzing {file_path}: {e}")
+
+        result_queue.put({'event': 'done', 'pid': os.getpid(), 'job_id': job_id, 'file_path': file_path,
+                          'profile': profile, 'latency': time.perf_counter() - start, 'error': error})
+
+
+class AnalysisService:
+    """
+    Keeps a fixed number of warm analysis workers and hands clips to them.
+
+    The CPU cores are split between the workers so that their inference thread
+    pools don't compete for the same cores. Every worker has its own job queue and
+    clips go to the worker with the fewest, so the service always knows which clips
+    a worker holds. A worker that dies is replaced, the clip it was analyzing is
+    reported as failed so that it can be retried, and the clips it had not started,
+    including one it took but did not report, go to its replacement.
+    """
+
+    def __init__(self, workers=ANALYSIS_WORKERS, pin_cpus=PIN_WORKER_CPUS, threads=DETECTOR_THREADS,
+                 target=analysis_worker):
+        self.workers = workers
+        self.pin_cpus = pin_cpus
+        self.threads = threads
+        self.target = target
+        self.result_queue = Queue()
+        self.processes = []
+        self.job_queues = []
+        self.shares = []
+        self.assigned = []  # (job id, path, profile) of the clips handed to every worker and not done yet
+        self.running_jobs = {}  # The 'started' result of the clip every worker is analyzing, by pid
+        self.stopping = False
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.submitted = 0
+        self.started = 0
+        self.done = 0
+        self.failed = 0
+        self.finish_times = deque()
+
+    def start(self):
+        """
+        Starts the worker processes. Each one loads the models before taking its first job.
+        """
+        if self.pin_cpus:
+            shares = split_cpus(available_cpus(), self.workers)
+        else:
+            shares = [None] * self.workers
+        for cpus in shares:
+            self.shares.append(cpus)
+            self.assigned.append(deque())
+            self.processes.append(None)
+            self.job_queues.append(None)
+            self.start_worker(len(self.processes) - 1)
+
+    def start_worker(self, index):
+        """
+        Starts the worker at index on its share of the cores, with a new job queue.
+        """
+        self.job_queues[index] = Queue()
+        self.processes[index] = Process(target=self.target, args=(self.job_queues[index], self.result_queue,
+                                                                  self.shares[index], self.threads))
+        self.processes[index].start()
+
+    def submit(self, file_path, job_id=None, profile=0):
+        """
+        Queues a clip for analysis by the next free worker.
+
+        Parameters:
+        file_path (str): Path to the clip.
+        job_id (str): Identifier returned with the job's results.
+        profile (int): Index of the analysis settings in ANALYSIS_PROFILES.
+        """
+        index = min(range(len(self.processes)), key=lambda i: len(self.assigned[i]))
+        job = (job_id, file_path, profile)
+        self.assigned[index].append(job)
+        self.job_queues[index].put(job)
+        self.submitted += 1
+
+    def poll_results(self):
+        """
+        Collects the results reported by the workers since the last call.
+
+        Returns:
+        list: Result dictionaries, 'ready' events carry the model load time and the
+        assigned cores, 'started' events the clip a worker took and 'done' events the
+        per-job latency in seconds. The clip of a worker that died is reported as a
+        'done' event with an error.
+        """
+        results = []
+        while True:
+            try:
+                result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.record(result)
+            results.append(result)
+        return results + self.replace_dead_workers()
+
+    def record(self, result):
+        """
+        Updates the counters with a result reported by a worker.
+        """
+        if result['event'] == 'started':
+            self.started += 1
+            self.running_jobs[result['pid']] = result
+        elif result['event'] == 'done':
+            self.running_jobs.pop(result['pid'], None)
+            job = (result['job_id'], result['file_path'], result['profile'])
+            for assigned in self.assigned:
+                if job in assigned:
+                    assigned.remove(job)
+                    break
+            self.done += 1
+            self.latencies.append(result['latency'])
+            self.finish_times.append(time.monotonic())
+            if result['error']:
+                self.failed += 1
+
+    def replace_dead_workers(self):
+        """
+        Starts a new worker in place of every worker that exited and fails the clip it was
+        analyzing. The clips it had not reported as started are handed to the new worker.
+
+        Returns:
+        list: A 'done' result with an error for every clip a dead worker was analyzing.
+        """
+        results = []
+        if self.stopping:
+            return results
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            print(f"Analysis worker {process.pid} died with exit code {process.exitcode}, starting a new one")
+            started = self.running_jobs.get(process.pid)
+            if started is not None:
+                result = {'event': 'done', 'pid': process.pid, 'job_id': started['job_id'],
+                          'file_path': started['file_path'], 'profile': started['profile'], 'latency': 0.0,
+                          'error': f"Analysis worker died with exit code {process.exitcode}"}
+                self.record(result)
+                results.append(result)
+            process.join()
+            self.start_worker(index)
+            for job in self.assigned[index]:
+                self.job_queues[index].put(job)
+        return results
+
+    def throughput(self):
+        """
+        Returns the number of clips finished per minute over the last THROUGHPUT_WINDOW seconds.
+        """
+        now = time.monotonic()
+        while self.finish_times and now - self.finish_times[0] > THROUGHPUT_WINDOW:
+            self.finish_times.popleft()
+        return len(self.finish_times) * 60 / THROUGHPUT_WINDOW
+
+    def status(self):
+        """
+        Returns the state of the queue, as of the last poll_results() call.
+
+        Returns:
+        dict: Clips waiting for a worker ('queued'), being analyzed ('in_flight'),
+        finished ('done', including the 'failed' ones) and the throughput in clips per minute.
+        """
+        return {'queued': self.submitted - self.started, 'in_flight': self.started - self.done, 'done': self.done,
+                'failed': self.failed, 'throughput': self.throughput()}
+
+    def average_latency(self):
+        """
+        Returns the mean latency of the last LATENCY_SAMPLES finished jobs in seconds, or 0 if none finished yet.
+        """
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0
+
+    def stop(self):
+        """
+        Lets the workers finish the queued jobs and waits for them to exit.
+        """
+        self.stopping = True
+        for job_queue in self.job_queues:
+            job_queue.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
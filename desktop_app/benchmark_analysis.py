@@ -0,0 +1,99 @@
+import os
+import argparse
+import tempfile
+import numpy as np
+from collections import defaultdict
+from scipy.optimize import linear_sum_assignment
+import movement_analysis
+from iou_tracker import pairwise_iou
+
+
+def boxes_by_frame(track_rows):
+    """
+    Groups the track rows reported by process_video by frame.
+
+    Parameters:
+    track_rows (list): Rows with the fields of track_store.TRACK_COLUMNS.
+
+    Returns:
+    dict: Frame index to an array of boxes of shape (n, 4).
+    """
+    frames = defaultdict(list)
+    for row in track_rows:
+        frames[row[0]].append(row[5:9])
+    return {frame_index: np.array(boxes, dtype=float) for frame_index, boxes in frames.items()}
+
+
+def compare_tracks(reference_rows, candidate_rows, iou_threshold=0.5):
+    """
+    Compares the confirmed track boxes of a candidate run against a reference run, frame by frame.
+
+    Parameters:
+    reference_rows (list): Track rows of the full per-frame analysis.
+    candidate_rows (list): Track rows of the analysis being evaluated.
+    iou_threshold (float): Minimum IoU for two boxes to count as the same object.
+
+    Returns:
+    dict: Recall and precision of the candidate boxes, mean IoU of the matched boxes
+    and the number of distinct track IDs in each run.
+    """
+    reference = boxes_by_frame(reference_rows)
+    candidate = boxes_by_frame(candidate_rows)
+    matched_ious = []
+    for frame_index, reference_boxes in reference.items():
+        candidate_boxes = candidate.get(frame_index)
+        if candidate_boxes is None:
+            continue
+        iou = pairwise_iou(reference_boxes, candidate_boxes)
+        rows, cols = linear_sum_assignment(-iou)
+        matched_ious.extend(value for value in iou[rows, cols] if value >= iou_threshold)
+
+    reference_count = sum(len(boxes) for boxes in reference.values())
+    candidate_count = sum(len(boxes) for boxes in candidate.values())
+    return {
+        'recall': len(matched_ious) / reference_count if reference_count else 1.0,
+        'precision': len(matched_ious) / candidate_count if candidate_count else 1.0,
+        'mean_iou': float(np.mean(matched_ious)) if matched_ious else 0.0,
+        'reference_tracks': len({row[2] for row in reference_rows}),
+        'candidate_tracks': len({row[2] for row in candidate_rows})
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a reduced analysis mode against full per-frame analysis.")
+    parser.add_argument('file_path', help="Clip to analyze")
+    parser.add_argument('--stride', type=int, default=3, help="Detection stride of the evaluated mode")
+    parser.add_argument('--motion-gate', action='store_true', help="Enable the motion gate in the evaluated mode")
+    parser.add_argument('--batch-size', type=int, default=movement_analysis.BATCH_SIZE)
+    args = parser.parse_args()
+
+    movement_analysis.load_models()
+    # Warm the model up so that the first run does not pay for lazy initialization
+    movement_analysis.detect_objects([np.zeros((480, 640, 3), dtype=np.uint8)])
+
+    # Only the analysis is measured: no encoding, no upload, and the outputs go to a temporary
+    # analyses folder instead of overwriting the real ones
+    file_path = os.path.abspath(args.file_path)
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as output_dir:
+        os.chdir(output_dir)
+        try:
+            full = movement_analysis.process_video(file_path, batch_size=args.batch_size, stride=1,
+                                                   motion_gate=False, annotate=False, upload=False,
+                                                   send_metrics_to_api=False)
+            reduced = movement_analysis.process_video(file_path, batch_size=args.batch_size, stride=args.stride,
+                                                      motion_gate=args.motion_gate, annotate=False, upload=False,
+                                                      send_metrics_to_api=False)
+        finally:
+            os.chdir(working_dir)
+    accuracy = compare_tracks(full['tracks'], reduced['tracks'])
+
+    print(f"Frames: {full['frames']}")
+    print(f"Full analysis:    {full['frames_inferred']} frames inferred in {full['analysis_time']:.2f}s")
+    print(f"Reduced analysis: {reduced['frames_inferred']} frames inferred, {reduced['frames_skipped']} skipped "
+          f"in {reduced['analysis_time']:.2f}s (stride {args.stride}, motion gate "
+          f"{'on' if args.motion_gate else 'off'})")
+    print(f"Speedup: {full['analysis_time'] / max(reduced['analysis_time'], 1e-9):.2f}x")
+    print(f"Box recall: {accuracy['recall']:.3f}, precision: {accuracy['precision']:.3f}, "
+          f"mean IoU: {accuracy['mean_iou']:.3f}")
+    print(f"Distinct tracks: {accuracy['reference_tracks']} full, {accuracy['candidate_tracks']} reduced")
@@ -0,0 +1,109 @@
+import os
+import time
+import argparse
+import threading
+import tempfile
+import cv2
+import numpy as np
+from motion import detect_motion_boxes, non_max_suppression
+from recorder import ClipRecorder, ClipWriter, SegmentController
+from display import DisplayBuffers, grid_shape
+from benchmark_motion import synthetic_frames, RESOLUTIONS
+from pipeline_metrics import cpu_time
+
+
+def run_camera(frames, tile, duration, results, camera=''):
+    """
+    Processes frames as fast as possible for duration seconds, doing the per-frame work of
+    the desktop VideoThread: pre-roll, motion detection, suppression, segmenting, and the
+    tile-sized display copy with the boxes drawn on it.
+
+    Parameters:
+    frames (list): Frames of the camera, looped.
+    tile (tuple): Width and height of the camera's tile.
+    duration (float): Seconds to run.
+    results (list): Receives the number of processed frames.
+    camera (str): ID of the camera, keeps the clips of the cameras apart.
+    """
+    mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True)
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Clips are written to a temporary folder and thrown away
+        writer = ClipWriter(cv2.VideoWriter_fourcc(*'mp4v'), camera=camera)
+        recorder = ClipRecorder(None, writer=writer, output_dir=output_dir, camera=camera)
+        segments = SegmentController()
+        display = DisplayBuffers(0)
+        display.set_area(*tile)
+        processed = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            frame = frames[processed % len(frames)]
+            timestamp = time.time()
+            recorder.push(frame, timestamp)
+            detection, _, boxes = detect_motion_boxes(frame, mog2)
+            action = segments.update(detection, timestamp)
+            if action == 'start':
+                recorder.start()
+            elif action == 'stop':
+                recorder.stop()
+            elif action == 'split':
+                recorder.split()
+            if len(boxes) > 0:
+                boxes = boxes[non_max_suppression(boxes, 0.3)]
+
+            def overlay(image, scale):
+                for x1, y1, x2, y2 in np.round(boxes * scale).astype(int):
+                    cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+            display.publish(frame, timestamp, overlay)
+            display.take()
+            processed += 1
+        recorder.close()
+        writer.stop()
+    results.append(processed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the aggregate throughput of the desktop monitor's "
+                                                 "camera pipelines running concurrently.")
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default='720p')
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run")
+    parser.add_argument('--threads', type=int, default=0, help="OpenCV threads, 0 for the default")
+    parser.add_argument('--cores', type=int, default=0, help="Run on this many cores only, 0 for all of them")
+    args = parser.parse_args()
+
+    if args.cores:
+        if not hasattr(os, 'sched_setaffinity'):
+            parser.error("--cores needs a platform with CPU affinity, e.g. Linux")
+        available = sorted(os.sched_getaffinity(0))
+        if args.cores > len(available):
+            parser.error(f"--cores {args.cores} but only {len(available)} cores are available")
+        os.sched_setaffinity(0, available[:args.cores])
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+    width, height = RESOLUTIONS[args.resolution]
+    frames = synthetic_frames(width, height, 60)
+
+    # cores busy is the CPU time over the wall time, up to the number of cores when the cameras run in parallel
+    print(f"{cores} cores, {args.resolution}")
+    print(f"{'cameras':>8} {'tile':>9} {'fps total':>10} {'fps/camera':>11} {'cpu ms/frame':>13} {'cores busy':>11}")
+    for count in args.cameras:
+        # Tiles of the 800x600 video area, as the monitor lays them out
+        columns, rows = grid_shape(count)
+        tile = (800 // columns, 600 // rows)
+        results = []
+        threads = [threading.Thread(target=run_camera, args=(frames, tile, args.duration, results, str(index + 1)))
+                   for index in range(count)]
+        start_cpu = cpu_time()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        used_cpu = cpu_time() - start_cpu
+        total = sum(results)
+        print(f"{count:8d} {f'{tile[0]}x{tile[1]}':>9} {total / elapsed:10.1f} {total / elapsed / count:11.1f} "
+              f"{1000 * used_cpu / total:13.2f} {used_cpu / elapsed:11.2f}")
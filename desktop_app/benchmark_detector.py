@@ -0,0 +1,109 @@
+import time
+import argparse
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from detector import load_detector
+from iou_tracker import pairwise_iou
+from config import BATCH_SIZE, DETECTOR_IMGSZ, DETECTOR_THREADS
+
+
+def read_frames(video_path, limit):
+    """
+    Decodes up to limit frames of the reference clip.
+
+    Parameters:
+    video_path (str): Path to the reference clip.
+    limit (int): Maximum number of frames.
+
+    Returns:
+    list: The decoded frames.
+    """
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_detector(detector, frames, batch_size):
+    """
+    Runs a detector over the frames in batches and times every call.
+
+    Parameters:
+    detector (callable): Detector returned by load_detector.
+    frames (list): Frames to detect objects in.
+    batch_size (int): Number of frames per call.
+
+    Returns:
+    tuple: Detections of every frame and the latency of every call in seconds.
+    """
+    # Warm-up call, the first inference pays for lazy initialization
+    detector(frames[:1])
+
+    detections = []
+    latencies = []
+    for start in range(0, len(frames), batch_size):
+        batch_start = time.perf_counter()
+        detections.extend(detector(frames[start:start + batch_size]))
+        latencies.append(time.perf_counter() - batch_start)
+    return detections, latencies
+
+
+def agreement(reference, candidate, iou_threshold=0.5):
+    """
+    Measures how many detections two backends agree on, frame by frame.
+
+    Parameters:
+    reference (list): Per frame detections of the reference backend.
+    candidate (list): Per frame detections of the evaluated backend.
+    iou_threshold (float): Minimum IoU for two boxes of the same class to match.
+
+    Returns:
+    float: F1 score of the candidate detections against the reference ones.
+    """
+    matched = 0
+    reference_count = sum(len(boxes) for boxes in reference)
+    candidate_count = sum(len(boxes) for boxes in candidate)
+    for reference_boxes, candidate_boxes in zip(reference, candidate):
+        if len(reference_boxes) == 0 or len(candidate_boxes) == 0:
+            continue
+        iou = pairwise_iou(reference_boxes[:, :4], candidate_boxes[:, :4])
+        # Boxes of different classes never match
+        iou[reference_boxes[:, None, 5] != candidate_boxes[None, :, 5]] = 0
+        rows, cols = linear_sum_assignment(-iou)
+        matched += int(np.count_nonzero(iou[rows, cols] >= iou_threshold))
+    if reference_count + candidate_count == 0:
+        return 1.0
+    return 2 * matched / (reference_count + candidate_count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare detector backends on a reference clip.")
+    parser.add_argument('file_path', help="Reference clip")
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8'],
+                        help="Backends to compare, the first one is the reference for agreement")
+    parser.add_argument('--imgsz', type=int, default=DETECTOR_IMGSZ)
+    parser.add_argument('--threads', type=int, default=DETECTOR_THREADS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--frames', type=int, default=200, help="Number of frames of the clip to use")
+    args = parser.parse_args()
+
+    frames = read_frames(args.file_path, args.frames)
+    print(f"{len(frames)} frames, imgsz {args.imgsz}, {args.threads or 'default'} threads, "
+          f"batch size {args.batch_size}")
+
+    reference = None
+    for backend in args.backends:
+        detections, latencies = run_detector(load_detector(backend, args.imgsz, args.threads), frames,
+                                             args.batch_size)
+        if reference is None:
+            reference = detections
+        total = sum(latencies)
+        print(f"{backend:>10}: {1000 * total / len(frames):7.2f} ms/frame, "
+              f"{1000 * np.percentile(latencies, 95):8.2f} ms p95 per batch, "
+              f"{len(frames) / total:6.2f} frames/s, agreement {agreement(reference, detections):.3f}")
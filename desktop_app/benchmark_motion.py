@@ -0,0 +1,113 @@
+import time
+import argparse
+import cv2
+import numpy as np
+from motion import detect_movement, detect_motion_boxes, MIN_MOTION_AREA
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080)}
+
+
+def synthetic_frames(width, height, count, seed=0):
+    """
+    Generates a noisy static scene with a few moving blocks.
+
+    Parameters:
+    width (int): Frame width.
+    height (int): Frame height.
+    count (int): Number of frames.
+    seed (int): Seed of the noise.
+
+    Returns:
+    list: The frames.
+    """
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        frame += rng.integers(0, 6, frame.shape, dtype=np.uint8)  # Sensor noise
+        for block in range(3):
+            x = (i * (8 + 4 * block) + block * width // 3) % (width - width // 8)
+            y = height // 4 + block * height // 5
+            cv2.rectangle(frame, (x, y), (x + width // 10, y + height // 6), (40 + 80 * block, 200, 90), -1)
+        frames.append(frame)
+    return frames
+
+
+def read_clip(video_path, width, height, count):
+    """
+    Decodes up to count frames of a clip, resized to the given resolution.
+    """
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    return frames
+
+
+def full_resolution_boxes(frame, mog2):
+    """
+    The original desktop path: full resolution color detection and a Python loop over the contours.
+    """
+    _, _, contours = detect_movement(frame, mog2)
+    boxes = []
+    for contour in contours:
+        if cv2.contourArea(contour) > MIN_MOTION_AREA:
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append([x, y, x + w, y + h])
+    return boxes
+
+
+def cpu_per_frame(frames, detect, warmup=20):
+    """
+    Runs a motion detector over the frames with a fresh background model.
+
+    Parameters:
+    frames (list): Frames to process.
+    detect (callable): Takes a frame and the background subtractor.
+    warmup (int): Frames used to learn the background before timing.
+
+    Returns:
+    tuple: CPU and wall milliseconds per frame, and the mean number of boxes per frame.
+    """
+    mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True)
+    for frame in frames[:warmup]:
+        detect(frame, mog2)
+    boxes = 0
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    for frame in frames[warmup:]:
+        boxes += len(detect(frame, mog2))
+    count = len(frames) - warmup
+    return (1000 * (time.process_time() - start_cpu) / count, 1000 * (time.perf_counter() - start_wall) / count,
+            boxes / count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the CPU cost of motion detection per frame and scale.")
+    parser.add_argument('--clip', help="Clip to use instead of synthetic frames")
+    parser.add_argument('--frames', type=int, default=120, help="Number of frames per resolution")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.5, 0.25])
+    parser.add_argument('--threads', type=int, default=1, help="OpenCV threads, 0 for the default")
+    args = parser.parse_args()
+
+    # One thread by default so that CPU time is comparable between machines
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+
+    print(f"{'resolution':>10} {'mode':>16} {'cpu ms/frame':>13} {'wall ms/frame':>14} {'boxes/frame':>12}")
+    for name, (width, height) in RESOLUTIONS.items():
+        if args.clip:
+            frames = read_clip(args.clip, width, height, args.frames)
+        else:
+            frames = synthetic_frames(width, height, args.frames)
+
+        cpu, wall, boxes = cpu_per_frame(frames, full_resolution_boxes)
+        print(f"{name:>10} {'original':>16} {cpu:13.2f} {wall:14.2f} {boxes:12.2f}")
+        for scale in args.scales:
+            cpu, wall, boxes = cpu_per_frame(frames, lambda frame, mog2: detect_motion_boxes(frame, mog2, scale)[2])
+            print(f"{name:>10} {f'gray x{scale:g}':>16} {cpu:13.2f} {wall:14.2f} {boxes:12.2f}")
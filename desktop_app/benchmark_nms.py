@@ -0,0 +1,85 @@
+import time
+import argparse
+import numpy as np
+from motion import non_max_suppression
+
+
+def loop_non_max_suppression(boxes, overlap_thresh):
+    """
+    The original desktop implementation, one np.delete per kept box. Kept as the reference.
+    """
+    if len(boxes) == 0:
+        return []
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float")
+
+    pick = []
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = boxes[:, 2]
+    y2 = boxes[:, 3]
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    idxs = y2
+    idxs = idxs.argsort()
+
+    while len(idxs) > 0:
+        last = len(idxs) - 1
+        i = idxs[last]
+        pick.append(i)
+        xx1 = np.maximum(x1[i], x1[idxs[:last]])
+        yy1 = np.maximum(y1[i], y1[idxs[:last]])
+        xx2 = np.minimum(x2[i], x2[idxs[:last]])
+        yy2 = np.minimum(y2[i], y2[idxs[:last]])
+        w = np.maximum(0, xx2 - xx1 + 1)
+        h = np.maximum(0, yy2 - yy1 + 1)
+        overlap = (w * h) / area[idxs[:last]]
+        idxs = np.delete(idxs, np.concatenate(([last], np.where(overlap > overlap_thresh)[0])))
+
+    return pick
+
+
+def random_boxes(count, width=1920, height=1080, max_size=200, seed=0):
+    """
+    Generates integer x1, y1, x2, y2 boxes scattered over a frame.
+
+    Parameters:
+    count (int): Number of boxes.
+    width (int): Frame width.
+    height (int): Frame height.
+    max_size (int): Largest box side.
+    seed (int): Seed of the generator.
+
+    Returns:
+    numpy.ndarray: Array of shape (count, 4).
+    """
+    rng = np.random.default_rng(seed)
+    corners = rng.integers(0, [width, height], (count, 2))
+    sizes = rng.integers(1, max_size, (count, 2))
+    return np.hstack([corners, corners + sizes])
+
+
+def ms_per_call(nms, boxes, overlap_thresh, repeat):
+    """
+    Returns the mean milliseconds of a call and the picks of the last one.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        pick = nms(boxes, overlap_thresh)
+    return 1000 * (time.perf_counter() - start) / repeat, pick
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the loop and the vectorized non-max suppression.")
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 500, 1000, 5000])
+    parser.add_argument('--overlap', type=float, default=0.3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} {'kept':>6} {'loop ms':>9} {'vectorized ms':>14} {'speedup':>8}")
+    for count in args.counts:
+        boxes = random_boxes(count)
+        repeat = max(1, args.repeat * 100 // count)
+        loop_ms, loop_pick = ms_per_call(loop_non_max_suppression, boxes, args.overlap, repeat)
+        vector_ms, vector_pick = ms_per_call(non_max_suppression, boxes, args.overlap, repeat)
+        assert loop_pick == vector_pick, "The picks differ"
+        print(f"{count:>6} {len(vector_pick):>6} {loop_ms:9.3f} {vector_ms:14.3f} {loop_ms / vector_ms:7.1f}x")
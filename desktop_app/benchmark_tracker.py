@@ -0,0 +1,48 @@
+import time
+import argparse
+import numpy as np
+import movement_analysis
+from benchmark_detector import read_frames
+
+
+def time_tracker(tracker, frames, detections):
+    """
+    Feeds precomputed detections to a tracker and times every update.
+
+    Parameters:
+    tracker (DeepSort or IouTracker): Tracker returned by create_tracker.
+    frames (list): Frames of the clip.
+    detections (list): Detections of every frame, as returned by detect_objects.
+
+    Returns:
+    tuple: Update time of every frame in seconds and the set of confirmed track IDs.
+    """
+    timings = []
+    track_ids = set()
+    for frame, frame_detections in zip(frames, detections):
+        start = time.perf_counter()
+        tracks = tracker.update_tracks(frame_detections, frame=frame)
+        timings.append(time.perf_counter() - start)
+        track_ids.update(track.track_id for track in tracks if track.is_confirmed())
+    return timings, track_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the per-frame cost of the trackers on a clip.")
+    parser.add_argument('file_path', help="Reference clip")
+    parser.add_argument('--frames', type=int, default=200, help="Number of frames of the clip to use")
+    args = parser.parse_args()
+
+    movement_analysis.load_models()
+    frames = read_frames(args.file_path, args.frames)
+
+    # Detect once so that both trackers see exactly the same detections
+    detections = []
+    for start in range(0, len(frames), movement_analysis.BATCH_SIZE):
+        detections.extend(movement_analysis.detect_objects(frames[start:start + movement_analysis.BATCH_SIZE]))
+    print(f"{len(frames)} frames, {sum(len(frame_detections) for frame_detections in detections)} detections")
+
+    for kind in ['deepsort', 'iou']:
+        timings, track_ids = time_tracker(movement_analysis.create_tracker(kind), frames, detections)
+        print(f"{kind:>8}: {1000 * np.mean(timings):7.3f} ms/frame mean, "
+              f"{1000 * np.percentile(timings, 95):7.3f} ms p95, {len(track_ids)} confirmed tracks")
@@ -0,0 +1,248 @@
+import sys
+import time
+import signal
+import threading
+import cv2
+import requests
+from motion import detect_motion_boxes
+from recorder import ClipRecorder, SegmentController
+from capture import ReconnectingCapture
+from regions import RegionMask, API_URL
+from config import RECORDING_FOURCC, CAMERA_URL_TEMPLATE, CAMERA_REFRESH_SECONDS, DAEMON_STATS_SECONDS, \
+    API_TOKEN, camera_source
+
+# Headless recorder for the cameras of the Camera table, without the desktop window.
+# Every camera gets a decode thread that reconnects with backoff and a processing thread
+# running motion detection and the clip recorder, as the desktop monitor does for its camera.
+# Clips are named after their camera, e.g. 20240518_101500_cam2.mp4, and picked up by the watcher.
+
+
+def stream_url(address, template=CAMERA_URL_TEMPLATE):
+    """
+    Returns what OpenCV opens for a camera's stored address.
+
+    Parameters:
+    address (str): The ip_address of the camera, an IP address, a stream URL or a device index.
+    template (str): URL of a camera's stream, with {ip} replaced by its address.
+
+    Returns:
+    int or str: The device index or the stream URL.
+    """
+    address = address.strip()
+    if '://' in address:
+        return address
+    source = camera_source(address)
+    return source if isinstance(source, int) else template.format(ip=address)
+
+
+def fetch_cameras(token=API_TOKEN):
+    """
+    Fetches the cameras from the API.
+
+    Parameters:
+    token (str): Service token of the API, see SENTINEL_API_TOKEN.
+
+    Returns:
+    list: Dictionaries with the id, name, ip_address, roi and exclusions of every camera,
+    or None if the API could not be reached.
+    """
+    try:
+        response = requests.get(f"{API_URL}/get_camera_streams", headers={'Authorization': token}, timeout=5)
+    except Exception as e:
+        print(f"An error occurred while fetching the cameras: {e}")
+        return None
+    if response.status_code == 401:
+        print("The API refused the camera list, set SENTINEL_API_TOKEN to the token the API was started with")
+        return None
+    if response.status_code != 200:
+        print(f"Failed to fetch the cameras. Status code: {response.status_code}")
+        return None
+    return response.json()['cameras']
+
+
+class CameraPipeline:
+    """
+    Capture, motion detection and recording of one camera, each camera on its own threads.
+
+    The processing thread always takes the newest decoded frame. Frames it could not keep
+    up with are counted as dropped by the capture.
+    """
+
+    def __init__(self, camera, fourcc):
+        self.camera_id = str(camera['id'])
+        self.name = camera['name']
+        self.address = camera['ip_address']
+        self.capture = ReconnectingCapture(stream_url(self.address))
+        self.mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True)
+        self.recorder = ClipRecorder(fourcc, camera=self.camera_id)
+        self.segments = SegmentController()
+        self.set_regions(camera)
+        self.thread = None
+        self.running = False
+        # Metrics
+        self.processed = 0
+        self.cpu_time = 0.0
+        self.last_report = None
+
+    def set_regions(self, camera):
+        """
+        Applies the regions of interest and exclusion zones of the camera, read by the next frame.
+        """
+        self.regions = RegionMask(camera['roi'], camera['exclusions']) or None
+
+    def start(self):
+        self.running = True
+        self.capture.start()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.last_report = (time.monotonic(), self.stats_totals())
+
+    def run(self):
+        """
+        Runs motion detection and recording on the newest frame of the camera until stopped.
+        """
+        sequence = 0
+        start_cpu = time.thread_time()
+        while self.running:
+            item = self.capture.read(sequence, timeout=0.5)
+            if item is None:
+                if not self.capture.connected and self.recorder.recording:
+                    # The stream is lost, end the clip rather than leave it open until it comes back
+                    self.recorder.close()
+                    self.segments.reset()
+                continue
+            sequence, frame, timestamp = item
+            if self.capture.fps and self.capture.fps != self.recorder.fps:
+                # Clips play at the camera's rate and the pre-roll holds PREROLL_SECONDS of it
+                self.recorder.set_fps(self.capture.fps)
+
+            # Keep the raw frame for the pre-roll
+            self.recorder.push(frame, timestamp)
+            detection, _, _ = detect_motion_boxes(frame, self.mog2, regions=self.regions)
+            # Start recording once movement persists, with the frames buffered before the trigger
+            action = self.segments.update(detection, timestamp)
+            if action == 'start':
+                self.recorder.start()
+            elif action == 'stop':
+                self.recorder.stop(timestamp)
+            elif action == 'split':
+                self.recorder.split()
+
+            self.processed += 1
+            self.cpu_time += time.thread_time() - start_cpu
+            start_cpu = time.thread_time()
+
+    def stop(self):
+        """
+        Stops the camera and waits for its last clip to be saved.
+        """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.capture.stop()
+        self.recorder.shutdown()
+
+    def stats_totals(self):
+        capture = self.capture.stats()
+        recording = self.recorder.writer.stats()
+        return {'captured': capture['captured'], 'processed': self.processed,
+                'dropped': capture['dropped'] + recording['dropped'],
+                'cpu': capture['cpu'] + self.cpu_time + recording['cpu']}
+
+    def stats(self):
+        """
+        Returns the camera's rates since the previous call: frames decoded and processed per
+        second, CPU use in percent of one core for decoding, detection and writing, and the
+        frames dropped by processing or recording. Also whether the stream is connected, the
+        number of reconnections and whether a clip is being recorded.
+        """
+        now = time.monotonic()
+        totals = self.stats_totals()
+        then, previous = self.last_report
+        self.last_report = (now, totals)
+        elapsed = max(now - then, 1e-6)
+        return {'camera': self.camera_id, 'name': self.name,
+                'capture_fps': (totals['captured'] - previous['captured']) / elapsed,
+                'fps': (totals['processed'] - previous['processed']) / elapsed,
+                'cpu': 100 * (totals['cpu'] - previous['cpu']) / elapsed,
+                'dropped': totals['dropped'] - previous['dropped'],
+                'connected': self.capture.connected, 'reconnects': self.capture.reconnects,
+                'recording': self.recorder.recording}
+
+
+class RecordingDaemon:
+    """
+    Keeps a CameraPipeline running for every camera of the API, reloading the list every
+    refresh_seconds: new cameras are started, removed ones stopped, and cameras whose
+    address changed restarted.
+    """
+
+    def __init__(self, fetch=fetch_cameras, refresh_seconds=CAMERA_REFRESH_SECONDS):
+        self.fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.fourcc = cv2.VideoWriter_fourcc(*RECORDING_FOURCC)
+        self.pipelines = {}
+
+    def refresh(self):
+        """
+        Applies the current camera list. Keeps the running cameras when the API can't be reached.
+        """
+        cameras = self.fetch()
+        if cameras is None:
+            return
+        cameras = {str(camera['id']): camera for camera in cameras}
+        for camera_id in list(self.pipelines):
+            camera = cameras.get(camera_id)
+            if camera is None or camera['ip_address'] != self.pipelines[camera_id].address:
+                print(f"Stopping camera {camera_id}")
+                self.pipelines.pop(camera_id).stop()
+        for camera_id, camera in cameras.items():
+            if camera_id in self.pipelines:
+                self.pipelines[camera_id].set_regions(camera)
+                continue
+            pipeline = CameraPipeline(camera, self.fourcc)
+            print(f"Starting camera {camera_id} ({camera['name']}) from {pipeline.capture.source}")
+            pipeline.start()
+            self.pipelines[camera_id] = pipeline
+
+    def stats(self):
+        """
+        Returns the stats of every camera since the previous call, see CameraPipeline.stats.
+        """
+        return [pipeline.stats() for pipeline in self.pipelines.values()]
+
+    def stop(self):
+        for pipeline in self.pipelines.values():
+            pipeline.stop()
+        self.pipelines = {}
+
+    def run(self, stats_seconds=DAEMON_STATS_SECONDS):
+        """
+        Records the cameras and prints their stats every stats_seconds until interrupted.
+        """
+        # Stop cleanly on SIGTERM as well, so that the current clips are saved
+        signal.signal(signal.SIGTERM, lambda signum, stack_frame: sys.exit(0))
+        last_refresh = None
+        try:
+            while True:
+                if last_refresh is None or time.monotonic() - last_refresh >= self.refresh_seconds:
+                    self.refresh()
+                    last_refresh = time.monotonic()
+                time.sleep(stats_seconds)
+                for stats in self.stats():
+                    state = 'recording' if stats['recording'] else 'connected' if stats['connected'] else 'offline'
+                    print(f"camera {stats['camera']:>4} {stats['name'][:20]:<20} {state:<9} "
+                          f"{stats['capture_fps']:5.1f} fps decoded {stats['fps']:5.1f} processed "
+                          f"cpu {stats['cpu']:5.1f}% dropped {stats['dropped']:5d} reconnects {stats['reconnects']}")
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            print(f"Stopping {len(self.pipelines)} cameras")
+            self.stop()
+
+
+if __name__ == "__main__":
+    # Every camera runs on its own threads, OpenCV's own thread pool would only oversubscribe the cores
+    cv2.setNumThreads(1)
+    RecordingDaemon().run()
@@ -0,0 +1,229 @@
+import time
+import threading
+import cv2
+from config import RECONNECT_BACKOFF, RECONNECT_MAX_BACKOFF
+
+# Frame rates streams report above this are time bases rather than frame rates, the rate is measured instead
+MAX_STREAM_FPS = 120
+# Frames over which the rate of a stream that does not report it is measured
+FPS_MEASURE_FRAMES = 50
+
+
+class LatestFrameCapture:
+    """
+    Reads a camera on its own thread and keeps only the most recent frame.
+
+    Consumers always get the newest frame instead of a backlog of stale ones. Frames
+    replaced before they were read are counted as dropped. The frames are not copied,
+    consumers that draw on them must be the only reader.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.cap = None
+        self.thread = None
+        self.running = False
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = 0.0
+        self.sequence = 0
+        self.read_sequence = 0
+        self.captured = 0
+        self.dropped = 0
+        self.failed_reads = 0
+
+    def start(self):
+        """
+        Opens the camera and starts the capture thread.
+
+        Returns:
+        bool: False if the camera could not be opened.
+        """
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.failed_reads += 1
+                time.sleep(0.01)
+                continue
+            timestamp = time.time()
+            with self.condition:
+                if self.read_sequence < self.sequence:
+                    self.dropped += 1  # The previous frame was never read
+                self.frame = frame
+                self.timestamp = timestamp
+                self.sequence += 1
+                self.captured += 1
+                self.condition.notify_all()
+
+    def read(self, after=0, timeout=1.0):
+        """
+        Waits for a frame newer than the given sequence number.
+
+        Parameters:
+        after (int): Sequence number of the last frame the caller got.
+        timeout (float): Seconds to wait.
+
+        Returns:
+        tuple: The sequence number, the frame and its capture time, or None on timeout.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after or not self.running, timeout)
+            if self.sequence <= after:
+                return None
+            self.read_sequence = self.sequence
+            return self.sequence, self.frame, self.timestamp
+
+    def valid(self, sequence):
+        """
+        Frames are never reused, a frame that was read stays valid.
+        """
+        return True
+
+    def closed(self):
+        """
+        Tells whether the capture thread stopped.
+        """
+        return not self.running
+
+    def stop(self):
+        """
+        Stops the capture thread and releases the camera.
+        """
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def stats(self):
+        """
+        Returns the number of captured frames, of frames dropped before being read and of failed reads.
+        """
+        return {'captured': self.captured, 'dropped': self.dropped, 'failed_reads': self.failed_reads}
+
+
+class ReconnectingCapture(LatestFrameCapture):
+    """
+    LatestFrameCapture for network cameras: the capture thread opens the stream itself and
+    reopens it when it fails, waiting backoff seconds between attempts, doubled after every
+    failed attempt up to max_backoff.
+
+    A stream that returns failed_reads_limit failed reads in a row is considered lost.
+    The thread's CPU time is kept, to account the decoding to its camera. fps is the frame
+    rate the stream reports, or the one measured over its first frames, None until known.
+    """
+
+    def __init__(self, source, backoff=RECONNECT_BACKOFF, max_backoff=RECONNECT_MAX_BACKOFF, failed_reads_limit=50):
+        super().__init__(source)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failed_reads_limit = failed_reads_limit
+        self.connected = False
+        self.reconnects = 0
+        self.cpu_time = 0.0
+        self.fps = None
+
+    def start(self):
+        """
+        Starts the capture thread, which keeps trying to open the stream.
+
+        Returns:
+        bool: Always True, use connected to know whether frames are coming.
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return True
+
+    def wait(self, seconds):
+        """
+        Sleeps between reconnection attempts, returning early when the capture stops.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: not self.running, seconds)
+
+    def run(self):
+        backoff = self.backoff
+        while self.running:
+            cap = cv2.VideoCapture(self.source)
+            if not cap.isOpened():
+                cap.release()
+                print(f"Could not open camera {self.source}, retrying in {backoff:g}s")
+                self.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self.cap = cap
+            reported_fps = cap.get(cv2.CAP_PROP_FPS)
+            if 0 < reported_fps <= MAX_STREAM_FPS:
+                self.fps = reported_fps
+            measure_start = None
+            measured = 0
+            self.connected = True
+            failed_reads = 0
+            start_cpu = time.thread_time()
+            while self.running and failed_reads < self.failed_reads_limit:
+                ret, frame = cap.read()
+                if not ret:
+                    self.failed_reads += 1
+                    failed_reads += 1
+                    time.sleep(0.01)
+                    continue
+                failed_reads = 0
+                backoff = self.backoff  # Frames are coming again
+                timestamp = time.time()
+                if self.fps is None:
+                    # The stream does not report its rate, measure it
+                    if measure_start is None:
+                        measure_start = timestamp
+                    elif measured >= FPS_MEASURE_FRAMES and timestamp > measure_start:
+                        self.fps = measured / (timestamp - measure_start)
+                    measured += 1
+                with self.condition:
+                    if self.read_sequence < self.sequence:
+                        self.dropped += 1  # The previous frame was never read
+                    self.frame = frame
+                    self.timestamp = timestamp
+                    self.sequence += 1
+                    self.captured += 1
+                    self.condition.notify_all()
+                self.cpu_time += time.thread_time() - start_cpu
+                start_cpu = time.thread_time()
+            self.connected = False
+            cap.release()
+            if self.running:
+                self.reconnects += 1
+                print(f"Lost camera {self.source}, reconnecting in {backoff:g}s")
+                self.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def stop(self):
+        """
+        Stops the capture thread, which releases the stream.
+        """
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.cap = None
+
+    def stats(self):
+        """
+        Returns the counters of LatestFrameCapture, the number of reconnections and the
+        CPU seconds spent decoding.
+        """
+        return {**super().stats(), 'reconnects': self.reconnects, 'cpu': self.cpu_time}
@@ -0,0 +1,166 @@
+import os
+
+# Deployment settings for the desktop recorder and the analysis pipeline.
+# Every value can be overridden with an environment variable of the same name
+# prefixed with SENTINEL_, e.g. SENTINEL_ANALYSIS_WORKERS=2.
+
+
+def env_setting(name, default, cast=str):
+    """
+    Reads a deployment setting from the environment.
+
+    Parameters:
+    name (str): Name of the setting, without the SENTINEL_ prefix.
+    default: Value used when the environment variable is not set.
+    cast (callable): Function converting the raw string to the setting type.
+
+    Returns:
+    The configured value, or the default.
+    """
+    value = os.environ.get(f'SENTINEL_{name}')
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+
+def flag(value):
+    """
+    Parses a boolean setting such as "1", "true" or "yes".
+    """
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def int_list(value):
+    """
+    Parses a comma separated list of integers such as "10,30".
+    """
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+# Number of warm analysis worker processes kept alive by the analysis service
+ANALYSIS_WORKERS = env_setting('ANALYSIS_WORKERS', 1, int)
+
+# Number of frames sent to the detector per inference call
+BATCH_SIZE = env_setting('BATCH_SIZE', 8, int)
+
+# Run the detector on every n-th frame only, tracks are predicted in between
+DETECTION_STRIDE = env_setting('DETECTION_STRIDE', 1, int)
+
+# Skip the detector on frames without foreground motion
+MOTION_GATE = env_setting('MOTION_GATE', False, flag)
+
+# Scale at which the motion gate runs background subtraction
+MOTION_GATE_SCALE = env_setting('MOTION_GATE_SCALE', 0.25, float)
+
+# Draw the tracks into the analyzed video. When off, the recording is copied without
+# encoding and the web app draws the tracks during playback.
+ANNOTATE_VIDEO = env_setting('ANNOTATE_VIDEO', True, flag)
+
+# Codec of the desktop recordings. 'avc1' lets the analysis copy them without encoding,
+# on OpenCV builds that support H.264.
+RECORDING_FOURCC = env_setting('RECORDING_FOURCC', 'mp4v')
+
+# Inference backend of the detector: 'torch', 'onnx' or 'onnx-int8'
+DETECTOR_BACKEND = env_setting('DETECTOR_BACKEND', 'torch')
+
+# Input resolution of the detector, lower is faster and less accurate on small objects
+DETECTOR_IMGSZ = env_setting('DETECTOR_IMGSZ', 640, int)
+
+# CPU threads used for inference, 0 keeps the library default. With several analysis
+# workers, 0 gives every worker the cores assigned to it.
+DETECTOR_THREADS = env_setting('DETECTOR_THREADS', 0, int)
+
+# Tracker: 'deepsort' matches tracks by appearance embeddings, 'iou' by IoU and motion only
+TRACKER = env_setting('TRACKER', 'deepsort')
+
+# Send the per-stage timings of every analyzed clip to the API
+METRICS_UPLOAD = env_setting('METRICS_UPLOAD', False, flag)
+
+# Pin every analysis worker to its own share of the CPU cores
+PIN_WORKER_CPUS = env_setting('PIN_WORKER_CPUS', True, flag)
+
+# SQLite ledger of the analysis jobs, kept across watcher restarts
+JOB_LEDGER_PATH = env_setting('JOB_LEDGER_PATH', 'desktop_app/jobs.db')
+
+# Attempts at analyzing a clip before its job is left failed
+JOB_MAX_ATTEMPTS = env_setting('JOB_MAX_ATTEMPTS', 3, int)
+
+# Seconds before the first retry of a failed job, doubled on every further attempt
+JOB_RETRY_BACKOFF = env_setting('JOB_RETRY_BACKOFF', 60.0, float)
+
+# Order of the analysis backlog: 'fifo', 'newest' first, or 'fair' to take turns between cameras
+JOB_PRIORITY = env_setting('JOB_PRIORITY', 'fifo')
+
+# Backlog depths at which the analysis switches to the next, cheaper profile, e.g. "10,30".
+# Empty to always analyze at full quality.
+DEGRADE_QUEUE_DEPTHS = env_setting('DEGRADE_QUEUE_DEPTHS', [], int_list)
+
+# Frame rate of the desktop recordings
+RECORDING_FPS = env_setting('RECORDING_FPS', 20.0, float)
+
+# Seconds of video kept before the motion trigger and added after the end of a clip
+PREROLL_SECONDS = env_setting('PREROLL_SECONDS', 3.0, float)
+POSTROLL_SECONDS = env_setting('POSTROLL_SECONDS', 2.0, float)
+
+# Memory the pre-roll buffer may use, in MB of raw frames. Caps the pre-roll at high resolutions.
+PREROLL_BUDGET_MB = env_setting('PREROLL_BUDGET_MB', 256, int)
+
+# Consecutive frames with motion that start a clip
+SEGMENT_START_FRAMES = env_setting('SEGMENT_START_FRAMES', 30, int)
+
+# Seconds without motion that end a clip, before the post-roll
+SEGMENT_STOP_SECONDS = env_setting('SEGMENT_STOP_SECONDS', 3.0, float)
+
+# Shortest and longest clip, in seconds from the trigger. Longer events are split.
+SEGMENT_MIN_SECONDS = env_setting('SEGMENT_MIN_SECONDS', 5.0, float)
+SEGMENT_MAX_SECONDS = env_setting('SEGMENT_MAX_SECONDS', 120.0, float)
+
+# Frames the recording writer may have waiting for the disk, and what happens to new
+# frames when they are all taken: 'block', 'drop_newest' or 'drop_oldest'
+RECORDING_QUEUE_FRAMES = env_setting('RECORDING_QUEUE_FRAMES', 100, int)
+RECORDING_OVERFLOW = env_setting('RECORDING_OVERFLOW', 'drop_oldest')
+
+# Scale at which the desktop recorder runs motion detection, 1.0 for full resolution
+MOTION_SCALE = env_setting('MOTION_SCALE', 0.5, float)
+
+# API id of the camera the desktop recorder watches, '' for none. Its clips are named after it,
+# e.g. 20240518_101500_cam2.mp4, and only motion and detections inside its regions of interest count.
+CAMERA_ID = env_setting('CAMERA_ID', '')
+
+# Frames per second shown in the desktop window at most, 0 for every processed frame
+DISPLAY_FPS = env_setting('DISPLAY_FPS', 15.0, float)
+
+
+def camera_source(value):
+    """
+    Parses a camera setting, a device index such as "2" or a stream URL.
+    """
+    return int(value) if value.strip().isdigit() else value
+
+
+# Camera opened by the capture service, a device index or a stream URL
+CAMERA_SOURCE = env_setting('CAMERA_SOURCE', 2, camera_source)
+
+# Shared memory frame bus the capture service publishes the camera on, and its length in frames.
+# The desktop monitor and the web live feed read it instead of opening the camera themselves.
+FRAME_BUS_NAME = env_setting('FRAME_BUS_NAME', 'sentinel_frames')
+FRAME_BUS_SLOTS = env_setting('FRAME_BUS_SLOTS', 8, int)
+
+# Seconds a network camera waits before reconnecting, doubled after every failed attempt up to the maximum
+RECONNECT_BACKOFF = env_setting('RECONNECT_BACKOFF', 1.0, float)
+RECONNECT_MAX_BACKOFF = env_setting('RECONNECT_MAX_BACKOFF', 30.0, float)
+
+# Stream URL of the cameras the recording daemon reads, built from the IP address stored in the
+# Camera table. Addresses that are already URLs or device indices are used as they are.
+CAMERA_URL_TEMPLATE = env_setting('CAMERA_URL_TEMPLATE', 'rtsp://{ip}:554/stream')
+
+# Service token sent to the API for the camera list, the SENTINEL_API_TOKEN the API was started with
+API_TOKEN = env_setting('API_TOKEN', '')
+
+# Seconds between two reloads of the camera list and between two stats reports of the recording daemon
+CAMERA_REFRESH_SECONDS = env_setting('CAMERA_REFRESH_SECONDS', 60.0, float)
+DAEMON_STATS_SECONDS = env_setting('DAEMON_STATS_SECONDS', 10.0, float)
+
+# Seconds the regions of a camera are kept before they are fetched again, so that edits made
+# through the API reach the running analysis workers
+REGIONS_REFRESH_SECONDS = env_setting('REGIONS_REFRESH_SECONDS', 30.0, float)
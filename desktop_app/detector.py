@@ -0,0 +1,251 @@
+import os
+import shutil
+import argparse
+import cv2
+import numpy as np
+from config import DETECTOR_BACKEND, DETECTOR_IMGSZ, DETECTOR_THREADS
+
+MODEL_PATH = 'desktop_app/yolov8n.pt'
+ONNX_MODEL_PATH = 'desktop_app/yolov8n.onnx'
+ONNX_INT8_MODEL_PATH = 'desktop_app/yolov8n_int8.onnx'
+
+# Same defaults as ultralytics predictions
+CONFIDENCE_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+
+
+class TorchDetector:
+    """
+    Runs the YOLO model on PyTorch through ultralytics.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, imgsz=DETECTOR_IMGSZ, threads=DETECTOR_THREADS):
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def __call__(self, frames, imgsz=None):
+        """
+        Detects objects in a batch of frames.
+
+        Parameters:
+        frames (list): Frames (numpy.ndarray) in BGR order.
+        imgsz (int): Input resolution for this call, None for the detector's resolution.
+
+        Returns:
+        list: For every frame, an array of shape (n, 6) with x1, y1, x2, y2, confidence and class id.
+        """
+        results = self.model(frames, imgsz=imgsz or self.imgsz, verbose=False)
+        return [result.boxes.data.cpu().numpy() for result in results]
+
+
+class OnnxDetector:
+    """
+    Runs an exported, optionally int8-quantized, YOLO model on ONNX Runtime without PyTorch.
+    """
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, imgsz=DETECTOR_IMGSZ, threads=DETECTOR_THREADS):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = imgsz
+        self.letterboxed = None
+        self.blob = None
+
+    def preprocess(self, frames, imgsz):
+        """
+        Letterboxes the frames into a reused input batch.
+
+        Parameters:
+        frames (list): Frames (numpy.ndarray) in BGR order.
+        imgsz (int): Input resolution.
+
+        Returns:
+        tuple: The input batch of shape (n, 3, imgsz, imgsz) and, for every frame, the scale and padding applied.
+        """
+        count = len(frames)
+        if self.letterboxed is None or len(self.letterboxed) < count or self.letterboxed.shape[1] != imgsz:
+            self.letterboxed = np.empty((count, imgsz, imgsz, 3), dtype=np.uint8)
+            self.blob = np.empty((count, 3, imgsz, imgsz), dtype=np.float32)
+
+        transforms = [letterbox(frame, self.letterboxed[i]) for i, frame in enumerate(frames)]
+        # BGR to RGB, HWC to CHW and 0-255 to 0-1 in one pass
+        np.multiply(self.letterboxed[:count, :, :, ::-1].transpose(0, 3, 1, 2), 1 / 255.0, out=self.blob[:count],
+                    casting='unsafe')
+        return self.blob[:count], transforms
+
+    def __call__(self, frames, imgsz=None):
+        """
+        Detects objects in a batch of frames.
+
+        Parameters:
+        frames (list): Frames (numpy.ndarray) in BGR order.
+        imgsz (int): Input resolution for this call, None for the detector's resolution.
+            The exported models have dynamic shapes, any multiple of 32 works.
+
+        Returns:
+        list: For every frame, an array of shape (n, 6) with x1, y1, x2, y2, confidence and class id.
+        """
+        blob, transforms = self.preprocess(frames, imgsz or self.imgsz)
+        predictions = self.session.run(None, {self.input_name: blob})[0]
+        return [postprocess(prediction, transform, frame.shape)
+                for prediction, transform, frame in zip(predictions, transforms, frames)]
+
+
+def letterbox(frame, out):
+    """
+    Resizes the frame into the square output keeping its aspect ratio, padding the rest with gray.
+
+    Parameters:
+    frame (numpy.ndarray): The frame to resize.
+    out (numpy.ndarray): Square destination image.
+
+    Returns:
+    tuple: The scale factor and the horizontal and vertical padding in pixels.
+    """
+    size = out.shape[0]
+    height, width = frame.shape[:2]
+    gain = min(size / height, size / width)
+    new_width, new_height = int(round(width * gain)), int(round(height * gain))
+    pad_x, pad_y = (size - new_width) // 2, (size - new_height) // 2
+    out[:] = 114
+    out[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = cv2.resize(frame, (new_width, new_height),
+                                                                        interpolation=cv2.INTER_LINEAR)
+    return gain, pad_x, pad_y
+
+
+def postprocess(prediction, transform, frame_shape):
+    """
+    Turns the raw YOLOv8 output of one frame into boxes in frame coordinates.
+
+    Parameters:
+    prediction (numpy.ndarray): Model output of shape (4 + classes, anchors), boxes as center x, center y, w, h.
+    transform (tuple): Scale and padding returned by letterbox.
+    frame_shape (tuple): Shape of the original frame.
+
+    Returns:
+    numpy.ndarray: Array of shape (n, 6) with x1, y1, x2, y2, confidence and class id.
+    """
+    prediction = prediction.T
+    scores = prediction[:, 4:]
+    cls_ids = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), cls_ids]
+    keep = conf > CONFIDENCE_THRESHOLD
+    prediction, conf, cls_ids = prediction[keep], conf[keep], cls_ids[keep]
+
+    # Per class non-maximum suppression on top-left based boxes
+    boxes = prediction[:, :4].copy()
+    boxes[:, 0] -= boxes[:, 2] / 2
+    boxes[:, 1] -= boxes[:, 3] / 2
+    picks = np.asarray(cv2.dnn.NMSBoxesBatched(boxes, conf, cls_ids.astype(np.int32), CONFIDENCE_THRESHOLD,
+                                               IOU_THRESHOLD), dtype=int).reshape(-1)[:MAX_DETECTIONS]
+    boxes, conf, cls_ids = boxes[picks], conf[picks], cls_ids[picks]
+
+    # Undo the letterbox
+    gain, pad_x, pad_y = transform
+    height, width = frame_shape[:2]
+    x1 = np.clip((boxes[:, 0] - pad_x) / gain, 0, width)
+    y1 = np.clip((boxes[:, 1] - pad_y) / gain, 0, height)
+    x2 = np.clip((boxes[:, 0] + boxes[:, 2] - pad_x) / gain, 0, width)
+    y2 = np.clip((boxes[:, 1] + boxes[:, 3] - pad_y) / gain, 0, height)
+    return np.column_stack([x1, y1, x2, y2, conf, cls_ids]).astype(np.float32)
+
+
+def load_detector(backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ, threads=DETECTOR_THREADS):
+    """
+    Loads the detector for the configured inference backend.
+
+    Parameters:
+    backend (str): 'torch', 'onnx' or 'onnx-int8'.
+    imgsz (int): Input resolution of the model.
+    threads (int): Number of CPU threads used for inference, 0 for the library default.
+
+    Returns:
+    TorchDetector or OnnxDetector: Callable taking a list of frames.
+    """
+    if backend == 'torch':
+        return TorchDetector(MODEL_PATH, imgsz, threads)
+    if backend == 'onnx':
+        return OnnxDetector(ONNX_MODEL_PATH, imgsz, threads)
+    if backend == 'onnx-int8':
+        return OnnxDetector(ONNX_INT8_MODEL_PATH, imgsz, threads)
+    raise ValueError(f"Unknown detector backend: {backend}")
+
+
+class VideoCalibrationReader:
+    """
+    Feeds frames of a reference clip to the ONNX Runtime int8 calibration.
+    """
+
+    def __init__(self, video_path, input_name, imgsz, frame_count=100):
+        self.input_name = input_name
+        self.frames = []
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Spread the calibration frames over the whole clip
+        step = max(total // frame_count, 1)
+        index = 0
+        while len(self.frames) < frame_count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                letterboxed = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+                letterbox(frame, letterboxed)
+                self.frames.append((letterboxed[:, :, ::-1].transpose(2, 0, 1)[None] / 255.0).astype(np.float32))
+            index += 1
+        cap.release()
+        self.position = 0
+
+    def get_next(self):
+        if self.position >= len(self.frames):
+            return None
+        self.position += 1
+        return {self.input_name: self.frames[self.position - 1]}
+
+
+def export_models(imgsz=DETECTOR_IMGSZ, calibration_video=None):
+    """
+    Exports the PyTorch model to ONNX and, given a reference clip, quantizes it to int8.
+
+    Parameters:
+    imgsz (int): Input resolution of the exported model.
+    calibration_video (str): Clip from the deployment's camera used to calibrate the int8 model.
+    """
+    from ultralytics import YOLO
+
+    # Dynamic axes let the same file run any batch size and resolution
+    exported_path = YOLO(MODEL_PATH).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    if os.path.abspath(exported_path) != os.path.abspath(ONNX_MODEL_PATH):
+        shutil.move(exported_path, ONNX_MODEL_PATH)
+    print(f"Exported ONNX model saved to {ONNX_MODEL_PATH}.")
+
+    if calibration_video:
+        import onnxruntime
+        from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+
+        input_name = onnxruntime.InferenceSession(ONNX_MODEL_PATH, providers=['CPUExecutionProvider']) \
+            .get_inputs()[0].name
+        reader = VideoCalibrationReader(calibration_video, input_name, imgsz)
+        quantize_static(ONNX_MODEL_PATH, ONNX_INT8_MODEL_PATH, reader, quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        print(f"Quantized int8 model saved to {ONNX_INT8_MODEL_PATH}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the detector for the ONNX Runtime backends.")
+    parser.add_argument('--imgsz', type=int, default=DETECTOR_IMGSZ, help="Input resolution")
+    parser.add_argument('--calibration-video', help="Reference clip used to build the int8 model")
+    args = parser.parse_args()
+
+    export_models(args.imgsz, args.calibration_video)
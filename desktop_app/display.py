@@ -0,0 +1,160 @@
+import math
+import threading
+import cv2
+import numpy as np
+from config import DISPLAY_FPS
+
+
+def fit_size(width, height, max_width, max_height):
+    """
+    Returns the largest size with the frame's aspect ratio that fits in the display area.
+
+    Parameters:
+    width (int): Frame width.
+    height (int): Frame height.
+    max_width (int): Width of the display area.
+    max_height (int): Height of the display area.
+
+    Returns:
+    tuple: The width and height, at least 1 pixel each.
+    """
+    scale = min(max_width / width, max_height / height)
+    return max(int(round(width * scale)), 1), max(int(round(height * scale)), 1)
+
+
+def grid_shape(count):
+    """
+    Returns the number of columns and rows of a grid with room for count tiles, as square as possible.
+    """
+    columns = max(math.ceil(math.sqrt(count)), 1)
+    return columns, max(math.ceil(count / columns), 1)
+
+
+class FrameRateCap:
+    """
+    Lets frames through at most max_fps times per second, on a fixed schedule so that
+    the average rate matches the cap however the capture timestamps jitter.
+    """
+
+    def __init__(self, max_fps):
+        self.max_fps = max_fps
+        self.next_due = None
+
+    def due(self, timestamp):
+        """
+        Tells whether the frame captured at timestamp should be let through, and books its slot if so.
+        """
+        if not self.max_fps:
+            return True
+        # A millisecond of slack, or frames arriving right on schedule would be skipped
+        if self.next_due is not None and timestamp + 0.001 < self.next_due:
+            return False
+        # Keep to the schedule, start over after a gap
+        interval = 1 / self.max_fps
+        if self.next_due is None or timestamp - self.next_due >= interval:
+            self.next_due = timestamp
+        self.next_due += interval
+        return True
+
+
+class DisplayBuffers:
+    """
+    Display-sized copies of the processed frames, handed from the processing thread to the GUI.
+
+    Frames are resized once, straight into one of three preallocated buffers, and at most
+    max_fps times per second. The GUI always takes the latest frame. One buffer holds it,
+    one may still be shown and the third is free for the next frame, so nothing is
+    allocated per frame and no buffer is written while the GUI reads it.
+
+    With rgb False the buffers keep OpenCV's BGR order, for QImage.Format_BGR888.
+    """
+
+    def __init__(self, max_fps=DISPLAY_FPS, rgb=False, count=3):
+        self.rate_cap = FrameRateCap(max_fps)
+        self.rgb = rgb
+        self.count = count
+        self.lock = threading.Lock()
+        self.area = (800, 600)
+        self.buffers = []
+        self.latest = None  # Index of the latest published buffer
+        self.shown = None  # Index of the buffer the GUI took last
+        self.timestamps = [0.0] * count
+        # Metrics
+        self.published = 0
+        self.skipped = 0
+        self.dropped = 0
+
+    def set_area(self, width, height):
+        """
+        Sets the size of the display area, the frames are fitted into it.
+        """
+        with self.lock:
+            self.area = (width, height)
+
+    def publish(self, frame, timestamp, overlay=None, valid=None):
+        """
+        Resizes a processed frame into a free buffer and makes it the latest, unless it
+        comes before the next 1 / max_fps slot.
+
+        Parameters:
+        frame (numpy.ndarray): The processed BGR frame, only read.
+        timestamp (float): Capture time of the frame.
+        overlay (callable): Draws on the resized BGR buffer, called with the buffer and
+            its scale relative to the frame.
+        valid (callable): Tells whether the frame was still intact once resized, for views
+            of a shared frame. The frame is dropped otherwise.
+
+        Returns:
+        bool: False if the frame was skipped by the frame rate cap.
+        """
+        if not self.rate_cap.due(timestamp):
+            self.skipped += 1
+            return False
+
+        with self.lock:
+            width, height = fit_size(frame.shape[1], frame.shape[0], *self.area)
+            if not self.buffers or self.buffers[0].shape[:2] != (height, width):
+                # New camera or display size, the buffers the GUI still references stay valid
+                self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.count)]
+                self.latest = self.shown = None
+            index = next(i for i in range(self.count) if i != self.latest and i != self.shown)
+            buffer = self.buffers[index]
+
+        # Resized outside the lock, the GUI never touches a buffer that is neither latest nor shown
+        # Bilinear is several times cheaper than area averaging at fractional ratios, good enough on screen
+        cv2.resize(frame, (width, height), dst=buffer, interpolation=cv2.INTER_LINEAR)
+        if overlay is not None:
+            overlay(buffer, width / frame.shape[1])
+        if self.rgb:
+            cv2.cvtColor(buffer, cv2.COLOR_BGR2RGB, dst=buffer)
+
+        with self.lock:
+            if buffer is not self.buffers[index]:
+                return True  # Reallocated meanwhile, the frame is stale
+            if valid is not None and not valid():
+                self.dropped += 1  # Overwritten while it was resized
+                return True
+            if self.latest is not None:
+                self.dropped += 1  # The previous frame was never taken
+            self.latest = index
+            self.timestamps[index] = timestamp
+            self.published += 1
+        return True
+
+    def take(self):
+        """
+        Returns the latest frame not taken yet and its capture time, or None. The buffer
+        stays untouched until the next call, called by the GUI thread.
+        """
+        with self.lock:
+            if self.latest is None:
+                return None
+            self.shown, self.latest = self.latest, None
+            return self.buffers[self.shown], self.timestamps[self.shown]
+
+    def stats(self):
+        """
+        Returns the number of published frames, of frames skipped by the frame rate cap
+        and of frames replaced before the GUI took them or overwritten while resized.
+        """
+        return {'published': self.published, 'skipped': self.skipped, 'dropped': self.dropped}
@@ -0,0 +1,320 @@
+import os
+import sys
+import time
+import signal
+import numpy as np
+from multiprocessing import shared_memory
+from config import FRAME_BUS_NAME, FRAME_BUS_SLOTS, CAMERA_SOURCE
+
+# One capture process decodes the camera into a ring of frame slots in shared memory.
+# The desktop monitor, its recorder and the web live feed attach to it as readers.
+# Readers get read-only views of the slots, never copies, and keep their own cursor.
+# The writer never waits for them. A reader that falls a whole ring behind loses
+# the frames it missed.
+#
+# Every slot is guarded by its sequence number: 0 while the writer fills it, the
+# frame's sequence once it is complete. A reader checks the number before and after
+# using a view to know the writer did not reuse the slot meanwhile.
+
+MAGIC = 0x53564642  # 'SVFB'
+
+HEADER = np.dtype([('magic', '<u4'), ('closed', '<u4'), ('height', '<u4'), ('width', '<u4'), ('channels', '<u4'),
+                   ('slots', '<u4'), ('sequence', '<u8'), ('pid', '<u8')])
+SLOT = np.dtype([('sequence', '<u8'), ('timestamp', '<f8')])
+
+# Readers check for new frames this often, there is no cross-process wakeup
+POLL_SECONDS = 0.002
+
+
+def layout(height, width, channels, slots):
+    """
+    Computes the offsets of the parts of the bus in the shared memory block.
+
+    Returns:
+    tuple: Offsets of the slot table and of the frames, and the total size in bytes.
+    """
+    slot_offset = 64  # Header, padded to a cache line
+    frame_offset = (slot_offset + slots * SLOT.itemsize + 63) // 64 * 64
+    return slot_offset, frame_offset, frame_offset + slots * height * width * channels
+
+
+def process_alive(pid):
+    """
+    Tells whether a process is still running, True where it can't be told.
+    """
+    if os.name != 'posix':
+        return True  # os.kill terminates the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Running as another user
+    return True
+
+
+def attach(name):
+    """
+    Opens an existing shared memory block without letting this process's exit remove it.
+    """
+    block = shared_memory.SharedMemory(name)
+    if os.name == 'posix':
+        # Before Python 3.13 the resource tracker unlinks every block a process opened when it exits
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+
+class FrameBus:
+    """
+    Views of a frame bus mapped in this process: the header, the slot table and the frames.
+    """
+
+    def __init__(self, block, writable):
+        self.block = block
+        self.header = np.ndarray((), HEADER, block.buf)
+        height, width, channels, slots = (int(self.header[field]) for field in ('height', 'width', 'channels',
+                                                                                 'slots'))
+        slot_offset, frame_offset, _ = layout(height, width, channels, slots)
+        self.slots = np.ndarray((slots,), SLOT, block.buf, slot_offset)
+        self.frames = np.ndarray((slots, height, width, channels), np.uint8, block.buf, frame_offset)
+        if not writable:
+            self.frames.flags.writeable = False
+
+    def close(self):
+        """
+        Unmaps the bus. Views still used elsewhere keep the mapping alive until they are gone.
+        """
+        self.header = self.slots = self.frames = None
+        try:
+            self.block.close()
+        except BufferError:
+            pass  # A caller still holds a frame view, the mapping goes with it
+
+
+class FramePublisher:
+    """
+    Writer side of the bus: owns the shared memory and publishes the camera frames into it.
+    """
+
+    def __init__(self, shape, name=FRAME_BUS_NAME, slots=FRAME_BUS_SLOTS):
+        height, width, channels = shape
+        _, _, size = layout(height, width, channels, slots)
+        try:
+            block = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left over by a capture process that did not exit cleanly
+            stale = shared_memory.SharedMemory(name)
+            stale.unlink()
+            stale.close()
+            block = shared_memory.SharedMemory(name, create=True, size=size)
+        header = np.ndarray((), HEADER, block.buf)
+        header[()] = (0, 0, height, width, channels, slots, 0, os.getpid())
+        self.bus = FrameBus(block, writable=True)
+        self.bus.slots['sequence'] = 0
+        # Readers only accept a complete header
+        self.bus.header['magic'] = MAGIC
+        self.sequence = 0
+
+    def next_slot(self):
+        """
+        Returns the slot the next frame goes into, marked as being written, for decoding straight into it.
+        """
+        index = (self.sequence + 1) % len(self.bus.slots)
+        self.bus.slots['sequence'][index] = 0
+        return self.bus.frames[index]
+
+    def commit(self, timestamp):
+        """
+        Publishes the frame written into the slot returned by next_slot.
+
+        Returns:
+        int: The frame's sequence number.
+        """
+        self.sequence += 1
+        index = self.sequence % len(self.bus.slots)
+        self.bus.slots['timestamp'][index] = timestamp
+        self.bus.slots['sequence'][index] = self.sequence
+        self.bus.header['sequence'] = self.sequence
+        return self.sequence
+
+    def publish(self, frame, timestamp):
+        """
+        Copies a frame into the next slot and publishes it.
+        """
+        np.copyto(self.next_slot(), frame)
+        return self.commit(timestamp)
+
+    def close(self):
+        """
+        Tells the readers the bus is gone and removes it.
+        """
+        self.bus.header['closed'] = 1
+        block = self.bus.block
+        self.bus.close()
+        block.unlink()
+
+
+class FrameBusReader:
+    """
+    Reader side of the bus, with the same interface as capture.LatestFrameCapture.
+
+    The frames are read-only views of the shared slots, valid until the writer reuses the
+    slot, FRAME_BUS_SLOTS - 1 frames later. Callers that keep or modify a frame copy it,
+    or check valid() after using it.
+
+    Parameters:
+    name (str): Name of the bus.
+    latest (bool): Always skip to the newest frame, as a live view does. Otherwise the
+        frames are read in order and only dropped when the reader falls a ring behind.
+    """
+
+    def __init__(self, name=FRAME_BUS_NAME, latest=True):
+        self.name = name
+        self.latest = latest
+        self.bus = None
+        self.running = False
+        self.read_count = 0
+        self.dropped = 0
+        self.torn = 0
+
+    def start(self):
+        """
+        Attaches to the bus.
+
+        Returns:
+        bool: False if no capture process publishes it.
+        """
+        try:
+            block = attach(self.name)
+        except (FileNotFoundError, ValueError):
+            return False
+        header = np.ndarray((), HEADER, block.buf)
+        if header['magic'] != MAGIC or header['closed'] or not process_alive(int(header['pid'])):
+            del header
+            block.close()
+            return False
+        del header
+        self.bus = FrameBus(block, writable=False)
+        self.running = True
+        return True
+
+    def read(self, after=0, timeout=1.0):
+        """
+        Waits for a frame newer than the given sequence number.
+
+        Parameters:
+        after (int): Sequence number of the last frame the caller got.
+        timeout (float): Seconds to wait.
+
+        Returns:
+        tuple: The sequence number, the frame and its capture time, or None on timeout or
+        when the capture process stopped.
+        """
+        deadline = time.monotonic() + timeout
+        slots = len(self.bus.slots)
+        while self.running:
+            if self.bus.header['closed']:
+                return None
+            newest = int(self.bus.header['sequence'])
+            if newest > after:
+                wanted = after + 1
+                # The writer may be filling the slot after the newest, one ring behind it
+                if self.latest or after == 0 or newest - wanted >= slots - 1:
+                    wanted = newest
+                if after:
+                    self.dropped += wanted - after - 1
+                index = wanted % slots
+                timestamp = float(self.bus.slots['timestamp'][index])
+                if self.bus.slots['sequence'][index] == wanted:
+                    self.read_count += 1
+                    return wanted, self.bus.frames[index], timestamp
+                self.torn += 1  # Overwritten while reading, try the newest frame
+                after = max(after, wanted - 1)
+                continue
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_SECONDS)
+        return None
+
+    def valid(self, sequence):
+        """
+        Tells whether the frame with this sequence number is still in its slot, to check
+        that a view was not overwritten while it was being used.
+        """
+        return self.bus is not None and self.bus.slots['sequence'][sequence % len(self.bus.slots)] == sequence
+
+    def closed(self):
+        """
+        Tells whether the capture process closed the bus, or died without closing it.
+        """
+        if self.bus is None or self.bus.header['closed']:
+            return True
+        return not process_alive(int(self.bus.header['pid']))
+
+    def stop(self):
+        """
+        Detaches from the bus.
+        """
+        self.running = False
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+    def stats(self):
+        """
+        Returns the number of frames read, of frames skipped or lost by falling behind and of torn reads.
+        """
+        return {'captured': self.read_count, 'dropped': self.dropped, 'failed_reads': self.torn}
+
+
+def run_capture_service(source=CAMERA_SOURCE, name=FRAME_BUS_NAME, slots=FRAME_BUS_SLOTS):
+    """
+    Opens the camera and publishes its frames on the bus until interrupted.
+
+    Parameters:
+    source (int or str): Camera device index or stream URL.
+    name (str): Name of the bus.
+    slots (int): Number of frames kept in the ring.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Error: Could not open camera {source}.")
+        return
+    ret, frame = cap.read()
+    if not ret:
+        print(f"Error: Could not read from camera {source}.")
+        cap.release()
+        return
+
+    publisher = FramePublisher(frame.shape, name, slots)
+    publisher.publish(frame, time.time())
+    print(f"Publishing camera {source} ({frame.shape[1]}x{frame.shape[0]}) on frame bus {name}")
+
+    # Stop cleanly on SIGTERM as well, so that the shared memory is removed
+    signal.signal(signal.SIGTERM, lambda signum, stack_frame: sys.exit(0))
+    failed_reads = 0
+    try:
+        while True:
+            # Decode straight into the shared slot, the frame is never copied
+            slot = publisher.next_slot()
+            ret, frame = cap.read(slot)
+            if not ret:
+                failed_reads += 1
+                time.sleep(0.01)
+                continue
+            if not np.shares_memory(frame, slot):
+                slot[...] = frame  # OpenCV could not decode into the slot and allocated a new array
+            publisher.commit(time.time())
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        print(f"Stopping frame bus {name} after {publisher.sequence} frames, {failed_reads} failed reads")
+        publisher.close()
+        cap.release()
+
+
+if __name__ == "__main__":
+    run_capture_service()
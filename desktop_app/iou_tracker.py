@@ -0,0 +1,220 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Motion-only tracker in the style of SORT. Tracks are associated with the
+# detections by the IoU of their Kalman predicted boxes, without appearance
+# embeddings. It follows the DeepSort interface used by process_video.
+
+# Kalman filter noise, same weights as DeepSort
+STD_WEIGHT_POSITION = 1. / 20
+STD_WEIGHT_VELOCITY = 1. / 160
+
+# Constant velocity model over (center x, center y, aspect ratio, height)
+MOTION_MATRIX = np.eye(8)
+MOTION_MATRIX[:4, 4:] = np.eye(4)
+UPDATE_MATRIX = np.eye(4, 8)
+
+
+def pairwise_iou(a, b):
+    """
+    Computes the IoU of every box in a with every box in b.
+
+    Parameters:
+    a (numpy.ndarray): Boxes of shape (n, 4) as x1, y1, x2, y2.
+    b (numpy.ndarray): Boxes of shape (m, 4) as x1, y1, x2, y2.
+
+    Returns:
+    numpy.ndarray: IoU matrix of shape (n, m).
+    """
+    xx1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0)
+
+
+def ltwh_to_xyah(boxes):
+    """
+    Converts (left, top, width, height) boxes to the Kalman measurement space.
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    return np.column_stack([boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2,
+                            boxes[:, 2] / np.maximum(boxes[:, 3], 1e-9), boxes[:, 3]])
+
+
+def xyah_to_ltrb(states):
+    """
+    Converts Kalman states to (left, top, right, bottom) boxes.
+    """
+    width = states[:, 2] * states[:, 3]
+    left = states[:, 0] - width / 2
+    top = states[:, 1] - states[:, 3] / 2
+    return np.column_stack([left, top, left + width, top + states[:, 3]])
+
+
+def diagonal_matrices(values):
+    """
+    Builds a stack of diagonal matrices from the rows of values.
+    """
+    matrices = np.zeros(values.shape + (values.shape[1],))
+    index = np.arange(values.shape[1])
+    matrices[:, index, index] = values
+    return matrices
+
+
+class Track:
+    """
+    A tracked object, with the attributes process_video reads from DeepSort tracks.
+    """
+
+    def __init__(self, track_id, det_class, det_conf):
+        self.track_id = track_id
+        self.det_class = det_class
+        self.det_conf = det_conf
+        self.hits = 1
+        self.age = 1
+        self.time_since_update = 0
+        self.confirmed = False
+        self.ltrb = None
+
+    def is_confirmed(self):
+        return self.confirmed
+
+    def to_ltrb(self):
+        return self.ltrb
+
+
+class IouTracker:
+    """
+    Tracks detections across frames by IoU and motion only.
+    """
+
+    def __init__(self, max_age=30, n_init=3, min_iou=0.3):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.min_iou = min_iou
+        self.delete_all_tracks()
+
+    def delete_all_tracks(self):
+        """
+        Drops every track so that track IDs start again from 1.
+        """
+        self.tracks = []
+        self.means = np.zeros((0, 8))
+        self.covariances = np.zeros((0, 8, 8))
+        self.next_id = 1
+
+    def predict(self):
+        """
+        Advances every track by one frame with the Kalman prediction.
+
+        Returns:
+        list: The tracks at their predicted positions.
+        """
+        if self.tracks:
+            heights = self.means[:, 3]
+            std = np.column_stack([STD_WEIGHT_POSITION * heights, STD_WEIGHT_POSITION * heights,
+                                   np.full_like(heights, 1e-2), STD_WEIGHT_POSITION * heights,
+                                   STD_WEIGHT_VELOCITY * heights, STD_WEIGHT_VELOCITY * heights,
+                                   np.full_like(heights, 1e-5), STD_WEIGHT_VELOCITY * heights])
+            self.means = self.means @ MOTION_MATRIX.T
+            self.covariances = MOTION_MATRIX @ self.covariances @ MOTION_MATRIX.T + diagonal_matrices(std ** 2)
+            for track in self.tracks:
+                track.age += 1
+                track.time_since_update += 1
+                track.det_conf = None
+            self.refresh_boxes()
+        return self.tracks
+
+    def update_tracks(self, raw_detections, frame=None):
+        """
+        Predicts the tracks and associates them with the detections of the current frame.
+
+        Parameters:
+        raw_detections (list): ([left, top, width, height], confidence, class id) detections.
+        frame (numpy.ndarray): Unused, accepted for compatibility with DeepSort.
+
+        Returns:
+        list: The current tracks.
+        """
+        self.predict()
+        detections = ltwh_to_xyah([detection[0] for detection in raw_detections])
+
+        # Match the predicted boxes to the detections on the IoU cost matrix
+        matches = []
+        unmatched_detections = set(range(len(raw_detections)))
+        if self.tracks and len(raw_detections):
+            iou = pairwise_iou(xyah_to_ltrb(self.means[:, :4]), xyah_to_ltrb(detections))
+            rows, cols = linear_sum_assignment(-iou)
+            accepted = iou[rows, cols] >= self.min_iou
+            matches = list(zip(rows[accepted], cols[accepted]))
+            unmatched_detections -= set(cols[accepted].tolist())
+
+        if matches:
+            track_indices, detection_indices = (np.array(indices) for indices in zip(*matches))
+            self.correct(track_indices, detections[detection_indices])
+            for track_index, detection_index in matches:
+                track = self.tracks[track_index]
+                track.hits += 1
+                track.time_since_update = 0
+                track.det_conf = raw_detections[detection_index][1]
+                track.det_class = raw_detections[detection_index][2]
+                if track.hits >= self.n_init:
+                    track.confirmed = True
+
+        # Tentative tracks die on their first miss, confirmed ones after max_age frames
+        keep = np.array([track.time_since_update == 0 or (track.confirmed and
+                                                          track.time_since_update <= self.max_age)
+                         for track in self.tracks], dtype=bool)
+        self.tracks = [track for track, kept in zip(self.tracks, keep) if kept]
+        self.means, self.covariances = self.means[keep], self.covariances[keep]
+
+        for detection_index in sorted(unmatched_detections):
+            self.initiate(detections[detection_index], raw_detections[detection_index])
+
+        self.refresh_boxes()
+        return self.tracks
+
+    def initiate(self, measurement, raw_detection):
+        """
+        Starts a tentative track from an unmatched detection.
+        """
+        height = measurement[3]
+        std = np.array([2 * STD_WEIGHT_POSITION * height, 2 * STD_WEIGHT_POSITION * height, 1e-2,
+                        2 * STD_WEIGHT_POSITION * height, 10 * STD_WEIGHT_VELOCITY * height,
+                        10 * STD_WEIGHT_VELOCITY * height, 1e-5, 10 * STD_WEIGHT_VELOCITY * height])
+        self.means = np.vstack([self.means, np.concatenate([measurement, np.zeros(4)])])
+        self.covariances = np.concatenate([self.covariances, np.diag(std ** 2)[None]])
+        track = Track(str(self.next_id), raw_detection[2], raw_detection[1])
+        track.confirmed = self.n_init <= 1
+        self.tracks.append(track)
+        self.next_id += 1
+
+    def correct(self, track_indices, measurements):
+        """
+        Applies the Kalman update to the matched tracks, all at once.
+        """
+        means = self.means[track_indices]
+        covariances = self.covariances[track_indices]
+        heights = means[:, 3]
+        std = np.column_stack([STD_WEIGHT_POSITION * heights, STD_WEIGHT_POSITION * heights,
+                               np.full_like(heights, 1e-1), STD_WEIGHT_POSITION * heights])
+        projected_cov = UPDATE_MATRIX @ covariances @ UPDATE_MATRIX.T + diagonal_matrices(std ** 2)
+        # Kalman gain K = P H^T S^-1, solved as S K^T = H P
+        gain = np.linalg.solve(projected_cov, UPDATE_MATRIX @ covariances).transpose(0, 2, 1)
+        innovation = measurements - means[:, :4]
+        self.means[track_indices] = means + np.einsum('nij,nj->ni', gain, innovation)
+        self.covariances[track_indices] = covariances - gain @ projected_cov @ gain.transpose(0, 2, 1)
+
+    def refresh_boxes(self):
+        """
+        Stores the current box of every track for to_ltrb().
+        """
+        boxes = xyah_to_ltrb(self.means[:, :4])
+        for track, box in zip(self.tracks, boxes):
+            track.ltrb = box
+
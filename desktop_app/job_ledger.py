@@ -0,0 +1,253 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from config import JOB_LEDGER_PATH, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF, JOB_PRIORITY
+
+# Persistent record of the clips to analyze. Jobs are keyed by the SHA-256 of the
+# clip's content, so a clip is analyzed once however many filesystem events,
+# restarts or copies under another name it goes through.
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    digest TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    camera TEXT NOT NULL DEFAULT '',
+    recorded REAL NOT NULL DEFAULT 0,
+    claimed REAL,
+    size INTEGER NOT NULL DEFAULT -1
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, next_attempt);
+CREATE INDEX IF NOT EXISTS jobs_camera ON jobs (camera, claimed);
+CREATE INDEX IF NOT EXISTS jobs_file ON jobs (file_path);
+'''
+
+# Columns added after the first version of the ledger
+MIGRATIONS = {
+    'camera': "ALTER TABLE jobs ADD COLUMN camera TEXT NOT NULL DEFAULT ''",
+    'recorded': 'ALTER TABLE jobs ADD COLUMN recorded REAL NOT NULL DEFAULT 0',
+    'claimed': 'ALTER TABLE jobs ADD COLUMN claimed REAL',
+    'size': 'ALTER TABLE jobs ADD COLUMN size INTEGER NOT NULL DEFAULT -1',
+}
+
+# Order in which the due jobs are handed out, for every scheduling priority:
+# 'fifo' oldest recording first, 'newest' newest recording first, 'fair' the newest
+# recording of every camera in turn, starting with the camera served longest ago.
+PRIORITY_ORDERS = {
+    'fifo': 'recorded',
+    'newest': 'recorded DESC',
+    'fair': 'ROW_NUMBER() OVER (PARTITION BY camera ORDER BY recorded DESC), '
+            '(SELECT MAX(claimed) FROM jobs AS served WHERE served.camera = job.camera), recorded DESC',
+}
+
+# Camera id in clip names such as 20240518_101500_cam2.mp4
+CAMERA_PATTERN = re.compile(r'_cam(\w+)$')
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 of a file's content.
+
+    Parameters:
+    file_path (str): Path to the file.
+    chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+    str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def camera_of(file_path):
+    """
+    Returns the camera id in a clip's name, or '' for clips without one.
+    """
+    match = CAMERA_PATTERN.search(os.path.splitext(os.path.basename(file_path))[0])
+    return match.group(1) if match else ''
+
+
+class JobLedger:
+    """
+    SQLite-backed analysis job queue that survives restarts.
+
+    The connection is shared by the watcher's main loop and the watchdog thread,
+    every access goes through a lock.
+    """
+
+    def __init__(self, path=JOB_LEDGER_PATH, max_attempts=JOB_MAX_ATTEMPTS, retry_backoff=JOB_RETRY_BACKOFF):
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(jobs)')}
+        if columns:
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.connection.execute(statement)
+        self.connection.executescript(SCHEMA)
+
+    def add(self, file_path, digest=None):
+        """
+        Queues a clip unless a clip with the same content is already known.
+
+        A clip whose path, size and modification time are already in the ledger is skipped
+        without hashing it, so restarts don't read the whole archive again. A known clip
+        that is still waiting follows its file when it was moved or renamed.
+
+        Parameters:
+        file_path (str): Path to the clip.
+        digest (str): Content hash of the clip, computed when not given.
+
+        Returns:
+        bool: True if a new job was queued.
+        """
+        stat = os.stat(file_path)
+        if digest is None:
+            with self.lock:
+                known = self.connection.execute('SELECT 1 FROM jobs WHERE file_path = ? AND size = ? AND recorded = ?',
+                                                (file_path, stat.st_size, stat.st_mtime)).fetchone()
+            if known:
+                return False
+            digest = file_digest(file_path)
+        now = time.time()
+        with self.lock:
+            inserted = self.connection.execute(
+                'INSERT OR IGNORE INTO jobs (digest, file_path, state, created, updated, camera, recorded, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (digest, file_path, QUEUED, now, now, camera_of(file_path),
+                                                    stat.st_mtime, stat.st_size)).rowcount
+            if not inserted:
+                row = self.connection.execute('SELECT file_path, state FROM jobs WHERE digest = ?',
+                                              (digest,)).fetchone()
+                if row[0] == file_path:
+                    # Remember the file of jobs recorded before sizes were kept, for the next restart
+                    self.connection.execute('UPDATE jobs SET size = ?, recorded = ? WHERE digest = ?',
+                                            (stat.st_size, stat.st_mtime, digest))
+                elif row[1] == QUEUED and not os.path.exists(row[0]):
+                    self.connection.execute('UPDATE jobs SET file_path = ?, size = ?, recorded = ?, updated = ? '
+                                            'WHERE digest = ?', (file_path, stat.st_size, stat.st_mtime, now, digest))
+        return bool(inserted)
+
+    def recover(self):
+        """
+        Puts the jobs that were running when the watcher stopped back in the queue.
+
+        Their attempt stays counted, so a clip that crashes the worker every time ends up failed.
+
+        Returns:
+        int: Number of recovered jobs.
+        """
+        with self.lock:
+            return self.connection.execute('UPDATE jobs SET state = ?, updated = ? WHERE state = ?',
+                                           (QUEUED, time.time(), RUNNING)).rowcount
+
+    def claim(self, limit, priority=JOB_PRIORITY):
+        """
+        Marks up to limit queued jobs whose retry time has come as running.
+
+        Parameters:
+        limit (int): Maximum number of jobs to claim.
+        priority (str): Order of the jobs, one of PRIORITY_ORDERS.
+
+        Returns:
+        list: (digest, file_path) of the claimed jobs.
+        """
+        if limit <= 0:
+            return []
+        if priority not in PRIORITY_ORDERS:
+            raise ValueError(f"Unknown job priority: {priority}")
+        now = time.time()
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                jobs = self.connection.execute(
+                    'SELECT digest, file_path FROM jobs AS job WHERE state = ? AND next_attempt <= ? '
+                    f'ORDER BY {PRIORITY_ORDERS[priority]} LIMIT ?', (QUEUED, now, limit)).fetchall()
+                self.connection.executemany(
+                    'UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ?, claimed = ? WHERE digest = ?',
+                    [(RUNNING, now, now, digest) for digest, _ in jobs])
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+        return jobs
+
+    def complete(self, digest):
+        """
+        Marks a job as done, its clip is never analyzed again.
+        """
+        with self.lock:
+            self.connection.execute('UPDATE jobs SET state = ?, error = NULL, updated = ? WHERE digest = ?',
+                                    (DONE, time.time(), digest))
+
+    def fail(self, digest, error):
+        """
+        Records a failed attempt. The job is retried with exponential backoff until
+        it has used max_attempts, then it stays failed.
+
+        Parameters:
+        digest (str): Content hash of the clip.
+        error (str): Error message of the attempt.
+
+        Returns:
+        str: The new state of the job.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT attempts FROM jobs WHERE digest = ?', (digest,)).fetchone()
+            if row is None:
+                return None
+            attempts = row[0]
+            state = QUEUED if attempts < self.max_attempts else FAILED
+            next_attempt = now + self.retry_backoff * 2 ** (attempts - 1)
+            self.connection.execute('UPDATE jobs SET state = ?, error = ?, next_attempt = ?, updated = ? '
+                                    'WHERE digest = ?', (state, error, next_attempt, now, digest))
+        return state
+
+    def counts(self):
+        """
+        Returns the number of jobs in every state.
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def list_clips(directory):
+    """
+    Lists the files directly inside the detections directory.
+
+    Parameters:
+    directory (str): Directory to scan.
+
+    Returns:
+    list: Paths of the files, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    paths = [entry.path for entry in os.scandir(directory) if entry.is_file()]
+    return sorted(paths, key=os.path.getmtime)
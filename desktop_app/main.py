@@ -1,63 +1,34 @@
 import sys
-import os
 import cv2
 import time
-import datetime
+import threading
 import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QLabel, QComboBox
-from PyQt5.QtCore import QTimer, QThread, pyqtSignal
+from collections import deque
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QGridLayout, QWidget, QLabel, \
+    QComboBox
+from PyQt5.QtCore import QTimer, QThread
 from PyQt5.QtGui import QImage, QPixmap
 import webbrowser
-import shutil
-import os
+from motion import detect_motion_boxes, non_max_suppression
+from recorder import ClipRecorder, SegmentController
+from capture import LatestFrameCapture, ReconnectingCapture
+from frame_bus import FrameBusReader
+from camera_daemon import fetch_cameras, stream_url
+from regions import RegionMask, load_camera_regions
+from display import DisplayBuffers, grid_shape
+from config import RECORDING_FOURCC, CAMERA_ID, DISPLAY_FPS, CAMERA_SOURCE, CAMERA_REFRESH_SECONDS
 
+# QImage reads OpenCV's BGR frames directly since Qt 5.14, older versions need RGB
+BGR_DISPLAY = hasattr(QImage, 'Format_BGR888')
 
-def detect_movement(frame, mog2):
-    """
-    Detects movement in the frame using MOG2 background subtractor and morphological operations.
-
-    Parameters:
-    frame (numpy.ndarray): The current video frame.
-    mog2 (cv2.BackgroundSubtractorMOG2): The background subtractor object.
+# Size of the video area, shared by the camera tiles
+VIDEO_WIDTH = 800
+VIDEO_HEIGHT = 600
 
-    Returns:
-    tuple: A boolean indicating if movement is detected, the foreground mask, and the contours.
-    """
-    # Apply background subtraction to get the foreground mask
-    fg_mask = mog2.apply(frame)
-    # Define a kernel for morphological operations
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    # Close small holes in the foreground
-    closing = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
-    # Remove noise from the foreground
-    opening = cv2.morphologyEx(closing, cv2.MORPH_OPEN, kernel)
-    # Find contours in the foreground mask
-    contours, _ = cv2.findContours(opening, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    # Return whether movement is detected, the mask, and the contours
-    return len(contours) > 0, fg_mask, contours
-
-
-def start_recording(frame, fourcc):
-    """
-    Starts recording by initializing the VideoWriter object.
-
-    Parameters:
-    frame (numpy.ndarray): The current video frame.
-    fourcc (cv2.VideoWriter_fourcc): The codec for video recording.
-
-    Returns:
-    tuple: The VideoWriter object, the start time of the recording, and the filename.
-    """
-    # Ensure the directory for saving videos exists
-    if not os.path.exists('desktop_app/temp'):
-        os.makedirs('desktop_app/temp')
-    # Create a timestamped filename for the video
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = os.path.join('desktop_app/temp', f'{timestamp}.mp4')
-    # Initialize the VideoWriter object for recording
-    out = cv2.VideoWriter(filename, fourcc, 20.0, (frame.shape[1], frame.shape[0]))
-    # Return the VideoWriter, start time, and filename
-    return out, time.time(), filename
+# Seconds before the camera list is fetched again when the API could not be reached, or a stopped
+# camera is opened again, doubled after every failed attempt up to CAMERA_REFRESH_SECONDS. The API
+# is often still starting with the window.
+CAMERA_RETRY_SECONDS = 1.0
 
 
 def calculate_fps(start_time, frame_count):
@@ -77,176 +48,300 @@ def calculate_fps(start_time, frame_count):
     return frame_count / elapsed_time if elapsed_time > 0 else 0
 
 
-def non_max_suppression(boxes, overlap_thresh):
+def draw_overlays(image, scale, overlays):
     """
-    Perform non-max suppression to suppress overlapping bounding boxes.
+    Draws the detection status over a display-sized frame.
 
     Parameters:
-    boxes (list): List of bounding boxes.
-    overlapThresh (float): Overlap threshold.
-
-    Returns:
-    list: List of indices of bounding boxes to keep.
+    image (numpy.ndarray): The resized frame.
+    scale (float): Size of the image relative to the captured frame.
+    overlays (dict): Moving object boxes in frame coordinates, recording state, elapsed time and FPS.
     """
-    if len(boxes) == 0:
-        return []
-    if boxes.dtype.kind == "i":
-        boxes = boxes.astype("float")
-
-    pick = []
-    x1 = boxes[:, 0]
-    y1 = boxes[:, 1]
-    x2 = boxes[:, 2]
-    y2 = boxes[:, 3]
-    area = (x2 - x1 + 1) * (y2 - y1 + 1)
-    idxs = y2
-    idxs = idxs.argsort()
-
-    while len(idxs) > 0:
-        last = len(idxs) - 1
-        i = idxs[last]
-        pick.append(i)
-        xx1 = np.maximum(x1[i], x1[idxs[:last]])
-        yy1 = np.maximum(y1[i], y1[idxs[:last]])
-        xx2 = np.minimum(x2[i], x2[idxs[:last]])
-        yy2 = np.minimum(y2[i], y2[idxs[:last]])
-        w = np.maximum(0, xx2 - xx1 + 1)
-        h = np.maximum(0, yy2 - yy1 + 1)
-        overlap = (w * h) / area[idxs[:last]]
-        idxs = np.delete(idxs, np.concatenate(([last], np.where(overlap > overlap_thresh)[0])))
-
-    return pick
+    if overlays['recording']:
+        # Display recording status and elapsed time on the frame
+        cv2.putText(image, "Recording", (40, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 1, cv2.LINE_AA)
+        cv2.circle(image, (20, 60), 10, (0, 0, 255), -1)
+        cv2.putText(image, f"Time: {overlays['elapsed']:.2f}s", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 1,
+                    cv2.LINE_AA)
+
+    # Display the current FPS on the frame
+    cv2.putText(image, f"FPS: {overlays['fps']:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2,
+                cv2.LINE_AA)
+
+    # Draw bounding boxes around moving objects
+    for x1, y1, x2, y2 in np.round(overlays['boxes'] * scale).astype(int):
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
 
 
 class VideoThread(QThread):
-    update_frame = pyqtSignal(QImage)
+    """
+    Processing stage of the desktop pipeline of one camera.
 
-    def __init__(self):
+    A capture thread keeps the latest camera frame, this thread runs detection and
+    recording on it off the GUI thread, and the GUI picks up the latest processed
+    frame, resized to the camera's tile, at the screen refresh rate or DISPLAY_FPS.
+    Frames are dropped, never queued, when a stage can't keep up. Every camera has
+    its own thread, so the cameras are processed concurrently.
+
+    Parameters:
+    camera (dict): The camera as listed by the API, or None for the camera of the capture service.
+    """
+
+    def __init__(self, camera=None):
         super().__init__()
-        self.cap = None
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.display_frame)
+        if camera is None:
+            self.camera_id = CAMERA_ID
+            self.name = "Camera 0"
+            self.address = None
+            self.source = CAMERA_SOURCE
+        else:
+            self.camera_id = str(camera['id'])
+            self.name = camera['name']
+            self.address = camera['ip_address']
+            self.source = stream_url(camera['ip_address'])
+        self.capture = None
+        self.running = False
+        # Guards the detection and recording state shared with the GUI thread
+        self.lock = threading.Lock()
         self.detecting = False
-        self.recording = False
         self.mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True)
-        self.fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.out = None
-        self.movement_counter = 0
-        self.recording_start_time = None
+        self.fourcc = cv2.VideoWriter_fourcc(*RECORDING_FOURCC)
+        # Keeps the frames before the trigger and writes the clips
+        self.recorder = ClipRecorder(self.fourcc, camera=self.camera_id)
+        # Regions of interest of the camera, updated with the camera list
+        self.regions = None
+        if camera is not None:
+            self.set_regions(camera)
+        # Decides when clips start and stop from the detected movement
+        self.segments = SegmentController()
         self.frame_count = 0
         self.fps_start_time = time.time()
-        self.recording_path = ""
 
-    def start_camera(self, camera_index=0):
+        # Tile-sized copies of the processed frames, handed to the display stage. Only made while the tile is shown.
+        self.display = DisplayBuffers(DISPLAY_FPS, rgb=not BGR_DISPLAY)
+        self.visible = True
+        # Seconds from capture to the end of processing and to the display, of the recent frames
+        self.processing_latency = deque(maxlen=100)
+        self.display_latency = deque(maxlen=100)
+
+    def start_camera(self):
         """
         Starts the camera and initializes video capture.
-
-        Parameters:
-        camera_index (int): Index of the camera to use (default is 0).
         """
-        if self.cap is not None and self.cap.isOpened():
+        if self.running:
             return
-        # Open the video capture with the specified camera index
-        self.cap = cv2.VideoCapture(2)
-        if not self.cap.isOpened():
-            print("Error: Could not open camera.")
+        capture = self.open_capture()
+        if capture is None:
+            print(f"Error: Could not open {self.name}.")
             return
-        # Start a timer to periodically update the frame display
-        self.timer.start(30)
+        self.capture = capture
+        self.frame_count = 0
+        self.fps_start_time = time.time()
+        # Start processing the frames
+        self.running = True
+        self.start()
+
+    def open_capture(self, bus_only=False):
+        """
+        Opens the camera's capture.
+
+        Parameters:
+        bus_only (bool): Only attach to the frame bus, leaving the camera to the capture service.
+
+        Returns:
+        The started capture, or None if the camera could not be opened.
+        """
+        if self.source == CAMERA_SOURCE:
+            # Read the frames the capture service publishes on the frame bus, shared with the web live feed
+            capture = FrameBusReader()
+            if capture.start():
+                return capture
+            if bus_only:
+                return None
+            # No capture service running, open the camera and read it on its own thread
+            capture = LatestFrameCapture(CAMERA_SOURCE)
+            return capture if capture.start() else None
+        # Network camera, read on its own thread and reopened when the stream drops
+        capture = ReconnectingCapture(self.source)
+        capture.start()
+        return capture
+
+    def reopen_capture(self):
+        """
+        Replaces a capture that stopped, waiting for the camera with a backoff until it is back
+        or the camera is stopped. A restarted capture service is attached to again, the camera
+        is left to it.
+        """
+        closed = self.capture
+        closed.stop()
+        with self.lock:
+            # The clip of the stopped capture is finished, the next movement starts a new one
+            self.capture = None
+            self.recorder.close()
+            self.segments.reset()
+        retry = CAMERA_RETRY_SECONDS
+        next_attempt = time.monotonic()
+        while self.running:
+            if time.monotonic() >= next_attempt:
+                capture = self.open_capture(bus_only=isinstance(closed, FrameBusReader))
+                if capture is not None:
+                    print(f"{self.name} is back.")
+                    self.capture = capture
+                    return
+                next_attempt = time.monotonic() + retry
+                retry = min(retry * 2, CAMERA_REFRESH_SECONDS)
+            time.sleep(0.1)
+
+    def set_regions(self, camera):
+        """
+        Applies the regions of interest and exclusion zones of the camera, read by the next frame.
+        """
+        self.regions = RegionMask(camera['roi'], camera['exclusions']) or None
 
     def stop_camera(self):
         """
         Stops the camera and releases resources.
         """
-        self.timer.stop()
-        if self.cap:
-            self.cap.release()
-        if self.out:
-            self.out.release()
-        # Reset flags and counters
-        self.cap = None
-        self.out = None
-        self.detecting = False
-        self.recording = False
-        self.movement_counter = 0
+        self.running = False
+        self.wait()
+        if self.capture:
+            self.capture.stop()
+        with self.lock:
+            # Finish the current clip
+            self.recorder.close()
+            # Reset flags and counters
+            self.capture = None
+            self.detecting = False
+            self.segments.reset()
 
     def toggle_detection(self):
         """
         Toggles the movement detection on or off.
         """
-        self.detecting = not self.detecting
-        if not self.detecting:
-            if self.recording:
-                self.out.release()
-            self.recording = False
-            self.movement_counter = 0
+        with self.lock:
+            self.detecting = not self.detecting
+            if not self.detecting:
+                self.recorder.close()
+                self.segments.reset()
 
-    def display_frame(self):
+    def run(self):
         """
-        Captures and processes frames from the camera, displaying the video feed and handling detection and recording.
+        Takes the latest captured frame, processes it and prepares it for display, until the camera stops.
         """
-        ret, frame = self.cap.read()
-        if not ret:
-            return
+        sequence = 0
+        while self.running:
+            item = self.capture.read(sequence, timeout=0.5)
+            if item is None:
+                if self.capture.closed():
+                    print(f"{self.name} stopped, waiting for it to come back.")
+                    self.reopen_capture()
+                    sequence = 0
+                continue
+            sequence, frame, timestamp = item
+            # Frames of the frame bus are views of a slot the capture service reuses when it laps this thread
+            capture = self.capture
+            shared = isinstance(capture, FrameBusReader)
+            with self.lock:
+                if self.detecting and shared:
+                    # The recorder keeps the frame, take it out of the slot and drop it if it was overwritten
+                    frame = frame.copy()
+                    if not capture.valid(sequence):
+                        continue
+                    shared = False
+                overlays = self.process_frame(frame, timestamp)
+
+            # Resize the frame to its tile, at most DISPLAY_FPS times per second, and draw the overlays on the copy
+            if self.visible:
+                overlay = (lambda image, scale: draw_overlays(image, scale, overlays)) if overlays else None
+                valid = (lambda: capture.valid(sequence)) if shared else None
+                self.display.publish(frame, timestamp, overlay, valid)
+            self.processing_latency.append(time.time() - timestamp)
+
+    def process_frame(self, frame, timestamp):
+        """
+        Handles detection and recording on a captured frame.
+
+        The frame is only read. It is a copy when detection is on, the recorder keeps it.
+
+        Parameters:
+        frame (numpy.ndarray): The captured frame.
+        timestamp (float): Capture time of the frame.
 
+        Returns:
+        dict: What draw_overlays shows over the frame, or None when detection is off.
+        """
         self.frame_count += 1
 
         if self.detecting:
-            # Detect movement in the current frame
-            detection, fg_mask, contours = detect_movement(frame, self.mog2)
-            if detection:
-                self.movement_counter += 1
-            else:
-                self.movement_counter = 0
-
-            # Start recording if movement is detected for more than 30 frames
-            if self.movement_counter > 30 and not self.recording:
-                self.out, self.recording_start_time, self.recording_path = start_recording(frame, self.fourcc)
-                self.recording = True
-
-            if self.recording:
-                # Write the frame to the output video file
-                self.out.write(frame)
-                # Display recording status and elapsed time on the frame
-                cv2.putText(frame, "Recording", (40, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 1, cv2.LINE_AA)
-                cv2.circle(frame, (20, 60), 10, (0, 0, 255), -1)
-                elapsed_time = time.time() - self.recording_start_time
-                cv2.putText(frame, f'Time: {elapsed_time:.2f}s', (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 1,
-                            cv2.LINE_AA)
-                # Stop recording after 10 seconds
-                if time.time() - self.recording_start_time >= 10:
-                    self.recording = False
-                    self.out.release()
-                    # Move the recorded video to the detections folder
-                    if not os.path.exists('desktop_app/detections'):
-                        os.makedirs('desktop_app/detections')
-                    file_name = os.path.basename(self.recording_path)
-                    new_path = os.path.join('desktop_app/detections', file_name)
-                    shutil.move(self.recording_path, new_path)
-
-            # Calculate and display the current FPS on the frame
-            fps = calculate_fps(self.fps_start_time, self.frame_count)
-            cv2.putText(frame, f'FPS: {fps:.2f}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-
-            # Detect and draw bounding boxes around moving objects
-            boxes = []
-            for contour in contours:
-                if cv2.contourArea(contour) > 500:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    boxes.append([x, y, x + w, y + h])
+            # Network cameras report or measure their frame rate once the stream is open
+            fps = getattr(self.capture, 'fps', None)
+            if fps and fps != self.recorder.fps:
+                # Clips play at the camera's rate and the pre-roll holds PREROLL_SECONDS of it
+                self.recorder.set_fps(fps)
+
+            # Keep a copy of the raw frame for the pre-roll
+            self.recorder.push(frame, timestamp)
+
+            # Detect movement in the current frame, at reduced resolution
+            detection, fg_mask, boxes = detect_motion_boxes(frame, self.mog2, regions=self.regions)
+
+            # Start recording once movement persists, the clip starts with the frames buffered
+            # before the trigger. It lasts while movement continues and finished clips are
+            # moved to the detections folder.
+            action = self.segments.update(detection, timestamp)
+            if action == 'start':
+                self.recorder.start()
+            elif action == 'stop':
+                self.recorder.stop()
+            elif action == 'split':
+                self.recorder.split()
+
+            # Suppress the moving regions that overlap another one
             if len(boxes) > 0:
-                boxes = np.array(boxes)
-                pick = non_max_suppression(boxes, 0.3)
-                for i in pick:
-                    x1, y1, x2, y2 = boxes[i]
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                boxes = boxes[non_max_suppression(boxes, 0.3)]
 
-        # Convert the frame from BGR to RGB format for displaying in the GUI
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Convert the RGB image to QImage format
-        convert_to_qt_format = QImage(rgb_image.data, rgb_image.shape[1], rgb_image.shape[0], QImage.Format_RGB888)
-        # Emit the updated frame to be displayed in the GUI
-        self.update_frame.emit(convert_to_qt_format)
+            return {'boxes': boxes, 'recording': self.recorder.recording, 'elapsed': self.recorder.elapsed(),
+                    'fps': calculate_fps(self.fps_start_time, self.frame_count)}
+        return None
+
+    def latest_image(self):
+        """
+        Returns the latest processed frame as a QImage, or None if it was already shown.
+        Called by the display stage on the GUI thread.
+
+        The QImage wraps the display buffer without copying it, it is valid until the next call.
+        """
+        item = self.display.take()
+        if item is None:
+            return None
+        image, timestamp = item
+        self.display_latency.append(time.time() - timestamp)
+        height, width = image.shape[:2]
+        image_format = QImage.Format_BGR888 if BGR_DISPLAY else QImage.Format_RGB888
+        return QImage(image.data, width, height, image.strides[0], image_format)
+
+    def stats(self):
+        """
+        Returns the drop counters of every stage and the recent mean latencies in milliseconds.
+        """
+        capture = self.capture.stats() if self.capture else {'captured': 0, 'dropped': 0, 'failed_reads': 0}
+        processing_latency = list(self.processing_latency)
+        display_latency = list(self.display_latency)
+        recording = self.recorder.writer.stats()
+        display = self.display.stats()
+        return {
+            'captured': capture['captured'],
+            'capture_dropped': capture['dropped'],
+            'processed': self.frame_count,
+            'display_dropped': display['dropped'],
+            'display_skipped': display['skipped'],
+            'fps': calculate_fps(self.fps_start_time, self.frame_count),
+            'processing_latency': 1000 * np.mean(processing_latency) if processing_latency else 0,
+            'display_latency': 1000 * np.mean(display_latency) if display_latency else 0,
+            'recording_queue': recording['depth'],
+            'recording_dropped': recording['dropped'],
+            'recording_write_ms': recording['write_ms']
+        }
 
 
 class MainWindow(QMainWindow):
@@ -257,13 +352,22 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Camera Monitor")
         self.setGeometry(100, 100, 800, 600)
 
-        # Create a label to display the video feed
-        self.video_label = QLabel(self)
-        self.video_label.setFixedSize(800, 600)
+        # Create a grid of labels to display the video feeds, one tile per camera
+        self.video_area = QWidget(self)
+        self.video_area.setFixedSize(VIDEO_WIDTH, VIDEO_HEIGHT)
+        self.video_grid = QGridLayout(self.video_area)
+        self.video_grid.setContentsMargins(0, 0, 0, 0)
+        self.video_grid.setSpacing(0)
+        self.video_threads = []
+        self.video_labels = []
+        self.detecting = False
+
+        # Create a label for the drop and latency counters of the video pipelines
+        self.stats_label = QLabel(self)
 
-        # Create a dropdown for camera selection (currently supports only one camera)
+        # Create a dropdown to show every camera or a single one
         self.camera_selector = QComboBox(self)
-        self.camera_selector.addItem("Camera 0")
+        self.camera_selector.addItem("All cameras")
 
         # Create a button to start/stop movement detection
         self.start_button = QPushButton("Start Detection", self)
@@ -275,7 +379,8 @@ class MainWindow(QMainWindow):
 
         # Create a vertical layout and add widgets
         self.layout = QVBoxLayout()
-        self.layout.addWidget(self.video_label)
+        self.layout.addWidget(self.video_area)
+        self.layout.addWidget(self.stats_label)
         self.layout.addWidget(self.camera_selector)
         self.layout.addWidget(self.start_button)
         self.layout.addWidget(self.launch_button)
@@ -285,46 +390,191 @@ class MainWindow(QMainWindow):
         self.container.setLayout(self.layout)
         self.setCentralWidget(self.container)
 
-        # Initialize the video thread and connect the frame update signal to the image display slot
-        self.video_thread = VideoThread()
-        self.video_thread.update_frame.connect(self.set_image)
         # Connect camera selection change to the change_camera method
         self.camera_selector.currentIndexChanged.connect(self.change_camera)
 
-    def set_image(self, image):
+        # One pipeline per camera of the API, or the camera of the capture service when there are none.
+        # Starts with the latter, the list is fetched off the GUI thread until the API answers, then
+        # reloaded every CAMERA_REFRESH_SECONDS like the recording daemon does.
+        self.apply_cameras([])
+        self.camera_results = deque()
+        self.fetching_cameras = False
+        self.camera_retry = CAMERA_RETRY_SECONDS
+        self.next_camera_fetch = 0.0
+        self.camera_timer = QTimer(self)
+        self.camera_timer.timeout.connect(self.refresh_cameras)
+        self.camera_timer.start(500)
+        self.refresh_cameras()
+
+        # Show the latest processed frames once per screen refresh, or at DISPLAY_FPS if lower
+        refresh_rate = QApplication.primaryScreen().refreshRate() or 60
+        if DISPLAY_FPS:
+            refresh_rate = min(refresh_rate, DISPLAY_FPS)
+        self.display_timer = QTimer(self)
+        self.display_timer.timeout.connect(self.refresh_display)
+        self.display_timer.start(max(int(1000 / refresh_rate), 1))
+        # Update the pipeline counters every second
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+
+    def fetch_camera_list(self):
+        """
+        Fetches the camera list on a background thread, picked up by refresh_cameras. The
+        regions of the capture service's camera are fetched too when the API lists no cameras.
+        """
+        cameras = fetch_cameras()
+        regions = load_camera_regions(CAMERA_ID) if cameras == [] else None
+        self.camera_results.append((cameras, regions))
+
+    def refresh_cameras(self):
+        """
+        Applies a fetched camera list and starts the next fetch when it is due. A failed
+        fetch is retried after a backoff, the current cameras are kept meanwhile.
         """
-        Sets the image in the video label.
+        if self.camera_results:
+            cameras, regions = self.camera_results.popleft()
+            self.fetching_cameras = False
+            if cameras is None:
+                self.next_camera_fetch = time.monotonic() + self.camera_retry
+                self.camera_retry = min(self.camera_retry * 2, CAMERA_REFRESH_SECONDS)
+            else:
+                self.apply_cameras(cameras, regions)
+                self.next_camera_fetch = time.monotonic() + CAMERA_REFRESH_SECONDS
+                self.camera_retry = CAMERA_RETRY_SECONDS
+        if not self.fetching_cameras and time.monotonic() >= self.next_camera_fetch:
+            self.fetching_cameras = True
+            threading.Thread(target=self.fetch_camera_list, daemon=True).start()
+
+    def apply_cameras(self, cameras, regions=None):
+        """
+        Shows the cameras of a list: cameras that are new or whose address changed get a
+        pipeline and a tile, cameras that left the list are stopped and the regions of the
+        others are updated. The camera of the capture service is shown when the list is empty.
 
         Parameters:
+        cameras (list): The cameras as listed by the API.
+        regions (RegionMask): Regions of the capture service's camera, None when it has none.
+        """
+        wanted = {(str(camera['id']), camera['ip_address']): camera for camera in cameras} or {(CAMERA_ID, None): None}
+        for video_thread in list(self.video_threads):
+            if (video_thread.camera_id, video_thread.address) not in wanted:
+                print(f"Stopping {video_thread.name}")
+                self.remove_camera(video_thread)
+        shown = {(thread.camera_id, thread.address): thread for thread in self.video_threads}
+        for key, camera in wanted.items():
+            if key not in shown:
+                video_thread = VideoThread(camera)
+                self.add_camera(video_thread)
+            else:
+                video_thread = shown[key]
+            if camera is None:
+                video_thread.regions = regions
+            else:
+                video_thread.set_regions(camera)
+        self.change_camera(self.camera_selector.currentIndex())
+
+    def add_camera(self, video_thread):
+        """
+        Adds the tile of a camera, started right away when detection is on.
+        """
+        self.video_threads.append(video_thread)
+        self.video_labels.append(QLabel(self.video_area))
+        self.camera_selector.addItem(video_thread.name)
+        if self.detecting:
+            video_thread.start_camera()
+            video_thread.toggle_detection()
+
+    def remove_camera(self, video_thread):
+        """
+        Stops a camera, saving its current clip, and removes its tile.
+        """
+        index = self.video_threads.index(video_thread)
+        if self.camera_selector.currentIndex() == index + 1:
+            self.camera_selector.setCurrentIndex(0)  # Show every camera instead
+        video_thread.stop_camera()
+        video_thread.recorder.shutdown()
+        label = self.video_labels.pop(index)
+        self.video_grid.removeWidget(label)
+        label.deleteLater()
+        self.video_threads.pop(index)
+        self.camera_selector.removeItem(index + 1)
+
+    def refresh_display(self):
+        """
+        Displays the latest processed frame of every shown camera, if there is a new one.
+        """
+        for video_thread, label in zip(self.video_threads, self.video_labels):
+            if video_thread.visible:
+                image = video_thread.latest_image()
+                if image is not None:
+                    self.set_image(label, image)
+
+    def set_image(self, label, image):
+        """
+        Sets the image in a camera's label. The image already has the label's size.
+
+        Parameters:
+        label (QLabel): The tile of the camera.
         image (QImage): The image to display.
         """
-        self.video_label.setPixmap(QPixmap.fromImage(image))
+        label.setPixmap(QPixmap.fromImage(image))
+
+    def update_stats(self):
+        """
+        Shows the throughput of all the cameras and the drop and latency counters of each one.
+        """
+        stats = [video_thread.stats() for video_thread in self.video_threads]
+        lines = [f"{len(stats)} cameras, {sum(camera['fps'] for camera in stats):.1f} fps processed in total"]
+        for video_thread, camera in zip(self.video_threads, stats):
+            lines.append(f"{video_thread.name}: {camera['fps']:.1f} fps, captured {camera['captured']} "
+                         f"({camera['capture_dropped']} dropped before processing, "
+                         f"{camera['display_dropped']} before display, {camera['display_skipped']} "
+                         f"not displayed by the {DISPLAY_FPS:g} fps cap), latency "
+                         f"{camera['processing_latency']:.0f} ms processed, "
+                         f"{camera['display_latency']:.0f} ms displayed, recording queue "
+                         f"{camera['recording_queue']} ({camera['recording_dropped']} dropped, "
+                         f"{camera['recording_write_ms']:.1f} ms/frame)")
+        self.stats_label.setText("\n".join(lines))
 
     def toggle_detection(self):
         """
-        Toggles the movement detection on or off and updates the button text.
+        Toggles the movement detection of every camera on or off and updates the button text.
         """
-        if self.video_thread.detecting:
+        self.detecting = not self.detecting
+        if not self.detecting:
             # Stop detection if it's currently running
-            self.video_thread.toggle_detection()
+            for video_thread in self.video_threads:
+                video_thread.toggle_detection()
             self.start_button.setText("Start Detection")
         else:
-            # Start the camera and detection
-            self.video_thread.start_camera(self.camera_selector.currentIndex())
-            self.video_thread.toggle_detection()
+            # Start the cameras and detection
+            for video_thread in self.video_threads:
+                video_thread.start_camera()
+                video_thread.toggle_detection()
             self.start_button.setText("Stop Detection")
 
     def change_camera(self, index):
         """
-        Changes the camera input if detection is currently running.
+        Shows every camera in a grid, or a single camera over the whole video area. The
+        cameras that are not shown keep detecting and recording.
 
         Parameters:
-        index (int): The index of the selected camera.
+        index (int): 0 for all the cameras, otherwise the camera's position plus one.
         """
-        if self.video_thread.detecting:
-            # Stop and restart the camera with the new selection
-            self.video_thread.stop_camera()
-            self.video_thread.start_camera(index)
+        shown = list(range(len(self.video_threads))) if index == 0 else [index - 1]
+        columns, rows = grid_shape(len(shown))
+        width, height = VIDEO_WIDTH // columns, VIDEO_HEIGHT // rows
+        for position, (video_thread, label) in enumerate(zip(self.video_threads, self.video_labels)):
+            self.video_grid.removeWidget(label)
+            video_thread.visible = position in shown
+            label.setVisible(video_thread.visible)
+            if video_thread.visible:
+                # Frames are resized to the tile before they reach the GUI
+                tile = shown.index(position)
+                label.setFixedSize(width, height)
+                video_thread.display.set_area(width, height)
+                self.video_grid.addWidget(label, tile // columns, tile % columns)
 
     def closeEvent(self, event):
         """
@@ -333,8 +583,12 @@ class MainWindow(QMainWindow):
         Parameters:
         event (QCloseEvent): The close event.
         """
-        # Ensure the camera is stopped before closing the application
-        self.video_thread.stop_camera()
+        self.camera_timer.stop()
+        for video_thread in self.video_threads:
+            # Ensure the camera is stopped before closing the application
+            video_thread.stop_camera()
+            # Let the recording writer save the last clip
+            video_thread.recorder.shutdown()
         event.accept()
 
     def launch_website(self, event):
@@ -0,0 +1,181 @@
+import cv2
+import numpy as np
+from config import MOTION_SCALE
+
+# Moving regions smaller than this, in full resolution pixels, are not drawn
+MIN_MOTION_AREA = 500
+
+# Up to this many boxes, non_max_suppression computes the overlaps of all pairs at once.
+# Above it the quadratic matrix costs more than comparing each kept box with the rest.
+NMS_MATRIX_BOXES = 256
+
+
+def detect_movement(frame, mog2, mask=None):
+    """
+    Detects movement in the frame using MOG2 background subtractor and morphological operations.
+
+    Parameters:
+    frame (numpy.ndarray): The current video frame.
+    mog2 (cv2.BackgroundSubtractorMOG2): The background subtractor object.
+    mask (numpy.ndarray): Region mask of the frame size, movement outside it is ignored. None for the whole frame.
+
+    Returns:
+    tuple: A boolean indicating if movement is detected, the foreground mask, and the contours.
+    """
+    # Apply background subtraction to get the foreground mask
+    fg_mask = mog2.apply(frame)
+    # Define a kernel for morphological operations
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    # Close small holes in the foreground
+    closing = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+    # Remove noise from the foreground
+    opening = cv2.morphologyEx(closing, cv2.MORPH_OPEN, kernel)
+    # Ignore the foreground outside the regions of interest
+    if mask is not None:
+        cv2.bitwise_and(opening, mask, dst=opening)
+    # Find contours in the foreground mask
+    contours, _ = cv2.findContours(opening, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Return whether movement is detected, the mask, and the contours
+    return len(contours) > 0, fg_mask, contours
+
+
+def detect_motion_boxes(frame, mog2, scale=MOTION_SCALE, min_area=MIN_MOTION_AREA, regions=None):
+    """
+    Detects movement on a downscaled grayscale copy of the frame and returns the moving regions.
+
+    The background subtraction and the morphology run at the given scale, the contours are
+    filtered by area and their boxes scaled back to full resolution with array operations.
+    With regions only their bounding box is processed, and the foreground outside them is ignored.
+
+    Parameters:
+    frame (numpy.ndarray): The current video frame.
+    mog2 (cv2.BackgroundSubtractorMOG2): The background subtractor object, always fed at the same scale.
+    scale (float): Resolution of the detection relative to the frame, 1.0 for full resolution.
+    min_area (int): Minimum contour area of a moving region in full resolution pixels.
+    regions (RegionMask): Regions of interest and exclusion zones of the camera, None for the whole frame.
+
+    Returns:
+    tuple: A boolean indicating if movement is detected, the foreground mask of the processed
+    part of the frame at the detection scale, and an array of shape (n, 4) with the x1, y1, x2, y2 boxes of the large enough regions.
+    """
+    if scale != 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    x1, y1 = 0, 0
+    mask = None
+    if regions:
+        # Only the bounding box of the regions goes through the background model
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = regions.bounds(width, height)
+        if x2 <= x1 or y2 <= y1:
+            return False, np.zeros((0, 0), dtype=np.uint8), np.zeros((0, 4), dtype=int)
+        frame = frame[y1:y2, x1:x2]
+        mask = regions.mask(width, height)[y1:y2, x1:x2]
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    # Apply background subtraction to get the foreground mask
+    fg_mask = mog2.apply(gray)
+    # Same cleanup as detect_movement, with the kernel scaled to the detection resolution
+    size = max(int(round(5 * scale)) | 1, 3)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+    closing = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+    opening = cv2.morphologyEx(closing, cv2.MORPH_OPEN, kernel)
+    if mask is not None:
+        cv2.bitwise_and(opening, mask, dst=opening)
+    # Find contours in the foreground mask
+    contours, _ = cv2.findContours(opening, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = contour_boxes(contours, min_area * scale * scale)
+    boxes += [x1, y1, x1, y1]
+    boxes = np.round(boxes / scale).astype(int)
+    return len(contours) > 0, fg_mask, boxes
+
+
+def contour_boxes(contours, min_area):
+    """
+    Computes the bounding boxes of the contours larger than min_area, without a Python loop.
+
+    Parameters:
+    contours (tuple): Contours returned by cv2.findContours.
+    min_area (float): Minimum contour area, as computed by cv2.contourArea.
+
+    Returns:
+    numpy.ndarray: Array of shape (n, 4) with the x1, y1, x2, y2 box of every kept contour,
+    x2 and y2 exclusive like x + w and y + h of cv2.boundingRect.
+    """
+    if len(contours) == 0:
+        return np.zeros((0, 4), dtype=int)
+    lengths = np.array([len(contour) for contour in contours])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+
+    # Shoelace formula over every contour, each polygon closes back on its first point
+    following = np.arange(1, len(points) + 1)
+    following[starts + lengths - 1] = starts
+    x, y = points[:, 0], points[:, 1]
+    cross = x * y[following] - x[following] * y
+    areas = np.abs(np.add.reduceat(cross, starts)) / 2
+
+    boxes = np.column_stack([np.minimum.reduceat(x, starts), np.minimum.reduceat(y, starts),
+                             np.maximum.reduceat(x, starts) + 1, np.maximum.reduceat(y, starts) + 1])
+    return boxes[areas > min_area]
+
+
+def non_max_suppression(boxes, overlap_thresh, classes=None):
+    """
+    Perform non-max suppression to suppress overlapping bounding boxes.
+
+    Boxes are visited from the largest y2 down. A kept box suppresses the later boxes
+    that overlap it by more than overlap_thresh of their own area. For a few boxes the
+    overlaps of all pairs are computed in one array operation. For many, the coordinates
+    are sorted once and every kept box is compared with the boxes after it, on views,
+    without reallocating the candidates.
+
+    Parameters:
+    boxes (numpy.ndarray): Array of shape (n, 4) of x1, y1, x2, y2 boxes, with inclusive x2 and y2.
+    overlap_thresh (float): Overlap threshold.
+    classes (numpy.ndarray): Class of every box, boxes of different classes never suppress
+        each other. None to suppress across classes.
+
+    Returns:
+    list: List of indices of bounding boxes to keep, in the order they were kept.
+    """
+    if len(boxes) == 0:
+        return []
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float")
+
+    # Largest y2 first, ties in the same order as the original loop
+    order = boxes[:, 3].argsort()[::-1]
+    x1, y1, x2, y2 = boxes[order].T
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    if classes is not None:
+        classes = np.asarray(classes)[order]
+
+    pick = []
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    if len(boxes) <= NMS_MATRIX_BOXES:
+        # suppresses[i, j]: box i overlaps more than the threshold of box j's area
+        w = np.maximum(0, np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1) + 1)
+        h = np.maximum(0, np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1) + 1)
+        suppresses = (w * h) / area > overlap_thresh
+        if classes is not None:
+            suppresses &= classes[:, None] == classes
+        for position in range(len(boxes)):
+            if not suppressed[position]:
+                pick.append(order[position])
+                suppressed |= suppresses[position]
+        return pick
+
+    position = 0
+    while True:
+        pick.append(order[position])
+        rest = slice(position + 1, None)
+        w = np.maximum(0, np.minimum(x2[position], x2[rest]) - np.maximum(x1[position], x1[rest]) + 1)
+        h = np.maximum(0, np.minimum(y2[position], y2[rest]) - np.maximum(y1[position], y1[rest]) + 1)
+        overlapping = (w * h) / area[rest] > overlap_thresh
+        if classes is not None:
+            overlapping &= classes[rest] == classes[position]
+        suppressed[rest] |= overlapping
+        # Move on to the next box that is still a candidate
+        remaining = np.flatnonzero(~suppressed[rest])
+        if len(remaining) == 0:
+            return pick
+        position += 1 + remaining[0]
@@ -1,50 +1,197 @@
-import math
 import os
 import sys
+import time
 import cv2
+import numpy as np
 import subprocess
 import requests
-from ultralytics import YOLO
 from deep_sort_realtime.deepsort_tracker import DeepSort
+from detector import load_detector
+from iou_tracker import IouTracker
+from config import BATCH_SIZE, DETECTION_STRIDE, MOTION_GATE, MOTION_GATE_SCALE, ANNOTATE_VIDEO, TRACKER, \
+    METRICS_UPLOAD, DETECTOR_THREADS
+from motion import detect_motion_boxes
+from regions import load_camera_regions
+from job_ledger import camera_of
+import track_store
+from pipeline_metrics import PipelineMetrics
 
 API_URL = "http://127.0.0.1:5001/api"
+CLASSES_PATH = 'desktop_app/coco.names'
+TRACKED_CLASSES = ['person', 'dog', 'cat']
+MIN_CONFIDENCE = 0.63
+# Codecs browsers play, recordings in these are copied without encoding
+H264_CODECS = ('h264', 'avc1', 'avc3', 'x264')
 
 
-def run_ffmpeg(input_path, output_path):
+class AnalysisError(Exception):
     """
-    Reprocesses the video using ffmpeg to ensure compatibility.
+    Raised when a clip was analyzed but its result could not be encoded or uploaded,
+    so that the job is failed and retried.
+    """
+
+
+# Loaded once per process by load_models()
+detector = None
+tracker = None
+classes = []
+tracked_class_ids = []
+batch_buffer = None
+
+
+def load_models(threads=DETECTOR_THREADS):
+    """
+    Loads the detector, the tracker and the class names into the module globals.
+
+    A long-lived process calls this once and then analyzes any number of clips,
+    calling reset_tracker() between them.
+
+    Parameters:
+    threads (int): CPU threads for inference and OpenCV, 0 keeps the library defaults.
+    """
+    global detector, tracker, classes, tracked_class_ids
+    # The inference backend and resolution come from the deployment settings
+    if threads:
+        cv2.setNumThreads(threads)
+    detector = load_detector(threads=threads)
+    tracker = create_tracker()
+
+    # Load the class names for detection
+    with open(CLASSES_PATH, "r") as f:
+        classes = [line.strip() for line in f.readlines()]
+    tracked_class_ids = [cls_id for cls_id, name in enumerate(classes) if name in TRACKED_CLASSES]
+
+
+def create_tracker(kind=TRACKER):
+    """
+    Creates the tracker used to follow detections across frames.
+
+    Parameters:
+    kind (str): 'deepsort' for appearance embeddings, 'iou' for IoU and motion only.
+
+    Returns:
+    DeepSort or IouTracker: The tracker.
+    """
+    if kind == 'deepsort':
+        return DeepSort(max_age=30, n_init=3, nn_budget=70)
+    if kind == 'iou':
+        return IouTracker(max_age=30, n_init=3)
+    raise ValueError(f"Unknown tracker: {kind}")
+
+
+def reset_tracker():
+    """
+    Drops every track so that track IDs start again from 1 for the next clip.
+    """
+    tracker.delete_all_tracks()
+
+
+def open_encoder(output_path, width, height, fps):
+    """
+    Starts an ffmpeg process that encodes raw BGR frames from its stdin to H.264.
+
+    Parameters:
+    output_path (str): Path to save the encoded video.
+    width (int): Frame width in pixels.
+    height (int): Frame height in pixels.
+    fps (float): Frame rate of the video.
+
+    Returns:
+    subprocess.Popen: The ffmpeg process, frames are written to its stdin.
+    """
+    # Construct the ffmpeg command reading raw frames from a pipe
+    command = [
+        'ffmpeg',
+        '-y',  # Overwrite the output of a previous run
+        '-loglevel', 'error',
+        '-f', 'rawvideo',  # Input is raw frames...
+        '-pix_fmt', 'bgr24',  # ...in OpenCV's pixel layout
+        '-s', f'{width}x{height}',
+        '-r', f'{fps}',
+        '-i', '-',  # Read the frames from stdin
+        '-c:v', 'libx264',  # Video codec
+        '-crf', '23',  # Constant Rate Factor (quality)
+        '-preset', 'fast',  # Encoding speed/quality tradeoff
+        '-pix_fmt', 'yuv420p',  # Pixel format browsers can play
+        '-movflags', '+faststart',  # Allow playback to start before the whole file is downloaded
+        output_path
+    ]
+    return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+def close_encoder(encoder, output_path):
+    """
+    Finishes the encoding started by open_encoder.
 
     Parameters:
-    input_path (str): Path to the input video file.
-    output_path (str): Path to save the reprocessed video.
+    encoder (subprocess.Popen): The ffmpeg process.
+    output_path (str): Path of the encoded video, used for reporting.
+
+    Returns:
+    bool: True if ffmpeg encoded the video successfully.
     """
     try:
-        # Construct the ffmpeg command to reprocess the video
-        command = [
-            'ffmpeg',
-            '-i', input_path,
-            '-c:v', 'libx264',  # Video codec
-            '-crf', '23',  # Constant Rate Factor (quality)
-            '-preset', 'fast',  # Encoding speed/quality tradeoff
-            '-c:a', 'aac',  # Audio codec
-            '-b:a', '128k',  # Audio bitrate
-            output_path
-        ]
-        # Execute the command
+        encoder.stdin.close()
+    except BrokenPipeError:
+        pass
+    if encoder.wait() != 0:
+        print(f"Error during ffmpeg processing: exit status {encoder.returncode}")
+        return False
+    print(f"Encoded video saved to {output_path}.")
+    return True
+
+
+def get_codec(cap):
+    """
+    Returns the lowercase fourcc of the video stream, e.g. 'h264' or 'mp4v'.
+
+    Parameters:
+    cap (cv2.VideoCapture): The opened video.
+    """
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return ''.join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).lower()
+
+
+def remux_video(input_path, output_path, stream_copy=True):
+    """
+    Copies the recording into a browser friendly mp4 container without drawing on it.
+
+    Parameters:
+    input_path (str): Path to the original recording.
+    output_path (str): Path to save the video.
+    stream_copy (bool): Copy the H.264 stream as is. Recordings in other codecs are encoded once instead.
+
+    Returns:
+    bool: True if ffmpeg wrote the video successfully.
+    """
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-i', input_path]
+    if stream_copy:
+        command += ['-c', 'copy']  # No decoding or encoding at all
+    else:
+        command += ['-c:v', 'libx264', '-crf', '23', '-preset', 'fast', '-pix_fmt', 'yuv420p']
+    command += ['-movflags', '+faststart', output_path]
+    try:
         subprocess.run(command, check=True)
-        print(f"Reprocessed video saved to {output_path}.")
+        print(f"Remuxed video saved to {output_path}.")
+        return True
     except subprocess.CalledProcessError as e:
         print(f"Error during ffmpeg processing: {e}")
+        return False
 
 
-def upload_to_api(video_path, summary_path):
+def upload_to_api(video_path, summary_path, metrics=None):
     """
     Uploads the annotated video and summary to the API.
 
     Parameters:
     video_path (str): Path to the annotated video file.
     summary_path (str): Path to the summary text file.
+    metrics (PipelineMetrics): Receives the time spent on the two API calls.
+
+    Returns:
+    int: ID of the inserted footage, or None if the upload failed.
     """
+    metrics = metrics or PipelineMetrics()
     try:
         # Read the content of the summary file
         with open(summary_path, 'r') as summary_file:
@@ -62,20 +209,25 @@ def upload_to_api(video_path, summary_path):
 
         proxies = {'https': 'http://127.0.0.1:5001'}
         # Send POST request to the API
-        response = requests.post(f'{API_URL}/insert_footage', headers=headers, json=data, verify=False, proxies=proxies)
+        with metrics.stage('upload'):
+            response = requests.post(f'{API_URL}/insert_footage', headers=headers, json=data, verify=False,
+                                     proxies=proxies)
 
         if response.status_code == 200:
             print("Files uploaded successfully.")
             footage_id = response.json().get('id')
 
             # Insert an event associated with this footage
-            insert_event(footage_id, summary_content)
+            with metrics.stage('insert_event'):
+                insert_event(footage_id, summary_content)
+            return footage_id
 
         else:
             print(f"Failed to upload files. Status code: {response.status_code}")
             print("Response:", response.text)
     except Exception as e:
         print(f"An error occurred while uploading files: {e}")
+    return None
 
 
 def insert_event(footage_id, summary):
@@ -112,6 +264,31 @@ def insert_event(footage_id, summary):
         print(f"An error occurred while inserting event: {e}")
 
 
+def send_metrics(record, footage_id=None):
+    """
+    Sends the pipeline metrics of an analyzed clip to the API.
+
+    Parameters:
+    record (dict): Metrics record returned by PipelineMetrics.to_record.
+    footage_id (int): ID of the footage the clip was uploaded as, if any.
+    """
+    try:
+        headers = {
+            'Content-Type': 'application/json'
+        }
+
+        proxies = {'https': 'http://127.0.0.1:5001'}
+        # Send POST request to insert the metrics
+        response = requests.post(f"{API_URL}/insert_metrics", headers=headers,
+                                 json={'footage_id': footage_id, 'metrics': record}, verify=False, proxies=proxies)
+
+        if response.status_code != 200:
+            print(f"Failed to insert metrics. Status code: {response.status_code}")
+            print("Response:", response.text)
+    except Exception as e:
+        print(f"An error occurred while inserting metrics: {e}")
+
+
 def get_video_duration(video_path):
     """
     Get the duration of the video in seconds.
@@ -130,95 +307,299 @@ def get_video_duration(video_path):
     return duration
 
 
-def process_video(video_path):
+def get_batch_buffer(batch_size, height, width):
     """
-    Process the video for person detection and tracking, and save annotated video and summary.
+    Returns a preallocated buffer for a batch of decoded frames, reusing the previous one when possible.
 
     Parameters:
-    video_path (str): Path to the input video file.
+    batch_size (int): Number of frames in the batch.
+    height (int): Frame height in pixels.
+    width (int): Frame width in pixels.
+
+    Returns:
+    numpy.ndarray: Array of shape (batch_size, height, width, 3).
     """
-    # Create output directory if it does not exist
-    if not os.path.exists('analyses'):
-        os.makedirs('analyses')
+    global batch_buffer
+    if batch_buffer is None or batch_buffer.shape != (batch_size, height, width, 3):
+        batch_buffer = np.empty((batch_size, height, width, 3), dtype=np.uint8)
+    return batch_buffer
 
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    basename = os.path.basename(video_path)
-    annotated_video_path = os.path.join('analyses', f'{os.path.splitext(basename)[0]}_annotated.mp4')
-    summary_path = os.path.join('analyses', f'{os.path.splitext(basename)[0]}_summary.txt')
 
-    # Initialize video writer for annotated video
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(annotated_video_path, fourcc, fps, (width, height))
+def read_batch(cap, buffer):
+    """
+    Decodes the next frames of the video directly into the batch buffer.
 
-    summary_lines = []
-    logged_tracks = set()  # To keep track of logged person IDs
+    Parameters:
+    cap (cv2.VideoCapture): The opened video.
+    buffer (numpy.ndarray): Batch buffer returned by get_batch_buffer.
 
-    while cap.isOpened():
-        ret, frame = cap.read()
+    Returns:
+    int: Number of frames decoded, 0 at the end of the video.
+    """
+    count = 0
+    while count < len(buffer):
+        ret, frame = cap.read(buffer[count])
         if not ret:
             break
+        # OpenCV allocates a new array if the frame does not match the buffer
+        if not np.shares_memory(frame, buffer[count]):
+            buffer[count] = frame
+        count += 1
+    return count
+
+
+def detect_objects(frames, imgsz=None, regions=None):
+    """
+    Runs the detector on a batch of frames and keeps the confident detections of the tracked classes.
+
+    With regions the detector only sees their bounding box, and detections centered
+    outside the regions of interest or inside an exclusion zone are dropped.
+
+    Parameters:
+    frames (list): Frames (numpy.ndarray) to run the detector on in a single call.
+    imgsz (int): Input resolution of the detector, None for the configured one.
+    regions (RegionMask): Regions of interest and exclusion zones of the camera, None for the whole frame.
+
+    Returns:
+    list: For every frame, a list of ([left, top, width, height], confidence, class id) detections,
+    the format the trackers expect.
+    """
+    batch_detections = []
+    x1, y1 = 0, 0
+    if regions:
+        height, width = frames[0].shape[:2]
+        x1, y1, x2, y2 = regions.bounds(width, height)
+        if x2 <= x1 or y2 <= y1:
+            return [[] for _ in frames]
+        frames = [frame[y1:y2, x1:x2] for frame in frames]
+    # One row per box: x1, y1, x2, y2, confidence, class id
+    for data in detector(frames, imgsz):
+        conf = np.ceil(data[:, 4] * 100) / 100
+        cls_ids = data[:, 5].astype(int)
+        boxes = data[:, :4].astype(int) + [x1, y1, x1, y1]  # Back to full frame coordinates
+        keep = (conf >= MIN_CONFIDENCE) & np.isin(cls_ids, tracked_class_ids)
+        if regions:
+            keep &= regions.contains((boxes[:, :2] + boxes[:, 2:]) // 2, width, height)
+        boxes = boxes[keep]
+        boxes[:, 2:] -= boxes[:, :2]  # x2, y2 to width, height
+        boxes = boxes.tolist()
+        batch_detections.append(list(zip(boxes, conf[keep].tolist(), cls_ids[keep].tolist())))
+    return batch_detections
+
+
+def predict_tracks():
+    """
+    Advances every track by one frame using the Kalman prediction only, for frames
+    the detector is not run on.
 
-        # Detect objects in the frame using the model
-        results = model(frame, stream=True, verbose=False)
+    Prediction alone never deletes a track, the tracker does that on its next update.
+    Tracks not matched for more than max_age frames are left out meanwhile, so that a
+    long gated or strided gap does not keep drawing and storing them at drifting boxes.
 
-        # Filter detections for persons
-        detections = []
-        for result in results:
-            for box in result.boxes:
-                conf = math.ceil(box.conf[0] * 100) / 100
-                if conf < 0.63:
-                    continue
+    Returns:
+    list: The tracker's live tracks at their predicted positions.
+    """
+    if isinstance(tracker, DeepSort):
+        tracker.tracker.predict()
+        tracks, max_age = tracker.tracker.tracks, tracker.tracker.max_age
+    else:
+        tracks, max_age = tracker.predict(), tracker.max_age
+    return [track for track in tracks if track.time_since_update <= max_age]
 
-                cls_id = int(box.cls[0])
-                curr_class = classes[cls_id]
 
-                if curr_class in ['person', 'dog', 'cat']:
-                    x, y, x2, y2 = map(int, box.xyxy[0])
-                    detections.append(([x, y, x2, y2], conf, cls_id))
+def select_detection_frames(frames, first_index, stride, mog2=None, regions=None):
+    """
+    Decides which frames of a batch the detector runs on.
 
-        # Update tracker with current frame's detections
-        tracks = tracker.update_tracks(detections, frame=frame)
+    Parameters:
+    frames (list): Frames of the batch.
+    first_index (int): Index of the first frame of the batch in the video.
+    stride (int): The detector runs on at most every stride-th frame.
+    mog2 (cv2.BackgroundSubtractorMOG2): Motion gate, frames without foreground are skipped. None disables it.
+    regions (RegionMask): Motion outside the regions of the camera does not open the gate.
 
-        # Draw bounding boxes and track ids on the frame
-        for track in tracks:
-            if not track.is_confirmed():
-                continue
+    Returns:
+    list: One boolean per frame, True if the detector should run on it.
+    """
+    selected = []
+    for offset, frame in enumerate(frames):
+        run_detector = (first_index + offset) % stride == 0
+        if mog2 is not None:
+            # The background model sees every frame, at a reduced resolution to keep it cheap
+            movement, _, _ = detect_motion_boxes(frame, mog2, MOTION_GATE_SCALE, regions=regions)
+            run_detector = run_detector and movement
+        selected.append(run_detector)
+    return selected
+
+
+def process_video(video_path, batch_size=BATCH_SIZE, stride=DETECTION_STRIDE, motion_gate=MOTION_GATE,
+                  annotate=ANNOTATE_VIDEO, upload=True, send_metrics_to_api=METRICS_UPLOAD, imgsz=None, regions=None):
+    """
+    Process the video for person detection and tracking, and save annotated video and summary.
 
-            track_id = track.track_id
-            bbox = track.to_ltrb()
-            x1, y1, x2, y2 = map(int, bbox)
+    Without annotation the recording is copied as is and the web app draws the tracks
+    from the track store during playback.
 
-            # Draw bounding box and ID
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(frame, f'ID: {track_id}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (0, 255, 0), 2)
+    Parameters:
+    video_path (str): Path to the input video file.
+    batch_size (int): Number of frames sent to the detector per inference call.
+    stride (int): Run the detector on every stride-th frame only, tracks are predicted in between.
+    motion_gate (bool): Skip the detector on frames without foreground motion.
+    annotate (bool): Draw the tracks into the video, which requires encoding every frame again.
+    upload (bool): Upload the result to the API.
+    send_metrics_to_api (bool): Also send the per-stage timings to the API.
+    imgsz (int): Input resolution of the detector, None for the configured one.
+    regions (RegionMask): Regions of interest and exclusion zones of the camera, None to analyze the whole frame.
 
-            # Record summary if this ID hasn't been logged yet
-            if track_id not in logged_tracks:
-                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0  # Convert to seconds
-                summary_lines.append(f'Person detected at {timestamp:.2f} seconds, Track ID: {track_id}')
-                logged_tracks.add(track_id)
+    Returns:
+    dict: Report with the frame counts, the analysis time, the per-stage metrics record
+    and the confirmed tracks as rows with the fields of track_store.TRACK_COLUMNS.
+    """
+    # Create output directory if it does not exist
+    if not os.path.exists('analyses'):
+        os.makedirs('analyses')
 
-        # Write the annotated frame to the output video
-        out.write(frame)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    basename = os.path.basename(video_path)
+    encoded_video_path = os.path.join('analyses', f'{os.path.splitext(basename)[0]}_r.mp4')
+    summary_path = os.path.join('analyses', f'{os.path.splitext(basename)[0]}_summary.txt')
+    metrics_path = os.path.join('analyses', f'{os.path.splitext(basename)[0]}_metrics.json')
+    codec = get_codec(cap)
 
-    # Release resources
-    cap.release()
-    out.release()
+    # Stream the annotated frames straight into a single H.264 encoder
+    encoder = open_encoder(encoded_video_path, width, height, fps or 20.0) if annotate else None
+
+    try:
+        # Start every clip with fresh track IDs, the tracker may have seen other clips
+        reset_tracker()
+
+        summary_lines = []
+        logged_tracks = set()  # To keep track of logged person IDs
+        track_rows = []
+        frame_index = 0
+        buffer = get_batch_buffer(batch_size, height, width)
+        # Same background subtractor settings as the desktop recorder
+        mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True) if motion_gate else None
+        metrics = PipelineMetrics(video_path)
+        start_time = time.perf_counter()
+
+        while cap.isOpened():
+            # Decode the next batch of frames into the reusable buffer
+            with metrics.stage('decode'):
+                count = read_batch(cap, buffer)
+            if count == 0:
+                break
+            frames = list(buffer[:count])
+            metrics.count('frames_decoded', count)
+
+            # Detect objects in the selected frames of the batch with a single model call
+            with metrics.stage('motion_gate'):
+                selected = select_detection_frames(frames, frame_index, stride, mog2, regions)
+            detection_frames = [frame for frame, run_detector in zip(frames, selected) if run_detector]
+            with metrics.stage('inference'):
+                batch_detections = detect_objects(detection_frames, imgsz, regions) if detection_frames else []
+            metrics.count('frames_inferred', len(detection_frames))
+            metrics.count('detections', sum(len(detections) for detections in batch_detections))
+            batch_detections = iter(batch_detections)
+
+            # Update the tracker frame by frame, in order
+            for frame, run_detector in zip(frames, selected):
+                with metrics.stage('tracking'):
+                    if run_detector:
+                        tracks = tracker.update_tracks(next(batch_detections), frame=frame)
+                    else:
+                        tracks = predict_tracks()
+
+                    confirmed = []
+                    for track in tracks:
+                        if not track.is_confirmed():
+                            continue
+
+                        track_id = track.track_id
+                        bbox = track.to_ltrb()
+                        x1, y1, x2, y2 = map(int, bbox)
+                        timestamp = frame_index / fps if fps else 0
+                        track_rows.append((frame_index, timestamp, int(track_id), track.det_class or 0,
+                                           track.det_conf or 0, x1, y1, x2, y2))
+                        confirmed.append((track_id, x1, y1, x2, y2))
+
+                        # Record summary if this ID hasn't been logged yet
+                        if track_id not in logged_tracks:
+                            summary_lines.append(f'Person detected at {timestamp:.2f} seconds, Track ID: {track_id}')
+                            logged_tracks.add(track_id)
+                metrics.count('tracks', len(confirmed))
+
+                if annotate:
+                    # Draw bounding boxes and track ids on the frame
+                    with metrics.stage('drawing'):
+                        for track_id, x1, y1, x2, y2 in confirmed:
+                            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                            cv2.putText(frame, f'ID: {track_id}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.75,
+                                        (0, 255, 0), 2)
+
+                    # Pipe the annotated frame to the encoder
+                    with metrics.stage('encode'):
+                        try:
+                            encoder.stdin.write(frame.data)
+                        except BrokenPipeError:
+                            pass  # ffmpeg exited, close_encoder reports the error
+                frame_index += 1
+    except BaseException:
+        # Don't leave an ffmpeg process behind in a long-lived worker
+        if encoder is not None:
+            encoder.kill()
+            encoder.wait()
+            try:
+                encoder.stdin.close()
+            except OSError:
+                pass
+        raise
+    finally:
+        cap.release()
+
+    analysis_time = time.perf_counter() - start_time
+    metrics.count('unique_tracks', len(logged_tracks))
+
+    with metrics.stage('ffmpeg'):
+        if annotate:
+            encoded = close_encoder(encoder, encoded_video_path)
+        else:
+            # Keep the recording as it is and let the web app draw the tracks
+            encoded = remux_video(video_path, encoded_video_path, stream_copy=codec in H264_CODECS)
+    if not encoded:
+        raise AnalysisError(f"Could not write the analyzed video {encoded_video_path}")
 
     # Write summary to a text file
     with open(summary_path, 'w') as file:
         for line in summary_lines:
             file.write(line + '\n')
 
-    # Reprocess the video using ffmpeg
-    reprocessed_video_path = os.path.join('analyses', f'{os.path.splitext(basename)[0]}_r.mp4')
-    run_ffmpeg(annotated_video_path, reprocessed_video_path)
-
-    # Upload the reprocessed video and summary to the API
-    upload_to_api(reprocessed_video_path, summary_path)
+    # Upload the encoded video and summary to the API, then store the tracks under the new footage id
+    footage_id = None
+    if upload:
+        footage_id = upload_to_api(encoded_video_path, summary_path, metrics)
+        if footage_id is None:
+            raise AnalysisError(f"Could not upload the analyzed video {encoded_video_path}")
+        with metrics.stage('track_store'):
+            track_store.append_tracks('analyses', footage_id, track_rows, fps, width, height, annotated=annotate)
+
+    # Save the per-stage timings next to the other analysis outputs
+    record = metrics.write(metrics_path)
+    if upload and send_metrics_to_api:
+        send_metrics(record, footage_id)
+
+    return {
+        'file_path': video_path,
+        'frames': frame_index,
+        'frames_inferred': metrics.counters['frames_inferred'],
+        'frames_skipped': frame_index - metrics.counters['frames_inferred'],
+        'analysis_time': analysis_time,
+        'metrics': record,
+        'tracks': track_rows
+    }
 
 
 if __name__ == "__main__":
@@ -226,16 +607,11 @@ if __name__ == "__main__":
         print("Usage: python movement_analysis.py <file_path>")
         sys.exit(1)
 
-    # Load the YOLO model and DeepSort tracker
-    model = YOLO('desktop_app/yolov8n.pt')
-    tracker = DeepSort(max_age=30, n_init=3, nn_budget=70)
-
-    # Load the class names for detection
-    with open("desktop_app/coco.names", "r") as f:
-        classes = [line.strip() for line in f.readlines()]
+    # Load the detector, the tracker and the class names
+    load_models()
 
     # Process the input video file
     file_path = sys.argv[1]
     print(f"Analyzing video {file_path}")
-    process_video(file_path)
+    process_video(file_path, regions=load_camera_regions(camera_of(file_path)))
     print(f"Done analyzing video {file_path}")
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import socket
+try:
+    import resource
+except ImportError:
+    # Windows, the CPU time of child processes is not available
+    resource = None
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def cpu_time():
+    """
+    Returns the CPU time used so far by this process and its finished child processes, like ffmpeg.
+    Without the resource module only the time of this process is counted.
+    """
+    if resource is None:
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class PipelineMetrics:
+    """
+    Collects the wall and CPU time of every stage of a clip's analysis, and counters.
+    """
+
+    def __init__(self, file_path=''):
+        self.file_path = file_path
+        self.started = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = cpu_time()
+        self.stages = defaultdict(lambda: {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block and adds it to the stage's totals.
+
+        Parameters:
+        name (str): Name of the stage, e.g. 'decode' or 'inference'.
+        """
+        start_wall = time.perf_counter()
+        start_cpu = cpu_time()
+        try:
+            yield
+        finally:
+            totals = self.stages[name]
+            totals['wall'] += time.perf_counter() - start_wall
+            totals['cpu'] += cpu_time() - start_cpu
+            totals['calls'] += 1
+
+    def count(self, name, amount=1):
+        """
+        Increments a counter, e.g. the number of frames decoded.
+        """
+        self.counters[name] += amount
+
+    def to_record(self):
+        """
+        Returns the metrics as a JSON serializable dictionary.
+        """
+        return {
+            'file_path': self.file_path,
+            'host': socket.gethostname(),
+            'cpu_count': os.cpu_count(),
+            'started': self.started,
+            'wall': time.perf_counter() - self.start_wall,
+            'cpu': cpu_time() - self.start_cpu,
+            'counters': dict(self.counters),
+            'stages': {name: dict(totals) for name, totals in self.stages.items()}
+        }
+
+    def write(self, path):
+        """
+        Saves the metrics record as JSON.
+
+        Parameters:
+        path (str): Path of the JSON file.
+
+        Returns:
+        dict: The record that was written.
+        """
+        record = self.to_record()
+        with open(path, 'w') as file:
+            json.dump(record, file, indent=2)
+        return record
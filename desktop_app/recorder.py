@@ -0,0 +1,584 @@
+import os
+import time
+import shutil
+import datetime
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from config import PREROLL_SECONDS, POSTROLL_SECONDS, PREROLL_BUDGET_MB, RECORDING_FPS, SEGMENT_START_FRAMES, \
+    SEGMENT_STOP_SECONDS, SEGMENT_MIN_SECONDS, SEGMENT_MAX_SECONDS, RECORDING_QUEUE_FRAMES, RECORDING_OVERFLOW
+
+TEMP_DIR = 'desktop_app/temp'
+DETECTIONS_DIR = 'desktop_app/detections'
+
+# What the recording writer does with a frame when its queue is full: 'block' the
+# caller until there is room, drop the 'drop_newest' frame or the 'drop_oldest' queued one
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+
+def start_recording(frame, fourcc, fps=RECORDING_FPS, camera=''):
+    """
+    Starts recording by initializing the VideoWriter object.
+
+    Parameters:
+    frame (numpy.ndarray): The current video frame.
+    fourcc (cv2.VideoWriter_fourcc): The codec for video recording.
+    fps (float): Frame rate of the recording.
+    camera (str): ID of the camera, keeps the files of cameras recording at the same time apart.
+
+    Returns:
+    tuple: The VideoWriter object, the start time of the recording, and the filename.
+    """
+    # Ensure the directory for saving videos exists
+    if not os.path.exists(TEMP_DIR):
+        os.makedirs(TEMP_DIR)
+    # Create a free timestamped filename for the video
+    filename = clip_path(TEMP_DIR, time.time(), camera)
+    # Initialize the VideoWriter object for recording
+    out = cv2.VideoWriter(filename, fourcc, fps, (frame.shape[1], frame.shape[0]))
+    # Return the VideoWriter, start time, and filename
+    return out, time.time(), filename
+
+
+def discard_clip(writer, path):
+    """
+    Releases a clip that failed to be written and deletes its file.
+
+    Parameters:
+    writer (cv2.VideoWriter): The writer of the clip, or None if it was not opened.
+    path (str): The file of the clip, or None.
+    """
+    try:
+        if writer is not None:
+            writer.release()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+    except Exception as e:
+        print(f"Error while discarding the clip {path}: {e}")
+
+
+def clip_path(directory, timestamp, camera=''):
+    """
+    Returns a free path for a clip starting at the given time, e.g. 20240518_101500.mp4,
+    or 20240518_101500_cam2.mp4 for a clip of camera 2.
+    """
+    name = datetime.datetime.fromtimestamp(timestamp).strftime("%Y%m%d_%H%M%S")
+    camera = f'_cam{camera}' if camera else ''
+    path = os.path.join(directory, f'{name}{camera}.mp4')
+    suffix = 1
+    while os.path.exists(path):
+        # The camera stays last, job_ledger.camera_of reads it from the end of the name
+        path = os.path.join(directory, f'{name}_{suffix}{camera}.mp4')
+        suffix += 1
+    return path
+
+
+class FrameRing:
+    """
+    Fixed-size ring of the most recent raw frames, allocated once.
+
+    Pushing into a full ring overwrites the oldest frame. The ring has two storages of the
+    same size: detach hands the filled one to the writer and the ring continues in the other,
+    which the writer gives back through release once the frames are written. Frames pushed
+    while both storages are with the writer are skipped.
+    """
+
+    def __init__(self, capacity, shape, dtype=np.uint8):
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.frames = np.empty((capacity,) + self.shape, dtype=dtype)
+        # Allocated lazily by the OS, the pages are only touched once the ring continues in it
+        self.spare = np.empty_like(self.frames)
+        self.lock = threading.Lock()  # Guards spare, released by the writer thread
+        self.timestamps = np.zeros(capacity)
+        self.start = 0
+        self.count = 0
+        self.skipped = 0
+
+    @staticmethod
+    def capacity_for(seconds, fps, frame_bytes, budget_bytes):
+        """
+        Returns the number of frames needed for the given duration, capped by the memory budget.
+
+        Parameters:
+        seconds (float): Duration to hold.
+        fps (float): Frame rate of the camera.
+        frame_bytes (int): Size of one frame.
+        budget_bytes (int): Memory the ring may use.
+
+        Returns:
+        int: Capacity in frames, at least 1.
+        """
+        wanted = int(np.ceil(seconds * fps))
+        return max(min(wanted, budget_bytes // frame_bytes), 1)
+
+    def __len__(self):
+        return self.count
+
+    def full(self):
+        return self.count == self.capacity
+
+    def push(self, frame, timestamp):
+        """
+        Copies a frame into the ring.
+        """
+        if self.frames is None:
+            with self.lock:
+                self.frames, self.spare = self.spare, None
+            if self.frames is None:
+                self.skipped += 1  # Both storages are still queued for writing
+                return
+        index = (self.start + self.count) % self.capacity
+        np.copyto(self.frames[index], frame)
+        self.timestamps[index] = timestamp
+        if self.full():
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.count += 1
+
+    def pop(self):
+        """
+        Removes the oldest frame.
+
+        Returns:
+        tuple: The frame, a view valid until the next push, and its timestamp.
+        """
+        index = self.start
+        self.start = (self.start + 1) % self.capacity
+        self.count -= 1
+        return self.frames[index], self.timestamps[index]
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+
+    def detach(self):
+        """
+        Hands over the buffered frames without copying them and continues in the spare storage.
+
+        Returns:
+        tuple: The frame storage, the indices of the buffered frames oldest first, and their
+        timestamps. The storage must be given back with release, unless there are no indices.
+        """
+        indices = [(self.start + i) % self.capacity for i in range(self.count)]
+        frames = self.frames
+        timestamps = self.timestamps[indices]
+        if indices:
+            with self.lock:
+                self.frames, self.spare = self.spare, None
+        self.clear()
+        return frames, indices, timestamps
+
+    def release(self, frames):
+        """
+        Gives back a storage handed over by detach, once its frames are written. Called by the writer thread.
+        """
+        with self.lock:
+            self.spare = frames
+
+
+class ClipWriter:
+    """
+    Writes clips on its own thread, so slow storage never stalls capture.
+
+    Frames go through a queue bounded to max_frames. Opening the VideoWriter, writing,
+    closing and moving the finished clip to its folder all happen on the writer thread.
+    """
+
+    def __init__(self, fourcc, fps=RECORDING_FPS, max_frames=RECORDING_QUEUE_FRAMES, overflow=RECORDING_OVERFLOW,
+                 camera=''):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown recording overflow policy: {overflow}")
+        self.fourcc = fourcc
+        self.fps = fps
+        self.camera = camera
+        self.max_frames = max_frames
+        self.overflow = overflow
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.queued_frames = 0
+        self.busy = False
+        self.running = True
+        self.alive = True
+        self.finished = deque()
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.write_time = 0.0
+        self.cpu_time = 0.0
+        self.blocked_time = 0.0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def put(self, item, frames=0):
+        with self.condition:
+            self.queue.append(item)
+            self.queued_frames += frames
+            self.max_depth = max(self.max_depth, self.queued_frames)
+            self.condition.notify_all()
+
+    def write(self, frame, timestamp):
+        """
+        Queues a frame of the current clip, applying the overflow policy when the queue is full.
+
+        Parameters:
+        frame (numpy.ndarray): The frame, copied before it is queued.
+        timestamp (float): Capture time of the frame.
+
+        Returns:
+        bool: False if a frame was dropped.
+        """
+        kept = True
+        frame = frame.copy()
+        with self.condition:
+            if self.queued_frames >= self.max_frames and self.alive:
+                if self.overflow == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.overflow == 'drop_oldest':
+                    oldest = next((i for i, item in enumerate(self.queue) if item[0] == 'frame'), None)
+                    if oldest is None:
+                        # Only the pre-roll is queued, it is never dropped, so the new frame is
+                        self.dropped += 1
+                        return False
+                    del self.queue[oldest]
+                    self.queued_frames -= 1
+                    self.dropped += 1
+                    kept = False
+                else:
+                    start = time.perf_counter()
+                    self.condition.wait_for(lambda: self.queued_frames < self.max_frames or not self.alive)
+                    self.blocked_time += time.perf_counter() - start
+            if not self.alive:
+                self.dropped += 1  # Nothing would write it
+                return False
+            self.put(('frame', frame, timestamp), 1)
+        return kept
+
+    def write_preroll(self, frames, indices, timestamps, release=None):
+        """
+        Queues the pre-roll handed over by FrameRing.detach, without copying it.
+
+        Parameters:
+        release (callable): Called with the storage once its frames are written or dropped.
+        """
+        if not indices:
+            return
+        with self.condition:
+            if not self.alive:
+                self.dropped += len(indices)
+                if release is not None:
+                    release(frames)
+                return
+        self.put(('preroll', frames, indices, timestamps, release), len(indices))
+
+    def close_clip(self, output_dir, camera=''):
+        """
+        Closes the current clip once its queued frames are written and moves it to output_dir,
+        named after its start time and camera.
+        """
+        self.put(('close', output_dir, camera))
+
+    def run(self):
+        try:
+            self.drain()
+        finally:
+            # Callers waiting for the queue must not wait for a thread that is gone
+            with self.condition:
+                self.alive = False
+                self.condition.notify_all()
+
+    def drain(self):
+        """
+        Writes the queued items until stopped. An item that fails discards its clip, the
+        following frames of that clip are dropped and the next clip starts afresh.
+        """
+        writer = None
+        writer_path = None
+        clip_start = None
+        broken = False
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue or not self.running)
+                if not self.queue:
+                    return
+                item = self.queue.popleft()
+                self.busy = True
+
+            start = time.perf_counter()
+            start_cpu = time.thread_time()
+            if item[0] == 'frame':
+                frames = [(item[1], item[2])]
+            elif item[0] == 'preroll':
+                _, storage, indices, timestamps, release = item
+                frames = [(storage[index], timestamp) for index, timestamp in zip(indices, timestamps)]
+            else:
+                frames = []
+            written = 0
+            try:
+                if item[0] == 'close':
+                    if writer is not None:
+                        writer.release()
+                        output_dir = item[1]
+                        if not os.path.exists(output_dir):
+                            os.makedirs(output_dir)
+                        # Name the clip after its first frame, which is in the pre-roll
+                        new_path = clip_path(output_dir, clip_start, item[2])
+                        shutil.move(writer_path, new_path)
+                        self.finished.append(new_path)
+                    writer = None
+                    broken = False
+                elif not broken:
+                    for frame, timestamp in frames:
+                        if writer is None:
+                            writer, _, writer_path = start_recording(frame, self.fourcc, self.fps, self.camera)
+                            clip_start = timestamp
+                        writer.write(frame)
+                        written += 1
+            except Exception as e:
+                print(f"Error while writing the clip, discarding it: {e}")
+                discard_clip(writer, writer_path)
+                writer = None
+                broken = item[0] != 'close'
+            if item[0] == 'preroll' and release is not None:
+                release(storage)  # The ring may continue in it
+
+            with self.condition:
+                self.write_time += time.perf_counter() - start
+                self.cpu_time += time.thread_time() - start_cpu
+                self.written += written
+                self.dropped += len(frames) - written
+                self.queued_frames -= len(frames)
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued frame is written and every queued clip is closed.
+
+        Returns:
+        bool: False on timeout.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: (not self.queue and not self.busy) or not self.alive, timeout)
+
+    def stop(self):
+        """
+        Writes what is queued and stops the writer thread.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+
+    def stats(self):
+        """
+        Returns the queue depth, the number of written and dropped frames, the deepest the
+        queue got, the mean write time per frame in milliseconds, the CPU seconds spent
+        encoding and the seconds callers were blocked.
+        """
+        with self.condition:
+            return {'depth': self.queued_frames, 'written': self.written, 'dropped': self.dropped,
+                    'max_depth': self.max_depth,
+                    'write_ms': 1000 * self.write_time / self.written if self.written else 0,
+                    'cpu': self.cpu_time, 'blocked': self.blocked_time}
+
+
+class ClipRecorder:
+    """
+    Records clips that start PREROLL_SECONDS before the trigger and end POSTROLL_SECONDS after the stop.
+
+    While idle every raw frame goes into a preallocated ring that keeps the pre-roll.
+    On a trigger the ring's storage is handed to the ClipWriter thread and the following
+    frames are queued to it, the caller never waits for the disk.
+    """
+
+    def __init__(self, fourcc, fps=RECORDING_FPS, preroll_seconds=PREROLL_SECONDS,
+                 postroll_seconds=POSTROLL_SECONDS, budget_bytes=PREROLL_BUDGET_MB * 2 ** 20,
+                 output_dir=DETECTIONS_DIR, writer=None, camera=''):
+        self.fps = fps
+        self.preroll_seconds = preroll_seconds
+        self.postroll_seconds = postroll_seconds
+        self.budget_bytes = budget_bytes
+        self.output_dir = output_dir
+        self.camera = camera
+        self.writer = writer or ClipWriter(fourcc, fps, camera=camera)
+        self.ring = None
+        self.ring_fps = None
+        self.recording = False
+        self.started_at = None
+        self.postroll_until = None
+
+    def push(self, frame, timestamp=None):
+        """
+        Feeds a captured frame, before anything is drawn on it.
+
+        Parameters:
+        frame (numpy.ndarray): The raw frame.
+        timestamp (float): Capture time, now by default.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if self.ring is None or self.ring.shape != frame.shape:
+            if self.ring is not None:
+                self.close()  # The camera changed, finish the clip in the old size
+            self.new_ring(frame)
+        elif self.ring_fps != self.fps and not self.recording:
+            self.new_ring(frame)  # Size the pre-roll for the frame rate the camera reported
+
+        if not self.recording:
+            self.ring.push(frame, timestamp)
+            return
+        self.writer.write(frame, timestamp)
+        if self.postroll_until is not None and timestamp >= self.postroll_until:
+            self.finish()
+
+    def new_ring(self, frame):
+        """
+        Allocates the pre-roll ring for frames like frame at the current frame rate.
+        """
+        # The budget covers both storages of the ring
+        capacity = FrameRing.capacity_for(self.preroll_seconds, self.fps, frame.nbytes, self.budget_bytes // 2)
+        self.ring = FrameRing(capacity, frame.shape, frame.dtype)
+        self.ring_fps = self.fps
+
+    def set_fps(self, fps):
+        """
+        Sets the frame rate of the camera. The next clips are written at it and the pre-roll
+        is sized for it, after the current clip.
+        """
+        self.fps = fps
+        with self.writer.condition:
+            self.writer.fps = fps
+
+    def start(self):
+        """
+        Starts a clip with the buffered pre-roll, or cancels the post-roll of the current one.
+        """
+        if not self.recording:
+            self.recording = True
+            self.started_at = time.time()
+            if self.ring is not None:
+                self.writer.write_preroll(*self.ring.detach(), release=self.ring.release)
+        self.postroll_until = None
+
+    def stop(self, timestamp=None):
+        """
+        Ends the clip after the post-roll.
+
+        Parameters:
+        timestamp (float): Time of the stop, now by default.
+        """
+        if self.recording and self.postroll_until is None:
+            self.postroll_until = (time.time() if timestamp is None else timestamp) + self.postroll_seconds
+
+    def split(self):
+        """
+        Ends the clip at the current frame and starts the next one right after it, without overlap.
+        """
+        if self.recording:
+            self.finish()
+            self.start()
+
+    def elapsed(self):
+        """
+        Returns the seconds since the clip was triggered.
+        """
+        return time.time() - self.started_at if self.recording else 0
+
+    def finish(self):
+        """
+        Ends the clip. The writer thread moves it to the output directory once written.
+        """
+        self.writer.close_clip(self.output_dir, self.camera)
+        self.recording = False
+        self.postroll_until = None
+
+    def close(self):
+        """
+        Finishes the current clip, if any, and empties the pre-roll.
+        """
+        if self.recording:
+            self.finish()
+        if self.ring is not None:
+            self.ring.clear()
+
+    def shutdown(self):
+        """
+        Finishes the current clip and waits for the writer to save it.
+        """
+        self.close()
+        self.writer.stop()
+
+
+class SegmentController:
+    """
+    Decides from the motion of every frame when clips start, stop and split.
+
+    A clip starts after start_frames consecutive frames with motion, lasts while
+    motion persists and stops after stop_seconds without motion, but not before
+    min_seconds. Motion during the post-roll resumes the same clip. Clips longer
+    than max_seconds are split.
+    """
+
+    def __init__(self, start_frames=SEGMENT_START_FRAMES, stop_seconds=SEGMENT_STOP_SECONDS,
+                 min_seconds=SEGMENT_MIN_SECONDS, max_seconds=SEGMENT_MAX_SECONDS, postroll_seconds=POSTROLL_SECONDS):
+        self.start_frames = start_frames
+        self.stop_seconds = stop_seconds
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.postroll_seconds = postroll_seconds
+        self.reset()
+
+    def reset(self):
+        self.active = False
+        self.motion_frames = 0
+        self.segment_start = None
+        self.last_motion = None
+        self.stopped_at = None
+
+    def update(self, motion, timestamp=None):
+        """
+        Feeds the motion detection result of a frame.
+
+        Parameters:
+        motion (bool): Whether the frame has motion.
+        timestamp (float): Capture time, now by default.
+
+        Returns:
+        str: 'start' to start or resume a clip, 'stop' to end it after the post-roll,
+        'split' to end it and start the next one at once, or None.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.motion_frames = self.motion_frames + 1 if motion else 0
+        if motion:
+            self.last_motion = timestamp
+
+        if self.active:
+            duration = timestamp - self.segment_start
+            if duration >= self.max_seconds:
+                self.segment_start = timestamp
+                return 'split'
+            if timestamp - self.last_motion >= self.stop_seconds and duration >= self.min_seconds:
+                self.active = False
+                self.stopped_at = timestamp
+                return 'stop'
+            return None
+
+        # Motion while the post-roll is being recorded extends the same clip
+        if self.stopped_at is not None and timestamp - self.stopped_at < self.postroll_seconds:
+            if motion:
+                self.active = True
+                self.stopped_at = None
+                return 'start'
+            return None
+
+        self.stopped_at = None
+        if self.motion_frames >= self.start_frames:
+            self.active = True
+            self.segment_start = timestamp
+            return 'start'
+        return None
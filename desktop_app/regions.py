@@ -0,0 +1,112 @@
+import time
+import cv2
+import numpy as np
+import requests
+from config import REGIONS_REFRESH_SECONDS
+
+API_URL = "http://127.0.0.1:5001/api"
+
+# Regions of every camera fetched by this process and when they were fetched, by camera id
+camera_regions = {}
+
+
+class RegionMask:
+    """
+    Regions of interest and exclusion zones of a camera, rasterized once per frame size.
+
+    Polygons are lists of [x, y] points relative to the frame size, as stored by the API.
+    Without regions of interest the whole frame is of interest. Exclusions are removed
+    from the regions of interest.
+    """
+
+    def __init__(self, roi=None, exclusions=None):
+        self.roi = roi or []
+        self.exclusions = exclusions or []
+        # Rasterized masks and their bounding boxes, by (width, height)
+        self.masks = {}
+
+    def __bool__(self):
+        return bool(self.roi or self.exclusions)
+
+    def rasterize(self, width, height):
+        """
+        Draws the regions into a mask of the given size.
+
+        Returns:
+        tuple: The mask, 255 where motion and detections count, and the x1, y1, x2, y2
+        bounding box of its nonzero pixels, empty when nothing is left.
+        """
+        mask = np.full((height, width), 0 if self.roi else 255, dtype=np.uint8)
+        scale = np.array([width, height], dtype=np.float64)
+        for polygons, value in ((self.roi, 255), (self.exclusions, 0)):
+            if polygons:
+                points = [np.round(np.array(polygon) * scale).astype(np.int32) for polygon in polygons]
+                cv2.fillPoly(mask, points, value)
+        x, y, w, h = cv2.boundingRect(mask)
+        return mask, (x, y, x + w, y + h)
+
+    def mask(self, width, height):
+        """
+        Returns the cached mask of the given frame size, see rasterize.
+        """
+        if (width, height) not in self.masks:
+            self.masks[(width, height)] = self.rasterize(width, height)
+        return self.masks[(width, height)][0]
+
+    def bounds(self, width, height):
+        """
+        Returns the cached x1, y1, x2, y2 bounding box of the mask of the given frame size.
+        Only this part of the frame needs to be processed.
+        """
+        if (width, height) not in self.masks:
+            self.masks[(width, height)] = self.rasterize(width, height)
+        return self.masks[(width, height)][1]
+
+    def contains(self, points, width, height):
+        """
+        Tells which points of a frame of the given size lie in the regions.
+
+        Parameters:
+        points (numpy.ndarray): Array of shape (n, 2) of x, y pixel coordinates.
+        width (int): Frame width.
+        height (int): Frame height.
+
+        Returns:
+        numpy.ndarray: One boolean per point.
+        """
+        mask = self.mask(width, height)
+        x = np.clip(points[:, 0].astype(int), 0, width - 1)
+        y = np.clip(points[:, 1].astype(int), 0, height - 1)
+        return mask[y, x] > 0
+
+
+def load_camera_regions(camera_id, max_age=REGIONS_REFRESH_SECONDS):
+    """
+    Fetches the regions of a camera from the API, again once they are older than max_age seconds.
+
+    Parameters:
+    camera_id (str): ID of the camera, '' for clips and recorders without one.
+    max_age (float): Seconds the fetched regions are used for.
+
+    Returns:
+    RegionMask: The regions of the camera, or None when it has none or they could not be fetched.
+    """
+    if not camera_id:
+        return None
+    cached = camera_regions.get(camera_id)
+    if cached is None or time.monotonic() - cached[0] >= max_age:
+        try:
+            response = requests.get(f"{API_URL}/get_camera_regions/{camera_id}", timeout=5)
+        except Exception as e:
+            print(f"An error occurred while fetching the regions of camera {camera_id}: {e}")
+            return cached[1] if cached else None  # The next clip asks again
+        if response.status_code != 200:
+            print(f"Failed to fetch the regions of camera {camera_id}. Status code: {response.status_code}")
+            return cached[1] if cached else None
+        data = response.json()
+        regions = RegionMask(data['roi'], data['exclusions']) or None
+        if cached and cached[1] is not None and regions is not None and \
+                (cached[1].roi, cached[1].exclusions) == (regions.roi, regions.exclusions):
+            regions = cached[1]  # Unchanged, keep its rasterized masks
+        camera_regions[camera_id] = (time.monotonic(), regions)
+    return camera_regions[camera_id][1]
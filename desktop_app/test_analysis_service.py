@@ -0,0 +1,97 @@
+import os
+import time
+from analysis_service import AnalysisService, split_cpus, select_profile, ANALYSIS_PROFILES
+
+
+# Test that the cores are split into disjoint shares covering every core
+def test_split_cpus_evenly():
+    shares = split_cpus(list(range(8)), 3)
+    assert shares == [[0, 1, 2], [3, 4, 5], [6, 7]]
+
+
+# Test that workers share cores when there are more workers than cores
+def test_split_cpus_oversubscribed():
+    assert split_cpus([0, 1], 3) == [[0], [1], [0]]
+
+
+# Test that deeper backlogs select cheaper profiles
+def test_select_profile():
+    assert select_profile(3, [10, 30]) == 0
+    assert select_profile(10, [10, 30]) == 1
+    assert select_profile(100, [10, 30, 50, 70]) == len(ANALYSIS_PROFILES) - 1
+    assert select_profile(100, []) == 0
+
+
+def crashing_worker(job_queue, result_queue, cpus=None, threads=0):
+    # A worker that takes a clip and dies while analyzing it
+    job_id, file_path, profile = job_queue.get()
+    result_queue.put({'event': 'started', 'pid': os.getpid(), 'job_id': job_id, 'file_path': file_path,
+                      'profile': profile})
+    # Make sure the report reached the service before dying
+    result_queue.close()
+    result_queue.join_thread()
+    os._exit(3)
+
+
+# Test that a worker dying mid-clip is replaced and its clip reported as failed
+def test_dead_worker_fails_its_job():
+    service = AnalysisService(workers=1, pin_cpus=False, target=crashing_worker)
+    service.start()
+    first = service.processes[0]
+    service.submit('clip.mp4', 'job1')
+    try:
+        results = []
+        deadline = time.time() + 10
+        while not any(result['event'] == 'done' for result in results) and time.time() < deadline:
+            results += service.poll_results()
+            time.sleep(0.05)
+
+        done = [result for result in results if result['event'] == 'done']
+        assert len(done) == 1 and done[0]['job_id'] == 'job1' and 'exit code 3' in done[0]['error']
+        assert service.status()['in_flight'] == 0 and service.status()['failed'] == 1
+        assert service.processes[0] is not first and service.processes[0].is_alive()  # Verify a new worker started
+    finally:
+        service.stopping = True
+        for process in service.processes:
+            process.kill()
+            process.join()
+
+
+def vanishing_worker(job_queue, result_queue, cpus=None, threads=0):
+    # A worker that dies right after taking a clip that does not exist, before reporting it,
+    # leaving the clip behind for its replacement
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_id, file_path, profile = job
+        if not os.path.exists(file_path):
+            open(file_path, 'w').close()
+            os._exit(3)
+        result_queue.put({'event': 'started', 'pid': os.getpid(), 'job_id': job_id, 'file_path': file_path,
+                          'profile': profile})
+        result_queue.put({'event': 'done', 'pid': os.getpid(), 'job_id': job_id, 'file_path': file_path,
+                          'profile': profile, 'latency': 0.1, 'error': None})
+
+
+# Test that a clip taken by a worker that died before reporting it is handed to the new worker
+def test_dead_worker_requeues_unreported_job(tmp_path):
+    service = AnalysisService(workers=1, pin_cpus=False, target=vanishing_worker)
+    service.start()
+    (tmp_path / 'clip2.mp4').write_bytes(b'')
+    service.submit(str(tmp_path / 'clip1.mp4'), 'job1')  # Does not exist yet, the first worker dies on it
+    service.submit(str(tmp_path / 'clip2.mp4'), 'job2')
+    try:
+        results = []
+        deadline = time.time() + 10
+        while len([result for result in results if result['event'] == 'done']) < 2 and time.time() < deadline:
+            results += service.poll_results()
+            time.sleep(0.05)
+
+        done = [result for result in results if result['event'] == 'done']
+        assert sorted(result['job_id'] for result in done) == ['job1', 'job2']
+        assert all(result['error'] is None for result in done)  # Verify the lost clip was analyzed, not failed
+        status = service.status()
+        assert status['queued'] == 0 and status['in_flight'] == 0 and status['done'] == 2
+    finally:
+        service.stop()
@@ -0,0 +1,84 @@
+import time
+import cv2
+import numpy as np
+import camera_daemon
+from camera_daemon import stream_url, fetch_cameras, RecordingDaemon
+
+
+def make_clip(path, count, fps=20.0):
+    # Write a small clip with a block moving across it
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (160, 120))
+    for i in range(count):
+        frame = np.full((120, 160, 3), 60, dtype=np.uint8)
+        cv2.rectangle(frame, (i * 3 % 140, 40), (i * 3 % 140 + 20, 80), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+# Test turning the stored camera addresses into what OpenCV opens
+def test_stream_url():
+    assert stream_url('192.168.1.20') == 'rtsp://192.168.1.20:554/stream'
+    assert stream_url('192.168.1.20', 'http://{ip}/video') == 'http://192.168.1.20/video'
+    assert stream_url(' rtsp://cam.local/live ') == 'rtsp://cam.local/live'
+    assert stream_url('2') == 2
+
+
+class FakeResponse:
+    # Response of the camera streams endpoint
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+# Test that the camera list is fetched with the service token and a refused token gives no list
+def test_fetch_cameras_sends_token(monkeypatch):
+    requests_made = []
+
+    def fake_get(url, headers, timeout):
+        requests_made.append(headers)
+        if headers['Authorization'] != 'secret':
+            return FakeResponse(401)
+        return FakeResponse(200, {'cameras': [{'id': 1}]})
+
+    monkeypatch.setattr(camera_daemon.requests, 'get', fake_get)
+    assert fetch_cameras('secret') == [{'id': 1}]
+    assert fetch_cameras('') is None
+    assert requests_made == [{'Authorization': 'secret'}, {'Authorization': ''}]
+
+
+# Test that every camera of the list gets its own pipeline and removed cameras are stopped
+def test_daemon_follows_camera_list(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Recordings go to desktop_app/temp and desktop_app/detections
+    paths = []
+    for i in range(2):
+        paths.append(str(tmp_path / f'cam{i}.avi'))
+        make_clip(paths[-1], 40, fps=10.0)
+    cameras = [{'id': i + 1, 'name': f'Camera {i + 1}', 'ip_address': f'file://{path}', 'roi': [], 'exclusions': []}
+               for i, path in enumerate(paths)]
+    daemon = RecordingDaemon(fetch=lambda: cameras)
+
+    daemon.refresh()
+    assert sorted(daemon.pipelines) == ['1', '2']
+    deadline = time.time() + 5
+    while any(pipeline.processed == 0 for pipeline in daemon.pipelines.values()) and time.time() < deadline:
+        time.sleep(0.05)
+    stats = daemon.stats()
+    assert [camera['camera'] for camera in stats] == ['1', '2']
+    assert all(camera['fps'] > 0 and camera['cpu'] > 0 for camera in stats)
+    # Verify clips are written at the rate of the streams, not the default RECORDING_FPS
+    assert all(pipeline.recorder.fps == pipeline.recorder.writer.fps == 10 for pipeline in daemon.pipelines.values())
+
+    removed = daemon.pipelines['2']
+    cameras = cameras[:1]
+    daemon.refresh()
+    assert list(daemon.pipelines) == ['1']
+    assert not removed.running and removed.capture.thread is None  # Verify the removed camera was released
+
+    # An unreachable API keeps the cameras running
+    daemon.fetch = lambda: None
+    daemon.refresh()
+    assert list(daemon.pipelines) == ['1']
+    daemon.stop()
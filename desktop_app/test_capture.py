@@ -0,0 +1,59 @@
+import time
+import cv2
+import numpy as np
+from capture import LatestFrameCapture, ReconnectingCapture
+
+
+def make_clip(path, count):
+    # Write a small clip with numbered frames
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 20.0, (64, 48))
+    for i in range(count):
+        writer.write(np.full((48, 64, 3), i * 4, dtype=np.uint8))
+    writer.release()
+
+
+# Test that a slow reader only gets newer frames and the skipped ones are counted as dropped
+def test_latest_frame_capture(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    make_clip(path, 40)
+    capture = LatestFrameCapture(path)
+    assert capture.start()
+
+    sequences = []
+    sequence = 0
+    while True:
+        item = capture.read(sequence, timeout=0.5)
+        if item is None:
+            break
+        sequence, frame, timestamp = item
+        sequences.append(sequence)
+        time.sleep(0.002)  # A reader slower than the capture
+    capture.stop()
+
+    stats = capture.stats()
+    assert sequences == sorted(set(sequences))  # Verify frames are never returned twice
+    assert stats['captured'] == 40
+    assert stats['dropped'] == stats['captured'] - len(sequences)
+
+
+# Test that a stream that ends or can't be opened is reopened after the backoff
+def test_reconnecting_capture(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    capture = ReconnectingCapture(path, backoff=0.05, max_backoff=0.1, failed_reads_limit=2)
+    capture.start()
+    time.sleep(0.2)
+    assert not capture.connected  # The camera is not there yet
+    make_clip(path, 10)
+
+    sequence = 0
+    deadline = time.time() + 5
+    while capture.stats()['reconnects'] < 2 and time.time() < deadline:
+        item = capture.read(sequence, timeout=0.5)
+        if item is not None:
+            sequence = item[0]
+    capture.stop()
+
+    stats = capture.stats()
+    assert stats['reconnects'] >= 2  # Verify the clip was reopened every time it ended
+    assert stats['captured'] >= 20
+    assert capture.fps == 20  # The rate the clip reports
@@ -0,0 +1,87 @@
+import numpy as np
+from detector import OnnxDetector, letterbox, postprocess
+
+
+def raw_prediction(boxes, classes=3):
+    # Build a YOLOv8 output of shape (4 + classes, anchors) from (cx, cy, w, h, confidence, class id) rows
+    prediction = np.zeros((4 + classes, len(boxes)), dtype=np.float32)
+    for anchor, (cx, cy, w, h, confidence, class_id) in enumerate(boxes):
+        prediction[:4, anchor] = cx, cy, w, h
+        prediction[4 + class_id, anchor] = confidence
+    return prediction
+
+
+class FakeSession:
+    # Returns fixed model outputs and keeps the input batch it was given
+    def __init__(self, predictions):
+        self.predictions = predictions
+        self.inputs = None
+
+    def run(self, outputs, feed):
+        self.inputs = feed
+        return [self.predictions]
+
+
+# Test that a wide frame is scaled to the input width and centered vertically with gray bars
+def test_letterbox_wide_frame():
+    frame = np.full((360, 640, 3), 200, dtype=np.uint8)
+    out = np.empty((320, 320, 3), dtype=np.uint8)
+    gain, pad_x, pad_y = letterbox(frame, out)
+    assert gain == 0.5 and pad_x == 0 and pad_y == 70
+    assert (out[:70] == 114).all() and (out[250:] == 114).all()
+    assert (out[70:250] == 200).all()
+
+
+# Test that a tall frame is padded horizontally
+def test_letterbox_tall_frame():
+    frame = np.zeros((640, 320, 3), dtype=np.uint8)
+    out = np.empty((320, 320, 3), dtype=np.uint8)
+    assert letterbox(frame, out) == (0.5, 80, 0)
+    assert (out[:, :80] == 114).all() and (out[:, 80:240] == 0).all() and (out[:, 240:] == 114).all()
+
+
+# Test that boxes are mapped back to frame coordinates by undoing the scale and the padding
+def test_postprocess_undoes_letterbox():
+    # 640x360 frame letterboxed into 320x320: gain 0.5, 70 pixels of padding above and below
+    prediction = raw_prediction([(160, 160, 40, 20, 0.9, 0)])
+    [[x1, y1, x2, y2, confidence, class_id]] = postprocess(prediction, (0.5, 0, 70), (360, 640, 3))
+    assert np.allclose([x1, y1, x2, y2], [280, 160, 360, 200])
+    assert np.isclose(confidence, 0.9) and class_id == 0
+
+
+# Test that boxes reaching into the padding are clipped to the frame and unconfident ones dropped
+def test_postprocess_clips_to_frame():
+    prediction = raw_prediction([(10, 80, 40, 40, 0.8, 1), (200, 200, 20, 20, 0.1, 1)])
+    boxes = postprocess(prediction, (0.5, 0, 70), (360, 640, 3))
+    assert len(boxes) == 1
+    assert np.allclose(boxes[0, :4], [0, 0, 60, 60])
+    assert boxes[0, 5] == 1
+
+
+# Test that overlapping boxes are suppressed within a class but kept across classes
+def test_postprocess_per_class_nms():
+    prediction = raw_prediction([(100, 100, 50, 50, 0.9, 0), (102, 101, 50, 50, 0.8, 0),
+                                 (101, 100, 50, 50, 0.7, 2)])
+    boxes = postprocess(prediction, (1.0, 0, 0), (320, 320, 3))
+    assert sorted(boxes[:, 5].tolist()) == [0, 2]
+    assert np.isclose(boxes[boxes[:, 5] == 0, 4], 0.9).all()  # The most confident box of the class is kept
+
+
+# Test a batch of non-square frames through the detector with a fake model
+def test_onnx_detector_batch():
+    detector = OnnxDetector.__new__(OnnxDetector)
+    detector.input_name = 'images'
+    detector.imgsz = 320
+    detector.letterboxed = None
+    detector.blob = None
+    # The same model box for both frames, in the letterboxed input
+    prediction = raw_prediction([(160, 160, 32, 64, 0.9, 0)])
+    detector.session = FakeSession(np.stack([prediction, prediction]))
+
+    wide = np.zeros((360, 640, 3), dtype=np.uint8)
+    tall = np.zeros((480, 240, 3), dtype=np.uint8)
+    wide_boxes, tall_boxes = detector([wide, tall])
+    assert detector.session.inputs['images'].shape == (2, 3, 320, 320)
+    # Wide: gain 0.5, pad_y 70. Tall: gain 2/3, pad_x 80.
+    assert np.allclose(wide_boxes[0, :4], [288, 116, 352, 244])
+    assert np.allclose(tall_boxes[0, :4], [96, 192, 144, 288])
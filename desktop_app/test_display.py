@@ -0,0 +1,84 @@
+import numpy as np
+from display import DisplayBuffers, fit_size, grid_shape
+
+
+def make_frame(value):
+    # Build a uniform 720p frame
+    return np.full((720, 1280, 3), value, dtype=np.uint8)
+
+
+# Test that frames keep their aspect ratio in the display area
+def test_fit_size():
+    assert fit_size(1280, 720, 800, 600) == (800, 450)
+    assert fit_size(640, 480, 800, 600) == (800, 600)
+    assert fit_size(480, 640, 800, 600) == (450, 600)
+
+
+# Test that camera tiles are laid out in a grid as square as possible
+def test_grid_shape():
+    assert grid_shape(1) == (1, 1)
+    assert grid_shape(2) == (2, 1)
+    assert grid_shape(4) == (2, 2)
+    assert grid_shape(5) == (3, 2)
+    assert grid_shape(9) == (3, 3)
+
+
+# Test that frames are resized into reused buffers and the GUI gets the latest one
+def test_buffers_are_reused():
+    display = DisplayBuffers(max_fps=0)
+    seen = set()
+    for value in range(10):
+        display.publish(make_frame(value), float(value))
+        if value % 3 == 0:
+            image, timestamp = display.take()
+            assert image.shape == (450, 800, 3)
+            assert image[0, 0, 0] == value and timestamp == value
+            seen.add(image.__array_interface__['data'][0])
+    assert len(seen) <= 3  # Nothing is allocated per frame
+    assert display.take() is None  # The last frame was already taken
+    assert display.stats()['published'] == 10
+
+
+# Test that the frame being shown is never overwritten
+def test_shown_buffer_is_kept():
+    display = DisplayBuffers(max_fps=0)
+    display.publish(make_frame(1), 0.0)
+    shown, _ = display.take()
+    for value in range(2, 8):
+        display.publish(make_frame(value), float(value))
+    assert shown[0, 0, 0] == 1
+    assert display.stats()['dropped'] == 5
+
+
+# Test that a shared frame overwritten while it was resized is dropped
+def test_overwritten_frame_is_dropped():
+    display = DisplayBuffers(max_fps=0)
+    display.publish(make_frame(1), 0.0)
+    display.publish(make_frame(2), 1.0, valid=lambda: False)
+    image, timestamp = display.take()
+    assert image[0, 0, 0] == 1 and timestamp == 0.0
+    assert display.stats() == {'published': 1, 'skipped': 0, 'dropped': 1}
+
+
+# Test that the frame rate cap skips frames before they are resized
+def test_frame_rate_cap():
+    display = DisplayBuffers(max_fps=10)
+    published = [display.publish(make_frame(0), i / 30) for i in range(30)]
+    assert sum(published) == 10
+    assert display.stats()['skipped'] == 20
+
+    # Jittered timestamps keep the average rate at the cap
+    display = DisplayBuffers(max_fps=15)
+    jitter = np.random.default_rng(0).uniform(-0.004, 0.004, 300)
+    published = [display.publish(make_frame(0), i / 30 + jitter[i]) for i in range(300)]
+    assert 140 <= sum(published) <= 151
+
+
+# Test RGB output for Qt versions without BGR images
+def test_rgb_buffers():
+    display = DisplayBuffers(max_fps=0, rgb=True)
+    frame = make_frame(0)
+    frame[:, :, 0] = 255  # Blue
+    display.publish(frame, 0.0)
+    image, _ = display.take()
+    assert image[0, 0].tolist() == [0, 0, 255]
@@ -0,0 +1,111 @@
+import os
+import multiprocessing
+import numpy as np
+import pytest
+from frame_bus import FramePublisher, FrameBusReader
+
+
+@pytest.fixture
+def publisher(request):
+    # Create a small bus with a name unique to the test
+    publisher = FramePublisher((48, 64, 3), f'sentinel_test_{os.getpid()}_{request.node.name}'[:30], slots=4)
+    yield publisher
+    if publisher.bus.header is not None:
+        publisher.close()
+
+
+def make_frame(value):
+    # Build a small uniform frame
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def read_in_child(name, result_queue):
+    # Attach from another process, read the latest frame and exit
+    reader = FrameBusReader(name)
+    reader.start()
+    sequence, frame, timestamp = reader.read()
+    result_queue.put((sequence, int(frame[0, 0, 0]), timestamp))
+    reader.stop()
+
+
+# Test that a live reader gets the newest frame as a read-only view of the shared slot
+def test_latest_reader(publisher):
+    reader = FrameBusReader(publisher.bus.block.name)
+    assert reader.start()
+    for value in range(1, 4):
+        publisher.publish(make_frame(value), 100.0 + value)
+
+    sequence, frame, timestamp = reader.read()
+    assert (sequence, frame[0, 0, 0], timestamp) == (3, 3, 103.0)
+    assert not frame.flags.writeable
+    assert reader.read(sequence, timeout=0.01) is None  # Nothing newer yet
+
+    for value in range(4, 8):
+        publisher.publish(make_frame(value), 100.0 + value)
+    assert not reader.valid(sequence)  # The slot was reused
+    sequence, frame, _ = reader.read(sequence)
+    assert (sequence, frame[0, 0, 0]) == (7, 7)
+    assert reader.stats()['dropped'] == 3
+    reader.stop()
+
+
+# Test that an in-order reader gets every frame until it falls a ring behind
+def test_in_order_reader(publisher):
+    reader = FrameBusReader(publisher.bus.block.name, latest=False)
+    assert reader.start()
+    publisher.publish(make_frame(1), 1.0)
+    sequence, _, _ = reader.read()
+    publisher.publish(make_frame(2), 2.0)
+    publisher.publish(make_frame(3), 3.0)
+    sequence, frame, _ = reader.read(sequence)
+    assert (sequence, frame[0, 0, 0]) == (2, 2)
+
+    for value in range(4, 10):
+        publisher.publish(make_frame(value), float(value))
+    sequence, frame, _ = reader.read(sequence)
+    assert (sequence, frame[0, 0, 0]) == (9, 9)  # Lapped, skipped to the newest
+    assert reader.stats()['dropped'] == 6
+    reader.stop()
+
+
+# Test that readers see the bus close, and can't attach to a bus that does not exist
+def test_closed_bus(publisher):
+    name = publisher.bus.block.name
+    reader = FrameBusReader(name)
+    assert reader.start()
+    publisher.close()
+    assert reader.read(timeout=0.01) is None
+    assert reader.closed()
+    reader.stop()
+    assert not FrameBusReader(name).start()
+
+
+# Test that readers see the bus closed when the capture process died without closing it
+def test_dead_publisher(publisher):
+    name = publisher.bus.block.name
+    reader = FrameBusReader(name)
+    assert reader.start()
+    assert not reader.closed()
+    process = multiprocessing.Process(target=os._exit, args=(0,))
+    process.start()
+    process.join()
+    publisher.bus.header['pid'] = process.pid  # As if the publisher had been that process
+    assert reader.read(timeout=0.01) is None
+    assert reader.closed()
+    reader.stop()
+    assert not FrameBusReader(name).start()
+
+
+# Test that a reader in another process sees the frames and leaves the bus in place when it exits
+def test_reader_in_another_process(publisher):
+    name = publisher.bus.block.name
+    publisher.publish(make_frame(42), 5.0)
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=read_in_child, args=(name, result_queue))
+    process.start()
+    assert result_queue.get(timeout=10) == (1, 42, 5.0)
+    process.join()
+
+    reader = FrameBusReader(name)
+    assert reader.start()
+    reader.stop()
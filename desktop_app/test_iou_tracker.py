@@ -0,0 +1,74 @@
+import numpy as np
+from iou_tracker import IouTracker, pairwise_iou
+
+
+def detection(left, top, width=20, height=40, confidence=0.9, class_id=0):
+    # A detection in the format process_video passes to the tracker
+    return [left, top, width, height], confidence, class_id
+
+
+# Test the IoU of every pair of boxes
+def test_pairwise_iou():
+    a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [100, 100, 110, 110]], dtype=float)
+    iou = pairwise_iou(a, b)
+    assert iou.shape == (2, 3)
+    assert np.allclose(iou[0], [1, 50 / 150, 0])
+    assert np.allclose(iou[1], 0)
+
+
+# Test that a moving object keeps its track ID from frame to frame
+def test_ids_persist_across_frames():
+    tracker = IouTracker(n_init=1)
+    ids = []
+    for frame in range(10):
+        tracks = tracker.update_tracks([detection(10 + 2 * frame, 50), detection(200, 50 + 2 * frame)])
+        ids.append(sorted(track.track_id for track in tracks))
+    assert all(frame_ids == ['1', '2'] for frame_ids in ids)
+
+
+# Test that tracks are confirmed after n_init hits and tentative tracks die on their first miss
+def test_tracks_confirmed_after_n_init_hits():
+    tracker = IouTracker(n_init=3)
+    for frame in range(2):
+        tracks = tracker.update_tracks([detection(10 + frame, 50)])
+        assert not tracks[0].is_confirmed()
+    tracks = tracker.update_tracks([detection(12, 50)])
+    assert tracks[0].is_confirmed()
+    assert tracks[0].det_conf == 0.9 and tracks[0].det_class == 0
+
+    tracker.update_tracks([detection(300, 50)])  # A new, tentative object
+    tracks = tracker.update_tracks([])
+    assert [track.track_id for track in tracks] == ['1']  # The tentative track is gone, the confirmed one coasts
+
+
+# Test that confirmed tracks are deleted after max_age frames without a match
+def test_tracks_deleted_after_max_age():
+    tracker = IouTracker(max_age=5, n_init=1)
+    tracker.update_tracks([detection(10, 50)])
+    for _ in range(5):
+        assert len(tracker.update_tracks([])) == 1
+    assert tracker.update_tracks([]) == []
+    # A new object after the deletion gets a new ID
+    assert tracker.update_tracks([detection(10, 50)])[0].track_id == '2'
+
+
+# Test that prediction moves tracks along their velocity without matching or deleting them
+def test_predict_coasts_tracks():
+    tracker = IouTracker(max_age=30, n_init=1)
+    for frame in range(5):
+        tracker.update_tracks([detection(10 + 4 * frame, 50)])
+    left = tracker.tracks[0].to_ltrb()[0]
+
+    for _ in range(3):
+        tracks = tracker.predict()
+    assert len(tracks) == 1
+    assert tracks[0].time_since_update == 3 and tracks[0].det_conf is None
+    assert tracks[0].to_ltrb()[0] > left + 6  # Still moving right at about 4 pixels per frame
+
+    # The track is picked up again where the prediction expects it
+    tracks = tracker.update_tracks([detection(10 + 4 * 8, 50)])
+    assert [track.track_id for track in tracks] == ['1'] and tracks[0].time_since_update == 0
+
+    tracker.delete_all_tracks()
+    assert tracker.predict() == [] and tracker.next_id == 1
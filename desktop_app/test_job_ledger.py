@@ -0,0 +1,116 @@
+import os
+import job_ledger
+from job_ledger import JobLedger, camera_of, DONE, FAILED, QUEUED
+
+
+def make_clip(tmp_path, name, content):
+    # Write a fake clip and return its path
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+# Test that a clip is queued once, even under another name
+def test_duplicate_clips_are_skipped(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    first = make_clip(tmp_path, 'a.mp4', b'clip')
+    copy = make_clip(tmp_path, 'b.mp4', b'clip')
+
+    assert ledger.add(first)
+    assert not ledger.add(first)  # Verify duplicate events are ignored
+    assert not ledger.add(copy)  # Verify the same content is ignored
+    assert ledger.counts()[QUEUED] == 1
+
+
+# Test that a restart skips the clips already in the ledger without reading them again
+def test_known_clips_are_not_hashed(tmp_path, monkeypatch):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    path = make_clip(tmp_path, 'a.mp4', b'clip')
+    assert ledger.add(path)
+
+    hashed = []
+    monkeypatch.setattr(job_ledger, 'file_digest', lambda file_path: hashed.append(file_path) or 'digest')
+    assert not ledger.add(path)
+    assert hashed == []  # Same path, size and modification time
+
+    with open(path, 'ab') as file:
+        file.write(b' changed')
+    assert ledger.add(path)
+    assert hashed == [path]  # Verify a changed clip is hashed and queued
+
+
+# Test that finished jobs are never claimed again
+def test_claim_and_complete(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    path = make_clip(tmp_path, 'a.mp4', b'clip')
+    ledger.add(path)
+
+    [(digest, file_path)] = ledger.claim(4)
+    assert file_path == path
+    assert ledger.claim(4) == []  # Verify a running job is not handed out twice
+    ledger.complete(digest)
+    assert not ledger.add(path)
+    assert ledger.counts()[DONE] == 1
+
+
+# Test that failed jobs wait for their backoff and give up after the last attempt
+def test_retry_with_backoff(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'), max_attempts=2, retry_backoff=0)
+    ledger.add(make_clip(tmp_path, 'a.mp4', b'clip'))
+
+    [(digest, _)] = ledger.claim(1)
+    assert ledger.fail(digest, 'error') == QUEUED
+    [(digest, _)] = ledger.claim(1)
+    assert ledger.fail(digest, 'error') == FAILED
+    assert ledger.claim(1) == []
+
+    ledger.retry_backoff = 60
+    ledger.add(make_clip(tmp_path, 'b.mp4', b'other clip'))
+    [(digest, _)] = ledger.claim(1)
+    ledger.fail(digest, 'error')
+    assert ledger.claim(1) == []  # Verify the retry waits for the backoff
+
+
+# Test that jobs interrupted by a restart are queued again
+def test_recover_running_jobs(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    ledger.add(make_clip(tmp_path, 'a.mp4', b'clip'))
+    ledger.claim(1)
+    ledger.close()
+
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    assert ledger.recover() == 1
+    assert len(ledger.claim(1)) == 1
+
+
+# Test the order in which every priority hands out the jobs
+def test_claim_priority(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    names = ['1_cam1.mp4', '2_cam1.mp4', '3_cam1.mp4', '4_cam2.mp4']
+    for i, name in enumerate(names):
+        path = make_clip(tmp_path, name, name.encode())
+        os.utime(path, (1000 + i, 1000 + i))
+        ledger.add(path)
+
+    def claimed_names(priority):
+        jobs = ledger.claim(4, priority)
+        ledger.connection.execute("UPDATE jobs SET state = 'queued', claimed = NULL")
+        return [os.path.basename(file_path) for _, file_path in jobs]
+
+    assert claimed_names('fifo') == names
+    assert claimed_names('newest') == names[::-1]
+    # Newest clip of every camera first, then the next ones in turn
+    assert claimed_names('fair') == ['4_cam2.mp4', '3_cam1.mp4', '2_cam1.mp4', '1_cam1.mp4']
+
+
+# Test that fair scheduling starts with the camera served longest ago
+def test_fair_priority_takes_turns(tmp_path):
+    ledger = JobLedger(str(tmp_path / 'jobs.db'))
+    for i, name in enumerate(['1_cam1.mp4', '2_cam1.mp4', '3_cam2.mp4']):
+        path = make_clip(tmp_path, name, name.encode())
+        os.utime(path, (1000 + i, 1000 + i))
+        ledger.add(path)
+
+    first = ledger.claim(1, 'fair')[0][1]
+    second = ledger.claim(1, 'fair')[0][1]
+    assert camera_of(first) != camera_of(second)
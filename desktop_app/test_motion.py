@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+import pytest
+from motion import contour_boxes, detect_motion_boxes, non_max_suppression
+from benchmark_nms import loop_non_max_suppression, random_boxes
+from regions import RegionMask
+
+
+def reference_boxes(contours, min_area):
+    # The per-contour loop the desktop app used to run
+    boxes = []
+    for contour in contours:
+        if cv2.contourArea(contour) > min_area:
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append([x, y, x + w, y + h])
+    return np.array(boxes, dtype=int).reshape(-1, 4)
+
+
+# Test that the vectorized boxes match cv2.contourArea and cv2.boundingRect
+def test_contour_boxes_match_opencv():
+    rng = np.random.default_rng(1)
+    mask = np.zeros((240, 320), dtype=np.uint8)
+    for _ in range(40):
+        center = tuple(int(v) for v in rng.integers(0, [320, 240]))
+        axes = tuple(int(v) for v in rng.integers(1, 30, 2))
+        cv2.ellipse(mask, center, axes, float(rng.integers(0, 180)), 0, 360, 255, -1)
+    mask[5, 5] = 255  # Single pixel contour
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    for min_area in [0, 50, 500]:
+        assert np.array_equal(contour_boxes(contours, min_area), reference_boxes(contours, min_area))
+    assert contour_boxes((), 0).shape == (0, 4)
+
+
+# Test that boxes found at a reduced scale are returned in full resolution coordinates
+def test_boxes_are_scaled_back():
+    mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True)
+    background = np.full((480, 640, 3), 60, dtype=np.uint8)
+    for _ in range(30):
+        detect_motion_boxes(background, mog2, scale=0.5)
+    frame = background.copy()
+    frame[100:200, 300:380] = 230
+
+    detected, fg_mask, boxes = detect_motion_boxes(frame, mog2, scale=0.5)
+    assert detected
+    assert fg_mask.shape == (240, 320)
+    assert len(boxes) == 1
+    assert np.abs(boxes[0] - [300, 100, 380, 200]).max() <= 2
+
+
+# Test that movement inside an exclusion zone is ignored
+def test_excluded_movement_is_ignored():
+    regions = RegionMask(exclusions=[[[0.4, 0.1], [0.7, 0.1], [0.7, 0.5], [0.4, 0.5]]])
+    mog2 = cv2.createBackgroundSubtractorMOG2(500, 16, True)
+    background = np.full((480, 640, 3), 60, dtype=np.uint8)
+    for _ in range(30):
+        detect_motion_boxes(background, mog2, scale=0.5, regions=regions)
+    frame = background.copy()
+    frame[100:200, 300:380] = 230  # Inside the exclusion zone
+    frame[300:400, 40:120] = 230  # Outside
+
+    detected, _, boxes = detect_motion_boxes(frame, mog2, scale=0.5, regions=regions)
+    assert detected
+    assert len(boxes) == 1
+    assert np.abs(boxes[0] - [40, 300, 120, 400]).max() <= 2
+
+
+# Test that the vectorized non-max suppression keeps the same boxes, in the same order, as the loop
+@pytest.mark.parametrize('seed', range(20))
+def test_nms_matches_loop(seed):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(1, 600))  # Both sides of NMS_MATRIX_BOXES
+    boxes = random_boxes(count, width=400, height=300, max_size=120, seed=seed)
+    boxes[rng.integers(0, count, count // 4)] = boxes[0]  # Duplicates and ties on y2
+    overlap = float(rng.choice([0.0, 0.3, 0.5, 0.9]))
+    if seed % 2:
+        boxes = boxes.astype(np.float32) + rng.random((count, 4), dtype=np.float32)
+
+    pick = non_max_suppression(boxes, overlap)
+    assert [int(i) for i in pick] == [int(i) for i in loop_non_max_suppression(boxes, overlap)]
+
+
+# Test that boxes of different classes don't suppress each other
+def test_class_aware_nms():
+    boxes = random_boxes(200, width=400, height=300, max_size=120, seed=3)
+    classes = np.random.default_rng(3).integers(0, 3, len(boxes))
+
+    pick = non_max_suppression(boxes, 0.3, classes)
+    expected = set()
+    for cls in range(3):
+        indices = np.flatnonzero(classes == cls)
+        expected.update(indices[loop_non_max_suppression(boxes[indices], 0.3)].tolist())
+    assert sorted(int(i) for i in pick) == sorted(expected)
+    assert non_max_suppression(np.zeros((0, 4), dtype=int), 0.3) == []
@@ -0,0 +1,41 @@
+import json
+import pipeline_metrics
+from pipeline_metrics import PipelineMetrics
+
+
+# Test that every stage accumulates its time and number of calls
+def test_stages_accumulate():
+    metrics = PipelineMetrics('clip.mp4')
+    for _ in range(3):
+        with metrics.stage('decode'):
+            sum(range(1000))
+    metrics.count('frames_decoded', 8)
+    metrics.count('frames_decoded', 2)
+
+    record = metrics.to_record()
+    assert record['file_path'] == 'clip.mp4'
+    assert record['stages']['decode']['calls'] == 3
+    assert record['stages']['decode']['wall'] >= 0
+    assert record['counters'] == {'frames_decoded': 10}
+
+
+# Test that the record written to disk is the one returned
+def test_write_record(tmp_path):
+    metrics = PipelineMetrics('clip.mp4')
+    with metrics.stage('inference'):
+        pass
+
+    path = tmp_path / 'clip_metrics.json'
+    record = metrics.write(str(path))
+    with open(path) as file:
+        assert json.load(file) == record
+
+
+# Test that the CPU time falls back to this process's when the resource module is missing, as on Windows
+def test_cpu_time_without_resource(monkeypatch):
+    monkeypatch.setattr(pipeline_metrics, 'resource', None)
+    assert pipeline_metrics.cpu_time() > 0
+    metrics = PipelineMetrics('clip.mp4')
+    with metrics.stage('decode'):
+        sum(range(10000))
+    assert metrics.stages['decode']['cpu'] >= 0
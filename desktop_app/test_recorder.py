@@ -0,0 +1,272 @@
+import time
+import threading
+import cv2
+import numpy as np
+import pytest
+import recorder
+from recorder import ClipRecorder, ClipWriter, FrameRing, SegmentController, clip_path
+from job_ledger import camera_of
+
+
+def make_frame(value):
+    # Build a small uniform frame
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def count_frames(path):
+    # Decode a clip and count its frames
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    return count
+
+
+# Test that a full ring overwrites its oldest frames
+def test_ring_keeps_latest_frames():
+    ring = FrameRing(3, (48, 64, 3))
+    for value in range(5):
+        ring.push(make_frame(value), value)
+    assert len(ring) == 3
+    assert [ring.pop()[1] for _ in range(3)] == [2, 3, 4]
+
+
+# Test that the ring capacity is capped by the memory budget
+def test_ring_capacity_budget():
+    frame_bytes = 1920 * 1080 * 3
+    assert FrameRing.capacity_for(2, 20, frame_bytes, 2 ** 30) == 40
+    assert FrameRing.capacity_for(2, 20, frame_bytes, 10 * frame_bytes) == 10
+
+
+# Test that triggers swap the ring's two storages instead of allocating new ones
+def test_ring_storages_are_reused():
+    ring = FrameRing(3, (48, 64, 3))
+    storages = {id(ring.frames), id(ring.spare)}
+    for clip in range(4):
+        for value in range(5):
+            ring.push(make_frame(value), value)
+        frames, indices, timestamps = ring.detach()
+        assert id(frames) in storages and timestamps.tolist() == [2, 3, 4]
+        ring.release(frames)  # Written
+    assert {id(ring.frames), id(ring.spare)} == storages
+
+    # While both storages wait to be written the frames are skipped, not buffered in new memory
+    ring.push(make_frame(0), 0)
+    first = ring.detach()[0]
+    ring.push(make_frame(1), 1)
+    second = ring.detach()[0]
+    ring.push(make_frame(2), 2)
+    assert ring.frames is None and len(ring) == 0 and ring.skipped == 1
+    ring.release(first)
+    ring.push(make_frame(3), 3)
+    assert ring.frames is first and len(ring) == 1
+    ring.release(second)
+
+
+# Test that a clip contains the pre-roll, the triggered frames and the post-roll
+def test_clip_includes_preroll_and_postroll(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, 'TEMP_DIR', str(tmp_path / 'temp'))
+    clip_recorder = ClipRecorder(cv2.VideoWriter_fourcc(*'mp4v'), fps=10, preroll_seconds=0.5,
+                                 postroll_seconds=3, output_dir=str(tmp_path / 'detections'))
+    preroll = FrameRing.capacity_for(0.5, 10, make_frame(0).nbytes, clip_recorder.budget_bytes // 2)
+
+    timestamp = 1000.0
+    for value in range(20):
+        clip_recorder.push(make_frame(value), timestamp + value)
+    clip_recorder.start()
+    for value in range(20, 25):
+        clip_recorder.push(make_frame(value), timestamp + value)
+    clip_recorder.stop(timestamp + 24)
+
+    for value in range(25, 35):
+        clip_recorder.push(make_frame(value), timestamp + value)
+    assert not clip_recorder.recording
+    clip_recorder.shutdown()
+
+    [path] = clip_recorder.writer.finished
+    assert count_frames(path) == preroll + 5 + 3  # Verify pre-roll, triggered frames and post-roll
+    assert list((tmp_path / 'temp').iterdir()) == []  # Verify the clip was moved out of the temp folder
+
+
+# Test that the camera's frame rate sizes the pre-roll and is the rate of the next clips
+def test_recorder_follows_camera_fps(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, 'TEMP_DIR', str(tmp_path / 'temp'))
+    clip_recorder = ClipRecorder(cv2.VideoWriter_fourcc(*'mp4v'), fps=20, preroll_seconds=1,
+                                 output_dir=str(tmp_path / 'detections'))
+    clip_recorder.push(make_frame(0), 1000.0)
+    assert clip_recorder.ring.capacity == 20
+
+    clip_recorder.set_fps(10)
+    clip_recorder.push(make_frame(1), 1000.1)
+    assert clip_recorder.ring.capacity == 10  # One second of the camera's frames
+    clip_recorder.start()
+    clip_recorder.push(make_frame(2), 1000.2)
+    clip_recorder.shutdown()
+
+    [path] = clip_recorder.writer.finished
+    cap = cv2.VideoCapture(path)
+    assert cap.get(cv2.CAP_PROP_FPS) == 10
+    cap.release()
+
+
+# Test that splitting a clip starts the next one without overlap, both named after the camera
+def test_split_clips(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, 'TEMP_DIR', str(tmp_path / 'temp'))
+    clip_recorder = ClipRecorder(cv2.VideoWriter_fourcc(*'mp4v'), fps=10, preroll_seconds=0,
+                                 output_dir=str(tmp_path / 'detections'), camera='2')
+    clip_recorder.start()
+    for value in range(6):
+        clip_recorder.push(make_frame(value), 1000.0 + value)
+    clip_recorder.split()
+    for value in range(6, 10):
+        clip_recorder.push(make_frame(value), 1000.0 + value)
+    clip_recorder.shutdown()
+
+    clips = list(clip_recorder.writer.finished)
+    assert len(clips) == 2
+    assert sum(count_frames(path) for path in clips) == 10  # Verify no frame is lost or repeated
+    assert [camera_of(path) for path in clips] == ['2', '2']
+
+
+# Test that clips starting in the same second keep the camera at the end of their name
+def test_clip_path_keeps_camera_last(tmp_path):
+    first = clip_path(str(tmp_path), 1000.0, '3')
+    open(first, 'w').close()
+    second = clip_path(str(tmp_path), 1000.0, '3')
+    assert first != second
+    assert camera_of(first) == camera_of(second) == '3'
+
+
+# Test start and stop hysteresis, the minimum duration and the resume during the post-roll
+def test_segment_hysteresis():
+    segments = SegmentController(start_frames=3, stop_seconds=2, min_seconds=5, max_seconds=100,
+                                 postroll_seconds=2)
+    motion = [True, False, True, True, True, True, True, False, False, False, True] + [False] * 10
+    actions = {t: segments.update(moving, float(t)) for t, moving in enumerate(motion)}
+    actions = {t: action for t, action in actions.items() if action}
+    # Starts on the third consecutive motion frame, stops 2 s after the last motion once
+    # 5 s passed, resumes on motion during the post-roll and stops again
+    assert actions == {4: 'start', 9: 'stop', 10: 'start', 12: 'stop'}
+
+
+# Test that long events are split at the maximum duration
+def test_segment_split():
+    segments = SegmentController(start_frames=1, stop_seconds=2, min_seconds=0, max_seconds=10,
+                                 postroll_seconds=2)
+    actions = [segments.update(True, float(t)) for t in range(25)]
+    assert actions.count('split') == 2
+    assert actions[0] == 'start'
+
+
+class SlowWriter:
+    # VideoWriter stand-in for a stalled disk
+    def write(self, frame):
+        time.sleep(0.02)
+
+    def release(self):
+        pass
+
+
+# Test that a stalled disk drops frames by the overflow policy instead of blocking the caller
+@pytest.mark.parametrize('overflow', ['drop_newest', 'drop_oldest'])
+def test_writer_overflow(tmp_path, monkeypatch, overflow):
+    monkeypatch.setattr(recorder, 'start_recording',
+                        lambda frame, fourcc, fps, camera: (SlowWriter(), 0, str(tmp_path / 'clip.mp4')))
+    (tmp_path / 'clip.mp4').write_bytes(b'')
+    writer = ClipWriter(0, max_frames=3, overflow=overflow)
+
+    start = time.perf_counter()
+    for value in range(20):
+        writer.write(make_frame(value), 1000.0 + value)
+    assert time.perf_counter() - start < 0.2  # Verify the caller did not wait for the disk
+    writer.close_clip(str(tmp_path / 'detections'))
+    writer.stop()
+
+    stats = writer.stats()
+    assert stats['dropped'] > 0
+    assert stats['written'] + stats['dropped'] == 20
+    assert stats['max_depth'] <= 3
+    assert len(writer.finished) == 1
+
+
+# Test that a clip that fails to open is discarded and the writer keeps draining the next clips
+def test_writer_survives_failed_clip(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, 'TEMP_DIR', str(tmp_path / 'temp'))
+    real_start_recording = recorder.start_recording
+    calls = []
+
+    def failing_start_recording(frame, fourcc, fps, camera):
+        calls.append(frame)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return real_start_recording(frame, fourcc, fps, camera)
+
+    monkeypatch.setattr(recorder, 'start_recording', failing_start_recording)
+    writer = ClipWriter(cv2.VideoWriter_fourcc(*'mp4v'), max_frames=4, overflow='block')
+    output_dir = str(tmp_path / 'detections')
+    for clip in range(2):
+        for value in range(10):
+            writer.write(make_frame(value), 1000.0 + 100 * clip + value)
+        writer.close_clip(output_dir)
+    assert writer.flush(timeout=5)
+    assert writer.thread.is_alive()
+    writer.stop()
+
+    # Verify only the second clip was saved, and the frames of the first were dropped
+    assert len(calls) == 2
+    assert len(writer.finished) == 1
+    assert count_frames(writer.finished[0]) == 10
+    assert writer.stats()['dropped'] == 10
+    assert writer.stats()['depth'] == 0
+
+
+# Test that callers stop waiting for a writer thread that died
+def test_writer_dead_thread_does_not_block():
+    writer = ClipWriter(0, max_frames=1, overflow='block')
+    writer.stop()
+    start = time.perf_counter()
+    assert not writer.write(make_frame(0), 1000.0)
+    assert not writer.write(make_frame(1), 1001.0)
+    assert writer.flush(timeout=5)
+    assert time.perf_counter() - start < 1
+
+
+class WriterKilled(BaseException):
+    # Not caught per item, ends the writer thread
+    pass
+
+
+# Test that drop_oldest drops the new frame when only the pre-roll is queued, keeping the queue bounded
+def test_drop_oldest_never_exceeds_bound(monkeypatch):
+    release = threading.Event()
+
+    def stalled_start_recording(frame, fourcc, fps, camera):
+        release.wait(5)
+        raise OSError("disk gone")
+
+    monkeypatch.setattr(recorder, 'start_recording', stalled_start_recording)
+    writer = ClipWriter(0, max_frames=3, overflow='drop_oldest')
+    storage = np.stack([make_frame(value) for value in range(3)])
+    writer.write_preroll(storage, [0, 1, 2], np.arange(3.0))
+    assert not writer.write(make_frame(3), 3.0)
+    assert writer.stats()['depth'] == 3
+    release.set()
+    writer.stop()
+
+
+# Test that a caller blocked on a full queue gives up when the writer thread dies, without queueing the frame
+def test_block_gives_up_on_dead_writer(monkeypatch):
+    release = threading.Event()
+
+    def dying_start_recording(frame, fourcc, fps, camera):
+        release.wait(5)
+        raise WriterKilled()
+
+    monkeypatch.setattr(recorder, 'start_recording', dying_start_recording)
+    monkeypatch.setattr(threading, 'excepthook', lambda args: None)  # The thread's death is expected
+    writer = ClipWriter(0, max_frames=1, overflow='block')
+    assert writer.write(make_frame(0), 0.0)
+    threading.Timer(0.1, release.set).start()
+    assert not writer.write(make_frame(1), 1.0)
+    assert not writer.alive and len(writer.queue) == 0
@@ -0,0 +1,61 @@
+import numpy as np
+import regions as regions_module
+from regions import RegionMask, load_camera_regions
+
+
+# Test that exclusions are cut out of the regions of interest and the bounds cover what is left
+def test_mask_and_bounds():
+    regions = RegionMask(roi=[[[0, 0], [0.5, 0], [0.5, 1], [0, 1]]], exclusions=[[[0, 0], [0.5, 0], [0.5, 0.5],
+                                                                                   [0, 0.5]]])
+    mask = regions.mask(200, 100)
+    assert mask.shape == (100, 200)
+    assert mask[75, 50] == 255  # Bottom left quarter is of interest
+    assert mask[25, 50] == 0  # Excluded
+    assert mask[75, 150] == 0  # Outside the regions of interest
+    x1, y1, x2, y2 = regions.bounds(200, 100)
+    assert abs(x1 - 0) <= 1 and abs(y1 - 50) <= 1 and abs(x2 - 100) <= 1 and abs(y2 - 100) <= 1
+    assert regions.mask(200, 100) is mask  # Rasterized once per frame size
+
+    points = np.array([[50, 75], [50, 25], [150, 75]])
+    assert regions.contains(points, 200, 100).tolist() == [True, False, False]
+
+
+# Test that only exclusions keep the rest of the frame, and no polygons means no regions
+def test_exclusions_only():
+    regions = RegionMask(exclusions=[[[0.5, 0], [1, 0], [1, 1], [0.5, 1]]])
+    mask = regions.mask(100, 100)
+    assert mask[50, 10] == 255 and mask[50, 90] == 0
+    assert not RegionMask([], None)
+
+
+class FakeResponse:
+    # Response of the regions endpoint
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+# Test that the regions of a camera are fetched again once they expired, so that edits reach running workers
+def test_load_camera_regions_expires(monkeypatch):
+    stored = {'roi': [[[0, 0], [1, 0], [1, 1]]], 'exclusions': []}
+    requests_made = []
+
+    def fake_get(url, timeout):
+        requests_made.append(url)
+        return FakeResponse(dict(stored))
+
+    monkeypatch.setattr(regions_module.requests, 'get', fake_get)
+    monkeypatch.setattr(regions_module, 'camera_regions', {})
+    first = load_camera_regions('7', max_age=60)
+    assert load_camera_regions('7', max_age=60) is first  # Cached
+    assert len(requests_made) == 1
+
+    assert load_camera_regions('7', max_age=0) is first  # Fetched again but unchanged, masks are kept
+    stored['exclusions'] = [[[0, 0], [0.5, 0], [0.5, 0.5]]]
+    edited = load_camera_regions('7', max_age=0)
+    assert len(requests_made) == 3
+    assert edited is not first and edited.exclusions == stored['exclusions']
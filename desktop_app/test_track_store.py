@@ -0,0 +1,54 @@
+import numpy as np
+import track_store
+
+
+def make_rows(count, track_id=1):
+    # Build track rows with the fields of TRACK_COLUMNS
+    return [(i, i / 20.0, track_id, 0, 0.9, 10 + i, 20, 110 + i, 220) for i in range(count)]
+
+
+# Test that stored tracks are loaded back column by column
+def test_append_and_load_tracks(tmp_path):
+    track_store.append_tracks(str(tmp_path), 7, make_rows(5), 20.0, 640, 480)
+
+    record, columns = track_store.load_tracks(str(tmp_path), 7)
+    assert record['count'] == 5
+    assert record['width'] == 640 and record['height'] == 480
+    assert columns['frame'].tolist() == [0, 1, 2, 3, 4]  # Verify the frame column
+    assert columns['left'].tolist() == [10, 11, 12, 13, 14]  # Verify a box column
+    assert np.allclose(columns['confidence'], 0.9)
+
+
+# Test that every clip gets its own segment and columns stay aligned
+def test_segments_are_indexed_by_footage(tmp_path):
+    track_store.append_tracks(str(tmp_path), 1, make_rows(3, track_id=4), 20.0, 640, 480)
+    track_store.append_tracks(str(tmp_path), 2, make_rows(9, track_id=5), 20.0, 640, 480, annotated=True)
+
+    index = track_store.load_index(str(tmp_path))
+    assert index['footage_id'].tolist() == [1, 2]
+    assert all(offset % track_store.ALIGNMENT == 0 for offset in index['offset'])
+
+    record, columns = track_store.load_tracks(str(tmp_path), 2)
+    assert record['flags'] & track_store.FLAG_ANNOTATED
+    assert set(columns['track_id'].tolist()) == {5}
+    assert len(columns['bottom']) == 9
+
+
+# Test that re-analyzing a footage replaces its tracks and unknown footage returns nothing
+def test_latest_segment_wins(tmp_path):
+    track_store.append_tracks(str(tmp_path), 3, make_rows(4), 20.0, 640, 480)
+    track_store.append_tracks(str(tmp_path), 3, make_rows(2, track_id=8), 20.0, 640, 480)
+
+    _, columns = track_store.load_tracks(str(tmp_path), 3)
+    assert columns['track_id'].tolist() == [8, 8]
+    assert track_store.load_tracks(str(tmp_path), 99) == (None, None)
+    assert [int(record['footage_id']) for record, _ in track_store.iter_tracks(str(tmp_path))] == [3]
+
+
+# Test that a clip without tracks is still indexed
+def test_empty_segment(tmp_path):
+    track_store.append_tracks(str(tmp_path), 1, [], 20.0, 640, 480)
+
+    record, columns = track_store.load_tracks(str(tmp_path), 1)
+    assert record['count'] == 0
+    assert len(columns['frame']) == 0
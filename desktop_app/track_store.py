@@ -0,0 +1,258 @@
+import os
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where the web app reads the store as well
+    fcntl = None
+    import msvcrt
+
+# Binary store for the confirmed tracks of every analyzed clip.
+#
+# tracks.dat holds one segment per clip. A segment stores each column of the
+# clip's track rows contiguously, one column after the other, every column
+# starting on an 8 byte boundary so it can be memory-mapped as a typed array.
+# tracks.idx is an array of INDEX_DTYPE records locating the segment of each
+# footage id. Segments are only ever appended, the last record for a footage
+# id wins.
+
+DATA_FILENAME = 'tracks.dat'
+INDEX_FILENAME = 'tracks.idx'
+
+# Columns of a track row, in the order process_video reports them
+TRACK_COLUMNS = [
+    ('frame', np.dtype('<u4')),
+    ('timestamp', np.dtype('<f4')),
+    ('track_id', np.dtype('<u4')),
+    ('class_id', np.dtype('<u2')),
+    ('confidence', np.dtype('<f4')),
+    ('left', np.dtype('<i2')),
+    ('top', np.dtype('<i2')),
+    ('right', np.dtype('<i2')),
+    ('bottom', np.dtype('<i2'))
+]
+
+INDEX_DTYPE = np.dtype([
+    ('footage_id', '<u4'),
+    ('count', '<u4'),
+    ('offset', '<u8'),
+    ('fps', '<f4'),
+    ('width', '<u2'),
+    ('height', '<u2'),
+    ('flags', '<u4')
+])
+
+# Set in the index flags when the tracks are already drawn into the footage
+FLAG_ANNOTATED = 1
+
+ALIGNMENT = 8
+
+
+def align(offset):
+    """
+    Rounds an offset up to the next column boundary.
+    """
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def column_offsets(count):
+    """
+    Computes where each column starts inside a segment.
+
+    Parameters:
+    count (int): Number of rows in the segment.
+
+    Returns:
+    tuple: Dictionary of column name to offset from the segment start, and the segment size in bytes.
+    """
+    offsets = {}
+    position = 0
+    for name, dtype in TRACK_COLUMNS:
+        offsets[name] = position
+        position = align(position + count * dtype.itemsize)
+    return offsets, position
+
+
+def rows_to_columns(track_rows):
+    """
+    Converts track rows into one array per column.
+
+    Parameters:
+    track_rows (list): Rows with the fields of TRACK_COLUMNS, in order.
+
+    Returns:
+    dict: Column name to numpy array.
+    """
+    if len(track_rows) == 0:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in TRACK_COLUMNS}
+    transposed = list(zip(*track_rows))
+    return {name: np.asarray(values, dtype=dtype) for (name, dtype), values in zip(TRACK_COLUMNS, transposed)}
+
+
+def lock_file(file):
+    """
+    Takes an exclusive lock on an open file, waiting for other processes to release it.
+    """
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_EX)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def unlock_file(file):
+    """
+    Releases the lock taken by lock_file.
+    """
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def append_tracks(folder, footage_id, track_rows, fps, width, height, annotated=False):
+    """
+    Appends the tracks of one clip to the store and indexes them by footage id.
+
+    Parameters:
+    folder (str): Directory holding the store files.
+    footage_id (int): ID of the footage the tracks belong to.
+    track_rows (list): Rows with the fields of TRACK_COLUMNS, in order.
+    fps (float): Frame rate of the footage.
+    width (int): Frame width in pixels.
+    height (int): Frame height in pixels.
+    annotated (bool): Whether the tracks are already drawn into the footage.
+    """
+    os.makedirs(folder, exist_ok=True)
+    columns = rows_to_columns(track_rows)
+    count = len(track_rows)
+    offsets, size = column_offsets(count)
+
+    # Several analysis workers may append at the same time
+    with open(os.path.join(folder, INDEX_FILENAME), 'ab') as index_file:
+        lock_file(index_file)
+        try:
+            with open(os.path.join(folder, DATA_FILENAME), 'ab') as data_file:
+                end = data_file.seek(0, os.SEEK_END)
+                start = align(end)
+                # Padding up to the aligned start, then the columns at their offsets
+                segment = bytearray(start - end + size)
+                for name, _ in TRACK_COLUMNS:
+                    data = columns[name].tobytes()
+                    position = start - end + offsets[name]
+                    segment[position:position + len(data)] = data
+                data_file.write(segment)
+                data_file.flush()
+                os.fsync(data_file.fileno())
+
+            # The record is written after the data so readers never see a partial segment
+            record = np.zeros(1, dtype=INDEX_DTYPE)
+            record[0] = (footage_id, count, start, fps, width, height, FLAG_ANNOTATED if annotated else 0)
+            index_file.write(record.tobytes())
+            index_file.flush()
+        finally:
+            unlock_file(index_file)
+
+
+def load_index(folder):
+    """
+    Loads the index of the store.
+
+    Parameters:
+    folder (str): Directory holding the store files.
+
+    Returns:
+    numpy.ndarray: Array of INDEX_DTYPE records, empty if nothing was stored yet.
+    """
+    path = os.path.join(folder, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return np.empty(0, dtype=INDEX_DTYPE)
+    return np.fromfile(path, dtype=INDEX_DTYPE)
+
+
+def find_segment(index, footage_id):
+    """
+    Looks up the most recent segment of a footage id.
+
+    Parameters:
+    index (numpy.ndarray): Index returned by load_index.
+    footage_id (int): ID of the footage.
+
+    Returns:
+    numpy.void: The index record, or None if the footage has no stored tracks.
+    """
+    matches = np.flatnonzero(index['footage_id'] == footage_id)
+    return index[matches[-1]] if len(matches) else None
+
+
+def open_data(folder):
+    """
+    Memory-maps the whole data file once, segments are views into it.
+
+    Parameters:
+    folder (str): Directory holding the store files.
+
+    Returns:
+    numpy.ndarray: Read-only byte array of the data file.
+    """
+    path = os.path.join(folder, DATA_FILENAME)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def map_segment(data, record):
+    """
+    Views the columns of a segment in place, without reading or parsing them.
+
+    Parameters:
+    data (numpy.ndarray): Data file returned by open_data.
+    record (numpy.void): Index record of the segment.
+
+    Returns:
+    dict: Column name to a read-only numpy array.
+    """
+    count = int(record['count'])
+    offsets, _ = column_offsets(count)
+    columns = {}
+    for name, dtype in TRACK_COLUMNS:
+        start = int(record['offset']) + offsets[name]
+        columns[name] = data[start:start + count * dtype.itemsize].view(dtype)
+    return columns
+
+
+def load_tracks(folder, footage_id):
+    """
+    Loads the tracks of one footage.
+
+    Parameters:
+    folder (str): Directory holding the store files.
+    footage_id (int): ID of the footage.
+
+    Returns:
+    tuple: The index record and the columns, or (None, None) if nothing is stored.
+    """
+    record = find_segment(load_index(folder), footage_id)
+    if record is None:
+        return None, None
+    return record, map_segment(open_data(folder), record)
+
+
+def iter_tracks(folder):
+    """
+    Iterates over the latest segment of every footage in the store, for analytics.
+
+    Parameters:
+    folder (str): Directory holding the store files.
+
+    Yields:
+    tuple: The index record and the columns of each footage.
+    """
+    index = load_index(folder)
+    data = open_data(folder)
+    # Keep only the last record of each footage id
+    _, last = np.unique(index['footage_id'][::-1], return_index=True)
+    for position in sorted(len(index) - 1 - last):
+        yield index[position], map_segment(data, index[position])
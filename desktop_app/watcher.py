@@ -1,65 +1,222 @@
+import os
 import time
-import subprocess
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from multiprocessing import Process, Queue
+from analysis_service import AnalysisService, select_profile
+from job_ledger import JobLedger, list_clips
 
+# A clip is queued once its size stopped changing and it was not modified for this many seconds
+SETTLE_SECONDS = 5
 
-# Custom event handler class for monitoring file creation
+
+class PendingClips:
+    """
+    Clips seen in the monitored directory that may still be being written.
+    """
+
+    def __init__(self, settle_seconds=SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self.lock = threading.Lock()
+        self.sizes = {}
+
+    def add(self, file_path):
+        with self.lock:
+            self.sizes.setdefault(file_path, -1)
+
+    def settled(self):
+        """
+        Returns the clips that finished being written since the last call and forgets them.
+        """
+        now = time.time()
+        settled = []
+        with self.lock:
+            for file_path, last_size in list(self.sizes.items()):
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    del self.sizes[file_path]  # Deleted or moved away before settling
+                    continue
+                if stat.st_size == last_size and now - stat.st_mtime >= self.settle_seconds:
+                    settled.append(file_path)
+                    del self.sizes[file_path]
+                else:
+                    self.sizes[file_path] = stat.st_size
+        return settled
+
+
+# Custom event handler class for monitoring new files
 class FileCreatedHandler(FileSystemEventHandler):
-    def __init__(self, script, queue):
-        # Initialize with the script to run and the queue for inter-process communication
-        self.script_to_run = script
-        self.queue = queue
+    def __init__(self, pending):
+        # Initialize with the clips waiting to finish being written
+        self.pending = pending
 
     def on_created(self, event):
         # Triggered when a file is created in the monitored directory
         if not event.is_directory:  # Ignore directories
             print(f"New file detected: {event.src_path}")
-            self.queue.put(event.src_path)  # Put the file path into the queue
+            self.pending.add(event.src_path)
+
+    def on_moved(self, event):
+        # Triggered when a file is moved or renamed inside the monitored directory
+        if not event.is_directory:
+            print(f"File moved: {event.dest_path}")
+            self.pending.add(event.dest_path)
+
+
+def queue_settled_clips(pending, ledger):
+    """
+    Adds the clips that finished being written to the job ledger.
+
+    Parameters:
+    pending (PendingClips): Clips seen in the monitored directory.
+    ledger (JobLedger): The persistent job ledger.
+    """
+    for file_path in pending.settled():
+        try:
+            if ledger.add(file_path):
+                print(f"Queued {file_path}")
+            else:
+                print(f"Skipped {file_path}, already analyzed or queued")
+        except OSError as e:
+            print(f"Could not read {file_path}: {e}")
+
+
+def queue_clips_until(stop, pending, ledger, interval=1.0):
+    """
+    Queues the settled clips every interval seconds until stop is set.
+
+    Runs on its own thread, so that hashing new clips never delays the dispatch of the queued ones.
+
+    Parameters:
+    stop (threading.Event): Set to stop the thread.
+    pending (PendingClips): Clips seen in the monitored directory.
+    ledger (JobLedger): The persistent job ledger.
+    interval (float): Seconds between two checks.
+    """
+    while not stop.wait(interval):
+        queue_settled_clips(pending, ledger)
 
 
-# Worker function to process files
-def worker(queue, script):
-    while True:
-        file_path = queue.get()  # Retrieve file path from the queue
-        if file_path is None:  # Sentinel value to exit the loop
-            break
-        print(f"Processing file: {file_path}")
-        # Run the specified script with the file path as an argument
-        subprocess.run(['python', script, file_path])
+def dispatch_jobs(service, ledger, profile=0):
+    """
+    Hands due jobs from the ledger to the workers, keeping at most one clip waiting per worker.
+
+    Jobs are picked in the configured priority order and analyzed with a cheaper
+    profile while the backlog is deep, so that fresh events are not delayed for long.
+
+    Parameters:
+    service (AnalysisService): The running analysis service.
+    ledger (JobLedger): The persistent job ledger.
+    profile (int): Profile used for the previous jobs, to report changes.
+
+    Returns:
+    int: The profile used for the jobs handed out.
+    """
+    status = service.status()
+    free = 2 * service.workers - status['queued'] - status['in_flight']
+    jobs = ledger.claim(free)
+    if not jobs:
+        return profile
+
+    counts = ledger.counts()
+    new_profile = select_profile(counts['queued'] + counts['running'])
+    if new_profile != profile:
+        print(f"Backlog of {counts['queued'] + counts['running']} clips, switching to analysis profile {new_profile}")
+    for digest, file_path in jobs:
+        if os.path.exists(file_path):
+            service.submit(file_path, digest, new_profile)
+        else:
+            ledger.fail(digest, 'File not found')
+    return new_profile
+
+
+def report_results(service, ledger):
+    """
+    Records the results reported by the analysis workers in the ledger and prints them.
+
+    Parameters:
+    service (AnalysisService): The running analysis service.
+    ledger (JobLedger): The persistent job ledger.
+    """
+    results = service.poll_results()
+    for result in results:
+        if result['event'] == 'ready':
+            cpus = f"on cores {result['cpus']}" if result['cpus'] else "on any core"
+            print(f"Analysis worker {result['pid']} ready {cpus} with {result['threads'] or 'default'} threads, "
+                  f"models loaded in {result['load_time']:.2f}s")
+        elif result['event'] == 'started':
+            continue
+        elif result['error']:
+            state = ledger.fail(result['job_id'], result['error'])
+            retry = "will be retried" if state == 'queued' else "giving up"
+            print(f"Failed to analyze {result['file_path']} after {result['latency']:.2f}s, {retry}")
+        else:
+            ledger.complete(result['job_id'])
+            degraded = f", profile {result['profile']}" if result['profile'] else ""
+            print(f"Analyzed {result['file_path']} in {result['latency']:.2f}s "
+                  f"(average {service.average_latency():.2f}s{degraded})")
+
+    if results:
+        status = service.status()
+        counts = ledger.counts()
+        print(f"Queue: {counts['queued']} waiting, {status['queued']} queued, {status['in_flight']} in flight, "
+              f"{status['done']} done ({status['failed']} failed), {status['throughput']:.2f} clips/min, "
+              f"ledger {counts['done']} done, {counts['failed']} failed")
 
 
 # Main execution block
 if __name__ == "__main__":
     directory_to_watch = "desktop_app/detections"  # Directory to monitor
-    script_to_run = "desktop_app/movement_analysis.py"  # Script to run on new files
+    if not os.path.exists(directory_to_watch):
+        os.makedirs(directory_to_watch)
+
+    # Jobs interrupted by a crash or a reboot are queued again
+    ledger = JobLedger()
+    recovered = ledger.recover()
+    if recovered:
+        print(f"Recovered {recovered} interrupted jobs")
+
+    # Start the warm analysis workers, each loads the models once
+    service = AnalysisService()
+    service.start()
 
-    queue = Queue()  # Create a queue for communication between processes
-    event_handler = FileCreatedHandler(script_to_run, queue)  # Create the event handler
+    # Clips dropped while the watcher was down are only found by scanning the directory
+    pending = PendingClips()
+    for file_path in list_clips(directory_to_watch):
+        pending.add(file_path)
+
+    event_handler = FileCreatedHandler(pending)  # Create the event handler
     observer = Observer()  # Create an Observer to monitor the directory
     observer.schedule(event_handler, directory_to_watch, recursive=False)  # Schedule the event handler
 
-    # Create and start a worker process for processing files
-    process = Process(target=worker, args=(queue, script_to_run))
-    process.start()
-
     # Start the Observer to begin monitoring the directory
     observer.start()
     print(f"Monitoring directory: {directory_to_watch}")
 
+    # Clips are hashed and queued in the ledger off the dispatch loop
+    stop_queueing = threading.Event()
+    queueing = threading.Thread(target=queue_clips_until, args=(stop_queueing, pending, ledger), daemon=True)
+    queueing.start()
+
     try:
         # Keep the main process alive to allow continuous monitoring
+        profile = 0
         while True:
             time.sleep(1)
+            report_results(service, ledger)
+            profile = dispatch_jobs(service, ledger, profile)
     except KeyboardInterrupt:
         # Handle keyboard interrupt to stop monitoring gracefully
         observer.stop()
         print("Stopping monitoring...")
+    stop_queueing.set()
+    queueing.join()
 
-    # Send sentinel value to the worker process to terminate it
-    queue.put(None)
-    process.join()  # Wait for the worker process to finish
+    # Let the workers finish the submitted clips and exit, the others stay queued in the ledger
+    service.stop()
+    report_results(service, ledger)
+    ledger.close()
 
     # Wait for the Observer to finish any pending operations
     observer.join()
@@ -3,7 +3,9 @@ import sys
 
 if __name__ == "__main__":
     # List of script paths to be executed concurrently
-    scripts = ['api/app.py', 'desktop_app/main.py', 'web_app/app.py', 'desktop_app/watcher.py']
+    # The capture service publishes the camera on the frame bus for the desktop app and the web live feed
+    scripts = ['api/app.py', 'desktop_app/frame_bus.py', 'desktop_app/main.py', 'web_app/app.py',
+               'desktop_app/watcher.py']
 
     processes = []  # Initialize an empty list to keep track of process objects
 
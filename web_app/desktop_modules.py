@@ -0,0 +1,17 @@
+import os
+import sys
+
+# The track store, the frame bus, the camera capture and the deployment settings are
+# shared with desktop_app, whose modules import each other by name. This is the only
+# place the web app puts desktop_app on the import path, everything else imports from here.
+DESKTOP_APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'desktop_app'))
+if DESKTOP_APP_DIR not in sys.path:
+    sys.path.append(DESKTOP_APP_DIR)
+
+import track_store  # noqa: E402
+from frame_bus import FrameBusReader  # noqa: E402
+from capture import LatestFrameCapture  # noqa: E402
+from display import FrameRateCap  # noqa: E402
+from config import CAMERA_SOURCE  # noqa: E402
+
+__all__ = ['track_store', 'FrameBusReader', 'LatestFrameCapture', 'FrameRateCap', 'CAMERA_SOURCE']
@@ -0,0 +1,360 @@
+import time
+import threading
+from collections import deque, namedtuple
+import cv2
+import numpy as np
+
+# The frame bus and the camera capture live in desktop_app
+from desktop_modules import FrameBusReader, LatestFrameCapture, FrameRateCap, CAMERA_SOURCE
+
+# Seconds the camera stays open after the last viewer left, so that reloading the page does not reopen it
+RELEASE_SECONDS = 2.0
+
+# Seconds before a stopped source is opened again for its viewers, doubled after every failed
+# attempt up to REOPEN_MAX_SECONDS
+REOPEN_SECONDS = 1.0
+REOPEN_MAX_SECONDS = 8.0
+
+# Quality of a live stream: image width in pixels (0 for the camera's), JPEG quality and
+# frames per second at most (0 for every camera frame). Viewers on the same tier share its frames.
+Tier = namedtuple('Tier', ['width', 'quality', 'fps'])
+
+# The camera's frames as they are, what the live feed sends by default
+FULL_TIER = Tier(0, 95, 0)
+
+# Tiers a viewer can ask for by name, from the cheapest. Automatic viewers move along this ladder.
+TIER_PRESETS = {
+    'low': Tier(320, 50, 5),
+    'medium': Tier(640, 70, 15),
+    'high': Tier(1280, 80, 30),
+    'full': FULL_TIER,
+}
+AUTO_LADDER = ['low', 'medium', 'high', 'full']
+AUTO_START = 'medium'
+
+# Requested values are snapped to these steps, so that few distinct tiers are encoded
+TIER_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+QUALITY_STEP = 5
+MAX_TIER_FPS = 30
+
+# Automatic viewers are reviewed every AUTO_WINDOW seconds. They step down when they received less
+# than AUTO_DOWN of their tier's frames, and up after AUTO_UP_WINDOWS windows with at least AUTO_UP.
+AUTO_WINDOW = 5.0
+AUTO_DOWN = 0.6
+AUTO_UP = 0.95
+AUTO_UP_WINDOWS = 3
+
+# Seconds over which the bytes per second of a tier are measured
+RATE_WINDOW = 5.0
+
+
+def parse_tier(args):
+    """
+    Reads the tier a viewer asks for from the query parameters of /video_feed.
+
+    ?tier=low|medium|high|full picks a preset and ?tier=auto adapts it to the viewer's link.
+    width, quality and fps set or override the values, e.g. ?width=640&quality=60&fps=10.
+
+    Parameters:
+    args (dict): The query parameters.
+
+    Returns:
+    tuple: The tier, snapped to the supported steps, and True for an automatic viewer.
+
+    Raises:
+    ValueError: If a parameter is not valid.
+    """
+    name = args.get('tier', '')
+    auto = name == 'auto'
+    if auto:
+        name = AUTO_START
+    if name and name not in TIER_PRESETS:
+        raise ValueError(f"Unknown tier: {name}")
+    tier = TIER_PRESETS.get(name, FULL_TIER)
+    width = int(args.get('width', tier.width))
+    quality = int(args.get('quality', tier.quality))
+    fps = int(args.get('fps', tier.fps))
+    if width < 0 or not 1 <= quality <= 100 or fps < 0:
+        raise ValueError("width and fps must be positive, quality between 1 and 100")
+
+    # Snap to the supported steps
+    if width:
+        width = min(TIER_WIDTHS, key=lambda step: abs(step - width))
+    quality = min(max(int(round(quality / QUALITY_STEP)) * QUALITY_STEP, QUALITY_STEP), 100)
+    fps = min(fps, MAX_TIER_FPS)
+    return Tier(width, quality, fps), auto
+
+
+def open_live_source(bus_only=False):
+    """
+    Opens the live frames: the frame bus of the capture service, or the camera itself when no service runs.
+
+    Parameters:
+    bus_only (bool): Only attach to the frame bus, leaving the camera to the capture service.
+
+    Returns:
+    FrameBusReader or LatestFrameCapture: The started source, or None if the camera could not be opened.
+    """
+    source = FrameBusReader()
+    if source.start():
+        return source
+    if bus_only:
+        return None
+    source = LatestFrameCapture(CAMERA_SOURCE)
+    if source.start():
+        return source
+    print("Error: Could not open camera.")
+    return None
+
+
+def multipart_frame(jpeg):
+    """
+    Wraps a JPEG image in a part of the multipart/x-mixed-replace stream.
+    """
+    return b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+class TierStream:
+    """
+    The encoded frames of one tier and what they cost.
+    """
+
+    def __init__(self, tier):
+        self.tier = tier
+        self.rate_cap = FrameRateCap(tier.fps)
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, tier.quality]
+        self.buffer = None
+        self.viewers = 0
+        self.sequence = 0
+        self.part = None
+        # Metrics
+        self.encoded = 0
+        self.encode_time = 0.0
+        self.encoded_bytes = 0
+        self.recent = deque()  # (time, bytes) of the frames of the last RATE_WINDOW seconds
+        self.sent = 0
+        self.skipped = 0
+
+    def encode(self, frame):
+        """
+        Resizes the frame to the tier's width, without upscaling, and encodes it.
+
+        Returns:
+        bytes: The multipart part, or None if the encoding failed.
+        """
+        height, width = frame.shape[:2]
+        if self.tier.width and self.tier.width < width:
+            size = (self.tier.width, max(int(round(height * self.tier.width / width)), 1))
+            if self.buffer is None or self.buffer.shape[:2] != (size[1], size[0]):
+                self.buffer = np.empty((size[1], size[0], frame.shape[2]), dtype=frame.dtype)
+            frame = cv2.resize(frame, size, dst=self.buffer, interpolation=cv2.INTER_LINEAR)
+        ret, jpeg = cv2.imencode('.jpg', frame, self.params)
+        return multipart_frame(jpeg.tobytes()) if ret else None
+
+    def stats(self, now):
+        while self.recent and now - self.recent[0][0] > RATE_WINDOW:
+            self.recent.popleft()
+        return {'width': self.tier.width, 'quality': self.tier.quality, 'fps': self.tier.fps, 'viewers': self.viewers,
+                'encoded': self.encoded, 'encode_ms': 1000 * self.encode_time / self.encoded if self.encoded else 0,
+                'bytes_per_frame': self.encoded_bytes / self.encoded if self.encoded else 0,
+                'bytes_per_second': sum(size for _, size in self.recent) / RATE_WINDOW,
+                'sent': self.sent, 'skipped': self.skipped}
+
+
+class LiveStreamHub:
+    """
+    Encodes every live frame once per tier and broadcasts it to all the viewers of that tier.
+
+    The source is opened by a hub thread when the first viewer arrives and released when the
+    last one has left. A source that stops is opened again while there are viewers. Only tiers with viewers are encoded, each at most at its frame rate.
+    Viewers always get the newest frame of their tier, a slow viewer skips frames instead
+    of building a backlog.
+    """
+
+    def __init__(self, open_source=open_live_source, release_seconds=RELEASE_SECONDS, reopen_seconds=REOPEN_SECONDS):
+        self.open_source = open_source
+        self.release_seconds = release_seconds
+        self.reopen_seconds = reopen_seconds
+        self.condition = threading.Condition()
+        # Held by the hub thread while the source is open, a new thread waits for the old one to release it
+        self.source_lock = threading.Lock()
+        self.thread = None
+        self.viewers = 0
+        self.tiers = {}
+
+    def join(self, tier):
+        """
+        Adds a viewer to a tier, starting the hub thread for the first viewer. Called with the condition held.
+        """
+        if tier not in self.tiers:
+            self.tiers[tier] = TierStream(tier)
+        self.tiers[tier].viewers += 1
+        self.viewers += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self.tiers[tier]
+
+    def leave(self, stream):
+        """
+        Removes a viewer from its tier. Called with the condition held.
+        """
+        stream.viewers -= 1
+        self.viewers -= 1
+
+    def subscribe(self, tier=FULL_TIER, auto=False):
+        """
+        Generates the multipart stream of one viewer until the viewer disconnects or the source can't be opened.
+
+        Parameters:
+        tier (Tier): Quality of the stream.
+        auto (bool): Move the viewer along AUTO_LADDER depending on the frames it manages to receive.
+        """
+        with self.condition:
+            stream = self.join(tier)
+            thread = self.thread
+        rung = AUTO_LADDER.index(AUTO_START) if auto else None
+        window_start = time.monotonic()
+        window_first = stream.sequence
+        received = 0
+        good_windows = 0
+        try:
+            sequence = stream.sequence
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: stream.sequence > sequence or self.thread is not thread, 1.0)
+                    if stream.sequence == sequence:
+                        if self.thread is not thread:
+                            return  # The source stopped
+                        continue
+                    if sequence:
+                        stream.skipped += stream.sequence - sequence - 1
+                    sequence, part = stream.sequence, stream.part
+                    stream.sent += 1
+                yield part
+                received += 1
+
+                now = time.monotonic()
+                if rung is None or now - window_start < AUTO_WINDOW:
+                    continue
+                # Share of the tier's frames the viewer received in the window
+                produced = stream.sequence - window_first
+                ratio = received / produced if produced else 1
+                new_rung = rung
+                if ratio < AUTO_DOWN:
+                    new_rung = max(rung - 1, 0)
+                    good_windows = 0
+                elif ratio >= AUTO_UP:
+                    good_windows += 1
+                    if good_windows >= AUTO_UP_WINDOWS:
+                        new_rung = min(rung + 1, len(AUTO_LADDER) - 1)
+                        good_windows = 0
+                if new_rung != rung:
+                    rung = new_rung
+                    with self.condition:
+                        self.leave(stream)
+                        stream = self.join(TIER_PRESETS[AUTO_LADDER[rung]])
+                        sequence = stream.sequence
+                window_start = now
+                window_first = stream.sequence
+                received = 0
+        finally:
+            # Runs when the viewer disconnects
+            with self.condition:
+                self.leave(stream)
+
+    def run(self):
+        """
+        Reads the live frames and encodes them for every tier with viewers, while there are viewers.
+        """
+        with self.source_lock:
+            source = self.open_source()
+            if source is None:
+                with self.condition:
+                    self.end_thread()
+                return
+            sequence = 0
+            idle_since = None
+            while True:
+                with self.condition:
+                    if self.viewers:
+                        idle_since = None
+                    elif idle_since is None:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since >= self.release_seconds:
+                        # Decided with the condition held, a viewer joining from now on starts a new thread
+                        self.end_thread()
+                        break
+                    streams = [stream for stream in self.tiers.values() if stream.viewers]
+                item = source.read(sequence, timeout=0.5)
+                if item is None:
+                    if source.closed():
+                        # The capture service or the camera stopped, the viewers wait for it to come back
+                        source.stop()
+                        source = self.reopen_source(source)
+                        if source is None:
+                            return
+                        sequence = 0
+                    continue
+                sequence, frame, timestamp = item
+
+                for stream in streams:
+                    if not stream.rate_cap.due(timestamp):
+                        continue
+                    start = time.perf_counter()
+                    part = stream.encode(frame)  # Once for every viewer of the tier
+                    encode_time = time.perf_counter() - start
+                    if part is None or not source.valid(sequence):
+                        continue  # The shared frame was overwritten while it was encoded
+                    with self.condition:
+                        stream.part = part
+                        stream.sequence += 1
+                        stream.encoded += 1
+                        stream.encode_time += encode_time
+                        stream.encoded_bytes += len(part)
+                        stream.recent.append((time.monotonic(), len(part)))
+                        self.condition.notify_all()
+            # A new thread waits for the source lock until the source is released
+            source.stop()
+
+    def reopen_source(self, closed):
+        """
+        Opens a source that stopped again, retrying with a backoff while there are viewers. A
+        restarted capture service is attached to again, the camera is left to it.
+
+        Parameters:
+        closed: The source that stopped, already stopped.
+
+        Returns:
+        The new source, or None once the viewers left, the hub thread is then ended.
+        """
+        retry = self.reopen_seconds
+        while True:
+            with self.condition:
+                if not self.viewers:
+                    self.end_thread()
+                    return None
+            source = self.open_source(bus_only=True) if isinstance(closed, FrameBusReader) else self.open_source()
+            if source is not None:
+                return source
+            time.sleep(retry)
+            retry = min(retry * 2, REOPEN_MAX_SECONDS)
+
+    def end_thread(self):
+        """
+        Marks the hub thread as stopping, so that the next viewer starts a new one and the
+        viewers of this one return. Called with the condition held.
+        """
+        self.thread = None
+        self.condition.notify_all()
+
+    def stats(self):
+        """
+        Returns the number of viewers and, for every tier, its settings, viewers, encoded
+        frames, mean encode time in milliseconds, bytes per frame and per second, and the
+        frames sent to viewers and skipped by slow viewers.
+        """
+        now = time.monotonic()
+        with self.condition:
+            return {'viewers': self.viewers,
+                    'tiers': [stream.stats(now) for stream in self.tiers.values()]}
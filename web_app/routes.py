@@ -1,10 +1,13 @@
 import os
-import cv2
-from flask import Blueprint, render_template, request, redirect, url_for, session, Response
+from flask import Blueprint, render_template, request, redirect, url_for, session, Response, jsonify
 import requests
 from datetime import datetime, timedelta
 from collections import Counter
 
+# The track store is written by the analysis in desktop_app
+from desktop_modules import track_store
+from live_stream import LiveStreamHub, parse_tier
+
 # Create a Blueprint for the routes, which allows for modular application design
 routes = Blueprint('routes', __name__)
 
@@ -14,6 +17,9 @@ ANALYSES_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
 # Base URL for the API that the application will communicate with
 API_BASE_URL = "http://127.0.0.1:5001/api"
 
+# One capture and one JPEG encode per live frame, shared by every viewer of the live feed
+live_stream = LiveStreamHub()
+
 
 # Route for the home page
 @routes.route('/')
@@ -97,6 +103,7 @@ def event_details(event_id):
 
     video_url = ''
     analysis = ''
+    tracks_url = ''
     if event:
         footage_id = event.get('footage_id')
         if footage_id:
@@ -114,8 +121,33 @@ def event_details(event_id):
             with open(analysis_path, 'r') as file:
                 analysis = file.read()
 
+            # Footage analyzed without annotation gets its tracks drawn during playback
+            record = track_store.find_segment(track_store.load_index(ANALYSES_FOLDER), footage_id)
+            if record is not None and not record['flags'] & track_store.FLAG_ANNOTATED:
+                tracks_url = url_for('routes.footage_tracks', footage_id=footage_id)
+
     # Render the event details page, including the footage and analysis
-    return render_template('event_details.html', event=event, video_url=video_url, analysis=analysis)
+    return render_template('event_details.html', event=event, video_url=video_url, analysis=analysis,
+                           tracks_url=tracks_url)
+
+
+# Route that provides the stored tracks of a footage for drawing them during playback
+@routes.route('/tracks/<int:footage_id>')
+def footage_tracks(footage_id):
+    if 'user' not in session:
+        return redirect(url_for('routes.login'))
+
+    record, columns = track_store.load_tracks(ANALYSES_FOLDER, footage_id)
+    if record is None:
+        return jsonify({'message': 'Tracks not found'}), 404
+
+    # Send the columns needed for drawing as they are stored
+    return jsonify({
+        'fps': float(record['fps']),
+        'width': int(record['width']),
+        'height': int(record['height']),
+        'columns': {name: columns[name].tolist() for name in ['frame', 'track_id', 'left', 'top', 'right', 'bottom']}
+    })
 
 
 # Route for user login
@@ -242,19 +274,16 @@ def live_feed():
 # Route that provides the video feed stream
 @routes.route('/video_feed')
 def video_feed():
-    # Return the video stream as a multipart response
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
-
-
-# Function to generate frames for the live video feed
-def generate_frames():
-    camera = cv2.VideoCapture(2)  # Open the external camera
-
-    while True:
-        success, frame = camera.read()  # Capture frame-by-frame
-        if not success:
-            break  # Exit the loop if the frame is not captured successfully
-        else:
-            ret, buffer = cv2.imencode('.jpg', frame)  # Encode the frame as JPEG
-            frame = buffer.tobytes()  # Convert the frame to bytes
-            yield b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n'  # Yield the frame as a response
+    # Quality tier of this viewer, e.g. ?tier=low, ?tier=auto or ?width=640&quality=60&fps=10
+    try:
+        tier, auto = parse_tier(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    # Return the shared live stream of the tier as a multipart response
+    return Response(live_stream.subscribe(tier, auto), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+# Route that reports the viewers, encode cost and bandwidth of every tier of the live stream
+@routes.route('/video_feed/stats')
+def video_feed_stats():
+    return jsonify(live_stream.stats())
@@ -0,0 +1,169 @@
+import time
+import threading
+import numpy as np
+import pytest
+from live_stream import LiveStreamHub, Tier, FULL_TIER, parse_tier
+
+
+class FakeSource:
+    # Produces numbered frames at a fixed rate, like a camera
+    def __init__(self, fps=200):
+        self.fps = fps
+        self.sequence = 0
+        self.started = time.monotonic()
+        self.stopped = False
+
+    def read(self, after=0, timeout=1.0):
+        time.sleep(1 / self.fps)
+        self.sequence += 1
+        return self.sequence, np.full((480, 640, 3), self.sequence % 255, dtype=np.uint8), time.time()
+
+    def valid(self, sequence):
+        return True
+
+    def closed(self):
+        return False
+
+    def stop(self):
+        self.stopped = True
+
+
+def watch(stream, frames, delay, results):
+    # Read frames from a viewer's stream, then disconnect
+    parts = []
+    for part in stream:
+        parts.append(part)
+        if len(parts) == frames:
+            break
+        time.sleep(delay)
+    stream.close()
+    results.append(parts)
+
+
+# Test that every frame is encoded once whatever the number of viewers, and slow viewers skip frames
+def test_frames_are_encoded_once_for_all_viewers():
+    sources = []
+    hub = LiveStreamHub(lambda: sources.append(FakeSource()) or sources[-1], release_seconds=0)
+    results = []
+    viewers = [threading.Thread(target=watch, args=(hub.subscribe(), 20, 0.02 if i == 0 else 0, results))
+               for i in range(5)]
+    for viewer in viewers:
+        viewer.start()
+    for viewer in viewers:
+        viewer.join(10)
+
+    assert len(sources) == 1  # One source for every viewer
+    assert all(part.startswith(b'--frame\r\nContent-Type: image/jpeg\r\n\r\n') for parts in results for part in parts)
+    stats, = hub.stats()['tiers']
+    assert stats['sent'] == 100
+    assert stats['encoded'] <= sources[0].sequence  # Never more than one encode per frame
+    assert stats['skipped'] > 0  # The slow viewer got the newest frames
+
+
+# Test that the source is released once the last viewer left, and opened again for the next one
+def test_source_released_without_viewers():
+    sources = []
+    hub = LiveStreamHub(lambda: sources.append(FakeSource()) or sources[-1], release_seconds=0)
+    results = []
+    watch(hub.subscribe(), 3, 0, results)
+    for _ in range(100):
+        if sources[0].stopped:
+            break
+        time.sleep(0.01)
+    assert sources[0].stopped
+    assert hub.stats()['viewers'] == 0
+
+    watch(hub.subscribe(), 3, 0, results)
+    assert len(sources) == 2
+
+
+class SlowCondition(threading.Condition):
+    # Delays the hub thread every time it takes the condition, widening any window between its decisions
+    def __enter__(self):
+        if threading.current_thread() is not threading.main_thread():
+            time.sleep(0.01)
+        return super().__enter__()
+
+
+# Test that viewers arriving while the hub thread stops are served by a new thread instead of being dropped
+def test_viewer_joining_while_source_released():
+    sources = []
+    hub = LiveStreamHub(lambda: sources.append(FakeSource()) or sources[-1], release_seconds=0)
+    hub.condition = SlowCondition()
+    results = []
+    for delay in np.linspace(0, 0.05, 20):
+        watch(hub.subscribe(), 1, 0, results)
+        time.sleep(delay)  # Arrive at different points of the hub thread's release
+    assert all(len(parts) == 1 for parts in results)
+
+
+# Test that viewers return when the source can't be opened, and the next viewer tries again
+def test_source_failing_to_open():
+    attempts = []
+    hub = LiveStreamHub(lambda: attempts.append(1), release_seconds=0)
+    results = []
+    watch(hub.subscribe(), 1, 0, results)
+    watch(hub.subscribe(), 1, 0, results)
+    assert results == [[], []]
+    assert len(attempts) == 2
+    assert hub.thread is None
+
+
+class StoppingSource(FakeSource):
+    # A source whose capture service stops after a few frames
+    def __init__(self, frames):
+        super().__init__()
+        self.frames = frames
+
+    def read(self, after=0, timeout=1.0):
+        if self.sequence == self.frames:
+            return None
+        return super().read(after, timeout)
+
+    def closed(self):
+        return self.sequence == self.frames
+
+
+# Test that a source that stops is opened again and its viewers keep receiving frames
+def test_stopped_source_reopened_for_viewers():
+    sources = []
+    hub = LiveStreamHub(lambda: sources.append(StoppingSource(5)) or sources[-1], release_seconds=0,
+                        reopen_seconds=0.01)
+    results = []
+    watch(hub.subscribe(), 12, 0, results)
+    assert len(results[0]) == 12
+    assert len(sources) == 3 and sources[0].stopped and sources[1].stopped
+
+
+# Test that each tier is encoded once for its viewers, at its own size and frame rate
+def test_tiers_are_encoded_once_each():
+    sources = []
+    hub = LiveStreamHub(lambda: sources.append(FakeSource()) or sources[-1], release_seconds=0)
+    low = Tier(320, 50, 20)
+    results = []
+    viewers = [threading.Thread(target=watch, args=(hub.subscribe(tier), 10, 0, results))
+               for tier in (low, low, FULL_TIER, FULL_TIER)]
+    for viewer in viewers:
+        viewer.start()
+    for viewer in viewers:
+        viewer.join(10)
+
+    assert len(sources) == 1
+    stats = {(tier['width'], tier['quality'], tier['fps']): tier for tier in hub.stats()['tiers']}
+    low_stats, full_stats = stats[low], stats[FULL_TIER]
+    assert low_stats['sent'] == full_stats['sent'] == 20
+    assert low_stats['encoded'] < full_stats['encoded']  # Capped at 20 fps, the source runs at 200
+    assert 0 < low_stats['bytes_per_frame'] < full_stats['bytes_per_frame']
+    assert low_stats['bytes_per_second'] > 0
+
+
+# Test that requested tiers are snapped to the supported steps and invalid ones rejected
+def test_parse_tier():
+    assert parse_tier({}) == (FULL_TIER, False)
+    assert parse_tier({'tier': 'low'}) == (Tier(320, 50, 5), False)
+    assert parse_tier({'tier': 'auto'}) == (Tier(640, 70, 15), True)
+    assert parse_tier({'width': '700', 'quality': '62', 'fps': '100'}) == (Tier(640, 60, 30), False)
+    assert parse_tier({'tier': 'low', 'fps': '10'}) == (Tier(320, 50, 10), False)
+    for args in ({'tier': 'huge'}, {'quality': '0'}, {'width': 'wide'}, {'fps': '-1'}):
+        with pytest.raises(ValueError):
+            parse_tier(args)